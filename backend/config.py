@@ -1,4 +1,5 @@
 from functools import lru_cache
+from typing import Literal
 
 from pydantic import model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -15,11 +16,18 @@ class Settings(BaseSettings, extra="ignore"):
     SNOWFLAKE_DB_SCHEMA: str = "PUBLIC"  # Default schema, change if needed
     SNOWFLAKE_CONN_STRING: str | None = None
 
+    # Vector store: "milvus" (Milvus Cloud) or "local" (embedded, memory-mapped from LOCAL_VECTOR_STORE_DIR, which in
+    # docker-compose is on the index-data volume the indexer writes to)
+    VECTOR_STORE: Literal["milvus", "local"] = "milvus"
+    LOCAL_VECTOR_STORE_DIR: str = "vectorstore/local"
+    LOCAL_VECTOR_STORE_IVF_MIN_VECTORS: int = 20_000
+    LOCAL_VECTOR_STORE_NPROBE: int = 8
+
     # Milvus Cloud (for vector store)
-    MILVUS_CLOUD_USER: str
-    MILVUS_CLOUD_PASSWORD: str
-    MILVUS_API_KEY: str
-    MILVUS_CLOUD_URI: str
+    MILVUS_CLOUD_USER: str | None = None
+    MILVUS_CLOUD_PASSWORD: str | None = None
+    MILVUS_API_KEY: str | None = None
+    MILVUS_CLOUD_URI: str | None = None
     MILVUS_DOCUMENTS_COLLECTION: str = "DocumentsIndex"
     MILVUS_REPORTS_COLLECTION: str = "Reports"
 
@@ -45,8 +53,81 @@ class Settings(BaseSettings, extra="ignore"):
     LOG_MAX_BYTES: int = 2000000  # Default to 2MB
     LOG_BACKUP_COUNT: int = 10
 
+    # Thread pools for blocking work called from async endpoints
+    DB_POOL_SIZE: int = 10
+    LLM_POOL_SIZE: int = 8
+    AUTH_POOL_SIZE: int = 4
+
+    # Semantic QA answer cache
+    QA_CACHE_ENABLED: bool = True
+    QA_CACHE_SIMILARITY_THRESHOLD: float = 0.95
+    QA_CACHE_TTL_SECONDS: int = 60 * 60 * 24  # 1 day
+    QA_CACHE_MAX_ENTRIES: int = 5000
+    QA_CACHE_SEED_FROM_HISTORY: bool = False
+
+    # Persistent embedding cache
+    EMBEDDING_CACHE_ENABLED: bool = True
+    EMBEDDING_CACHE_DIR: str = "vectorstore/embedding_cache"
+    EMBEDDING_CACHE_MAX_ENTRIES: int = 200_000
+    EMBEDDING_CACHE_DTYPE: str = "float16"
+
+    # Article catalog cache, invalidated by the ingestion DAG through POST /articles/cache/invalidate
+    ARTICLE_CATALOG_TTL_SECONDS: int = 60 * 15
+    CATALOG_INVALIDATION_TOKEN: str | None = None
+    ARTICLES_PAGE_SIZE: int = 12
+    ARTICLES_MAX_PAGE_SIZE: int = 100
+
+    # Hybrid retrieval: BM25 over the local lexical index written by the indexer, fused with the vector search. In
+    # docker-compose both sides point it at the shared index-data volume
+    HYBRID_RETRIEVAL_ENABLED: bool = True
+    LEXICAL_INDEX_PATH: str = "vectorstore/lexical_index.sqlite"
+    HYBRID_CANDIDATES: int = 20
+    HYBRID_TOP_K: int = 6
+
+    # Reranking of the retrieved candidates: a local cross-encoder if sentence-transformers is installed,
+    # lexical overlap otherwise, within a per-request time budget
+    RERANK_ENABLED: bool = True
+    RERANK_MODEL: str | None = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+    RERANK_CANDIDATES: int = 50
+    RERANK_TOP_N: int = 4
+    RERANK_BUDGET_MS: int = 200
+
+    # Tokens of retrieved context sent to the LLM per query
+    CONTEXT_TOKEN_BUDGET: int = 3000
+
+    # model="auto" Q/A: questions are routed from local features to the cheap or the strong model
+    ROUTER_CHEAP_MODEL: str = "gpt-4o-mini"
+    ROUTER_STRONG_MODEL: str = "gpt-4o"
+    ROUTER_MAX_CHEAP_TERMS: int = 20
+    # Standard deviations the best dense similarity must stand above the candidates' for a focused retrieval
+    ROUTER_MIN_TOP_SCORE_Z: float = 3.0
+
+    # Model rewriting chat follow-ups that refer back to the history into standalone questions
+    CONDENSE_MODEL: str = "gpt-4o-mini"
+
+    # Chat sessions: per-session memory limit, idle timeout and the budget for all chat memories
+    CHAT_SESSION_TOKEN_LIMIT: int = 3000
+    CHAT_SESSION_TTL_SECONDS: int = 60 * 30
+    CHAT_SESSIONS_MAX_BYTES: int = 64 * 1024 * 1024
+
+    # Map-reduce article summaries
+    SUMMARY_GROUP_TOKENS: int = 3000
+    SUMMARY_MAX_CONCURRENCY: int = 8
+
+    # Background jobs for summary and report generation
+    JOB_WORKERS: int = 2
+    JOB_RETENTION_SECONDS: int = 60 * 60
+
     # Nvidia API KEY
     NVIDIA_API_KEY: str
+    NVIDIA_MAX_CONCURRENCY: int = 8
+    NVIDIA_TIMEOUT_SECONDS: float = 60
+    NVIDIA_MAX_RETRIES: int = 5
+    VISION_CACHE_ENABLED: bool = True
+    VISION_CACHE_PATH: str = "vectorstore/vision_cache.sqlite"
+    VISION_CACHE_MAX_BYTES: int = 512 * 1024 * 1024
+    IMAGE_TRIAGE_ENABLED: bool = True
+    IMAGE_TRIAGE_CONFIDENCE: float = 0.9
 
     # #Open
     # OPENAI_API_KEY: str
@@ -55,6 +136,8 @@ class Settings(BaseSettings, extra="ignore"):
 
     @model_validator(mode="after")
     def validator(cls, values: "Settings") -> "Settings":
+        if values.VECTOR_STORE == "milvus" and not (values.MILVUS_CLOUD_URI and values.MILVUS_API_KEY):
+            raise ValueError('MILVUS_CLOUD_URI and MILVUS_API_KEY are required with VECTOR_STORE="milvus"')
         # Construct Snowflake connection string
         values.SNOWFLAKE_CONN_STRING = (
             f"snowflake://{values.SNOWFLAKE_DB_USER}:{values.SNOWFLAKE_DB_PASSWORD}@{values.SNOWFLAKE_DB_ACCOUNT}/"
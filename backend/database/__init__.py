@@ -31,7 +31,10 @@ class DatabaseSession:
                 f"{settings.SNOWFLAKE_DB_ACCOUNT}/{settings.SNOWFLAKE_DB_DATABASE}/{settings.SNOWFLAKE_DB_SCHEMA}?warehouse={settings.SNOWFLAKE_DB_WAREHOUSE}&role={settings.SNOWFLAKE_DB_ROLE}"
             )
 
-            cls._instance.db_engine = create_engine(snowflake_uri)
+            # One connection per DB worker thread, see backend.utilities.executors
+            cls._instance.db_engine = create_engine(
+                snowflake_uri, pool_size=settings.DB_POOL_SIZE, max_overflow=0
+            )
             cls._instance.session_maker = scoped_session(
                 sessionmaker(
                     autocommit=False, autoflush=True, bind=cls._instance.db_engine
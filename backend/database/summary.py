@@ -1,14 +1,19 @@
-from sqlalchemy import Column, String, DateTime, Computed
+from datetime import datetime
+
+from sqlalchemy import Column, String, DateTime
 
 from backend.database import Base
 
 
-class ArticleModel(Base):
+class SummaryModel(Base):
     __tablename__ = "summary"
 
-    a_id = Column("a_id", String, nullable=False)
+    a_id = Column("a_id", String, primary_key=True)
+    summary_length = Column(String, primary_key=True)
+    # SHA-256 of the PDF the summary was generated from
+    pdf_hash = Column(String, nullable=False)
     generated_summary = Column(String)
-    created_at = Column(DateTime, Computed("CURRENT_TIMESTAMP()"), nullable=False)
-    updated_at = Column(DateTime, Computed("CURRENT_TIMESTAMP()"), nullable=False)
+    created_at = Column(DateTime, default=datetime.now, nullable=False)
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now, nullable=False)
 
     __table_args__ = {"schema": "public"}
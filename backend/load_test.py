@@ -0,0 +1,108 @@
+"""
+Load test of the service layer: concurrent Q/A requests and user lookups through the real service functions,
+against a Snowflake session and a chat engine stubbed to take a fixed time. Each scenario is run inline, the
+blocking database calls made on the event loop as before the executors, then through DB pools of increasing size.
+
+    python -m backend.load_test
+"""
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+from llama_index.core.memory import ChatMemoryBuffer
+
+from backend.config import settings
+from backend.services import chat, users
+from backend.utilities import executors
+
+REQUESTS = 64
+DB_LATENCY = 0.05
+LLM_LATENCY = 0.2
+POOL_SIZES = (1, 2, 4, 8, 16, 32, 64)
+
+
+class SlowSession:
+    """Stands in for a SQLAlchemy session, each statement blocking the calling thread for a Snowflake round trip"""
+
+    def execute(self, statement):
+        time.sleep(DB_LATENCY)
+        return SimpleNamespace(scalar_one_or_none=lambda: None)
+
+    def add(self, instance):
+        pass
+
+    def commit(self):
+        time.sleep(DB_LATENCY)
+
+
+@contextmanager
+def slow_db_session():
+    yield SlowSession()
+
+
+class SlowChatEngine:
+    async def achat(self, prompt: str):
+        await asyncio.sleep(LLM_LATENCY)
+        return SimpleNamespace(response=f"Answer to {prompt}", sources=[])
+
+
+def _stub_dependencies():
+    settings.QA_CACHE_ENABLED = False
+    chat.db_session = slow_db_session
+    users.db_session = slow_db_session
+    chat.get_chat_memory = lambda user_id, article_id, model: ChatMemoryBuffer.from_defaults()
+    chat.get_chat_engine = lambda *args: SlowChatEngine()
+
+
+async def qa_pooled(i: int):
+    return await chat.process_qa_query("1", f"Question {i}?", "gpt-4o", user_id=i)
+
+
+async def qa_inline(i: int):
+    response = await SlowChatEngine().achat(f"Question {i}?")
+    chat._save_qa_history("1", f"Question {i}?", response.response, [], "gpt-4o", i)
+    return response.response
+
+
+async def user_pooled(i: int):
+    return await users._get_user(f"user{i}")
+
+
+async def user_inline(i: int):
+    return users._select_user(f"user{i}")
+
+
+async def _throughput(request) -> float:
+    start = time.perf_counter()
+    await asyncio.gather(*(request(i) for i in range(REQUESTS)))
+    return REQUESTS / (time.perf_counter() - start)
+
+
+def _with_db_pool(pool_size: int, request) -> float:
+    executors.db_executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="db")
+    try:
+        return asyncio.run(_throughput(request))
+    finally:
+        executors.db_executor.shutdown()
+
+
+def main():
+    _stub_dependencies()
+    print(
+        f"{REQUESTS} concurrent requests, {DB_LATENCY * 1000:.0f}ms per database statement, "
+        f"{LLM_LATENCY * 1000:.0f}ms per completion"
+    )
+    for name, inline, pooled in (
+        ("Q/A", qa_inline, qa_pooled),
+        ("User lookup", user_inline, user_pooled),
+    ):
+        print(name)
+        print(f"  inline (blocking the event loop): {asyncio.run(_throughput(inline)):8.1f} req/s")
+        for pool_size in POOL_SIZES:
+            print(f"  DB pool size {pool_size:>3}: {_with_db_pool(pool_size, pooled):8.1f} req/s")
+
+
+if __name__ == "__main__":
+    main()
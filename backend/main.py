@@ -8,6 +8,9 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from backend.config import settings
 from backend.database import db_session
 from backend.schemas import HealthSchema
+from backend.services.chat import seed_answer_cache_from_history
+from backend.services.jobs import job_queue
+from backend.utilities.executors import shutdown_executors
 from backend.views import central_router
 
 # Load logging configuration from file
@@ -21,7 +24,11 @@ logging.getLogger("passlib").setLevel(logging.ERROR)
 async def lifespan(app: FastAPI):
     logger.info("[FastAPI] Startup lifespan invoked")
     # await init_db()
+    if settings.QA_CACHE_ENABLED and settings.QA_CACHE_SEED_FROM_HISTORY:
+        await seed_answer_cache_from_history()
     yield
+    await job_queue.stop()
+    shutdown_executors()
 
 
 app = FastAPI(title=settings.APP_TITLE, version=settings.APP_VERSION, lifespan=lifespan)
@@ -1,5 +1,6 @@
 # articles/schemas.py
 from datetime import datetime
+from typing import Any, Dict, List, Literal, Optional
 
 from pydantic import BaseModel
 
@@ -21,11 +22,27 @@ class ArticleResponse(ArticleBase):
     a_id: str
 
 
+class ArticlePageResponse(BaseModel):
+    # Only the requested fields of each article, a_id always included
+    items: List[Dict[str, Any]]
+    next_cursor: Optional[str] = None
+
+
 class ArticleSummaryRequest(BaseModel):
     article_id: int
 
 
+SummaryLength = Literal["short", "medium", "long"]
+
+
 class ArticleSummaryResponse(BaseModel):
     article_id: str
     title: str
+    summary_length: SummaryLength = "medium"
     summary: str
+
+
+class ArticleSummariesResponse(BaseModel):
+    article_id: str
+    title: str
+    summaries: Dict[SummaryLength, str]
@@ -0,0 +1,24 @@
+# schemas/jobs.py
+from datetime import datetime
+from typing import Any, Optional
+
+from pydantic import BaseModel
+
+
+class JobResponse(BaseModel):
+    job_id: str
+    kind: str
+    status: str
+    progress: Optional[str] = None
+    result: Any = None
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+
+
+class JobQueueStatsResponse(BaseModel):
+    queued: int
+    running: int
+    succeeded: int
+    failed: int
+    deduplicated: int
@@ -1,6 +1,6 @@
 # schemas/chat.py
 from datetime import datetime
-from typing import List
+from typing import Dict, List
 
 from pydantic import BaseModel
 
@@ -41,3 +41,63 @@ class ReportResponse(BaseModel):
 class IndexReportResponse(BaseModel):
     status: str
     message: str
+
+
+class AnswerCacheStatsResponse(BaseModel):
+    entries: int
+    hits: int
+    misses: int
+    evictions: int
+    hit_rate: float
+
+
+class EmbeddingCacheStatsResponse(BaseModel):
+    entries: int
+    capacity: int
+    hits: int
+    misses: int
+    evictions: int
+    hit_rate: float
+
+
+class SingleFlightStatsResponse(BaseModel):
+    calls: int
+    executions: int
+    saved: int
+
+
+class CoalescingStatsResponse(BaseModel):
+    qa: SingleFlightStatsResponse
+    reports: SingleFlightStatsResponse
+    s3_downloads: SingleFlightStatsResponse
+
+
+class ChatSessionStatsResponse(BaseModel):
+    sessions: int
+    bytes: int
+    max_bytes: int
+    evictions: int
+
+
+class ModelRouteStatsResponse(BaseModel):
+    requests: int
+    average_latency_ms: float
+
+
+class ModelRoutingStatsResponse(BaseModel):
+    routes: Dict[str, ModelRouteStatsResponse]
+
+
+class CondenseStatsResponse(BaseModel):
+    turns: int
+    condensed: int
+    skipped: int
+    average_condense_ms: float
+    estimated_saved_ms: float
+
+
+class ContextPackingStatsResponse(BaseModel):
+    requests: int
+    tokens_before: int
+    tokens_after: int
+    saved_ratio: float
@@ -1,76 +1,161 @@
 import logging
-from typing import Optional, List
+from datetime import date
+from typing import Dict, Optional, List, Tuple
 
 from sqlalchemy import select
 
+from backend.config import settings
 from backend.database import db_session
 from backend.database.articles import ArticleModel
-from backend.services.summary_generation import DocumentSummarizer
+from backend.database.summary import SummaryModel
+from backend.services.summary_generation import SUMMARY_LENGTHS, DocumentSummarizer
+from backend.utilities.base_utils import fetch_file_from_s3, file_hash
+from backend.utilities.catalog_cache import (
+    ArticleRecord,
+    CatalogCache,
+    CatalogSnapshot,
+    decode_cursor,
+    encode_cursor,
+)
+from backend.utilities.executors import run_db, run_llm
 
 logger = logging.getLogger(__name__)
 
 
-async def _get_article(article_id: str) -> Optional[ArticleModel]:
+def _select_all_articles() -> List[ArticleRecord]:
+    with db_session() as session:
+        stmt = select(ArticleModel)
+        result = session.execute(stmt)
+        return [ArticleRecord.from_model(article) for article in result.scalars()]
+
+
+async def _load_catalog() -> List[ArticleRecord]:
+    return await run_db(_select_all_articles)
+
+
+catalog = CatalogCache(_load_catalog, ttl_seconds=settings.ARTICLE_CATALOG_TTL_SECONDS)
+
+
+async def _get_catalog() -> Optional[CatalogSnapshot]:
     try:
-        with db_session() as session:
-            stmt = select(ArticleModel).where(ArticleModel.a_id == article_id)
-            result = session.execute(stmt)
-            article = result.scalar_one_or_none()
-            if article:
-                session.refresh(article)
-            return article
+        return await catalog.get()
     except Exception as e:
-        logger.error(f"Error fetching article {article_id}: {str(e)}", exc_info=True)
+        logger.error(f"Error loading the article catalog: {str(e)}", exc_info=True)
         return None
 
 
-async def _get_all_articles() -> List[ArticleModel]:
-    try:
-        with db_session() as session:
-            stmt = select(ArticleModel)
-            result = session.execute(stmt)
-            articles = result.scalars().all()
-            return list(articles)
-    except Exception as e:
-        logger.error(f"Error fetching all articles: {str(e)}", exc_info=True)
-        return []
+async def _get_article(article_id: str) -> Optional[ArticleRecord]:
+    snapshot = await _get_catalog()
+    return snapshot.by_id.get(article_id) if snapshot else None
 
 
-async def _generate_summary(article_id: str) -> Optional[str]:
-    # This is a placeholder for the NVIDIA service integration
-    # You would implement the actual NVIDIA service call here
-    try:
-        with db_session() as session:
-            article = await _get_article(article_id)
-            if not article:
-                return None
-
-            # Here you would call the NVIDIA service
-            # For now, we'll return a mock summary
-            summarizer = DocumentSummarizer()
-
-            # Process each directory
-            print(f"\nProcessing article: {article}")
-
-            # pdf_path = fetch_pdf_from_s3(article.pdf_url)
-            pdf_path = fetch_file_from_s3(article.pdf_url, None)
-            try:
-                summary = summarizer.summarize_directory(
-                    directory_path=pdf_path,
-                    summary_length="medium"  # Options: "short", "medium", "long"
+async def _get_all_articles() -> List[ArticleRecord]:
+    snapshot = await _get_catalog()
+    return list(snapshot.articles) if snapshot else []
+
+
+def _article_filter(
+    author: Optional[str] = None,
+    published_from: Optional[date] = None,
+    published_to: Optional[date] = None,
+    title_prefix: Optional[str] = None,
+):
+    author = author.casefold() if author else None
+    title_prefix = title_prefix.casefold() if title_prefix else None
+
+    def matches(article: ArticleRecord) -> bool:
+        published = article.publication_date.date()
+        return (
+            (author is None or author in article.authors.casefold())
+            and (published_from is None or published >= published_from)
+            and (published_to is None or published <= published_to)
+            and (title_prefix is None or article.title.casefold().startswith(title_prefix))
+        )
+
+    return matches
+
+
+def _get_articles_page(
+    snapshot: CatalogSnapshot,
+    limit: int,
+    cursor: Optional[str] = None,
+    **filters,
+) -> Tuple[List[ArticleRecord], Optional[str]]:
+    """
+    One page of the catalog, newest first, matching the filters of `_article_filter`. Returns the articles and the
+    cursor of the next page, if there is one. Raises ValueError for an invalid cursor.
+    """
+    after = decode_cursor(cursor) if cursor else None
+    articles, next_key = snapshot.page(after, limit, _article_filter(**filters))
+    return articles, encode_cursor(next_key) if next_key else None
+
+
+def _invalidate_catalog():
+    catalog.invalidate()
+    logger.info("Article catalog cache invalidated")
+
+
+def _select_summaries(article_id: str) -> Dict[str, Tuple[str, str]]:
+    """The stored summaries of an article by length, with the hash of the PDF each was generated from"""
+    with db_session() as session:
+        stmt = select(SummaryModel).where(SummaryModel.a_id == article_id)
+        return {
+            summary.summary_length: (summary.pdf_hash, summary.generated_summary)
+            for summary in session.execute(stmt).scalars()
+        }
+
+
+def _save_summaries(article_id: str, pdf_hash: str, summaries: Dict[str, str]):
+    with db_session() as session:
+        for summary_length, summary in summaries.items():
+            session.merge(
+                SummaryModel(
+                    a_id=article_id,
+                    summary_length=summary_length,
+                    pdf_hash=pdf_hash,
+                    generated_summary=summary,
                 )
-                print(summary)
-            except Exception as e:
-                print(f"Error processing directory {pdf_path}: {str(e)}")
-            
-            # Update the article with the new summary
-            # article.summary = summary
-            # session.commit()
-            # session.refresh(article)
-            return summary
+            )
+        session.commit()
+
+
+async def _get_stored_summary(article_id: str, summary_length: str) -> Optional[str]:
+    stored = await run_db(_select_summaries, article_id)
+    if summary_length in stored:
+        return stored[summary_length][1]
+    return None
+
+
+async def _generate_summaries(article_id: str) -> Optional[Dict[str, str]]:
+    """
+    The summaries of an article by length, generated together on first request and stored. The summaries are only
+    generated again once the PDF has changed.
+    """
+    try:
+        article = await _get_article(article_id)
+        if not article:
+            return None
+
+        pdf_path = await run_llm(fetch_file_from_s3, article.pdf_url, None)
+        if not pdf_path:
+            return None
+        pdf_hash = await run_llm(file_hash, pdf_path)
+        stored = await run_db(_select_summaries, article_id)
+        # Every length, generated from this PDF; an earlier run may have saved only some of them
+        if all(
+            summary_length in stored and stored[summary_length][0] == pdf_hash
+            for summary_length in SUMMARY_LENGTHS
+        ):
+            return {summary_length: stored[summary_length][1] for summary_length in SUMMARY_LENGTHS}
+
+        # Parse, index and summarize off the event loop
+        logger.info(f"Generating summaries for article {article_id}")
+        summaries = await run_llm(DocumentSummarizer().summarize_pdf, pdf_path)
+        await run_db(_save_summaries, article_id, pdf_hash, summaries)
+        return summaries
     except Exception as e:
         logger.error(
-            f"Error generating summary for article {article_id}: {str(e)}",
+            f"Error generating summaries for article {article_id}: {str(e)}",
             exc_info=True,
         )
         return None
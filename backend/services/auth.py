@@ -11,15 +11,25 @@ from backend.database import db_session
 from backend.database.users import UserModel
 from backend.schemas.auth import Token
 from backend.utilities.base_utils import verify_password
+from backend.utilities.executors import run_auth, run_db
 
 
-async def authenticate_user(username: str, password: str) -> Optional[UserModel]:
+def _get_user_by_username(username: str) -> Optional[UserModel]:
     with db_session() as session:
-        user = session.scalar(select(UserModel).filter_by(username=username))
-        if user and verify_password(
-            plain_password=password, hashed_password=user.password
-        ):
-            return await validate_user(user=user)
+        return session.scalar(select(UserModel).filter_by(username=username))
+
+
+def _get_user_by_id(user_id: int) -> Optional[UserModel]:
+    with db_session() as session:
+        return session.get(UserModel, user_id)
+
+
+async def authenticate_user(username: str, password: str) -> Optional[UserModel]:
+    user = await run_db(_get_user_by_username, username)
+    if user and await run_auth(
+        verify_password, plain_password=password, hashed_password=user.password
+    ):
+        return await validate_user(user=user)
     return None
 
 
@@ -72,10 +82,9 @@ async def authenticate_token(
     :param password_timestamp:
     :return:
     """
-    with db_session() as session:
-        user = session.get(UserModel, user_id)
-        if user and password_timestamp == user.password_timestamp:
-            return await validate_user(user=user)
+    user = await run_db(_get_user_by_id, user_id)
+    if user and password_timestamp == user.password_timestamp:
+        return await validate_user(user=user)
     return None
 
 
@@ -1,27 +1,131 @@
 import json
+import logging
+import time
 import uuid
-from typing import List
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Callable, List
 
+from llama_index.core.llms import ChatMessage, MessageRole
+from llama_index.core.memory import BaseMemory
+
+from backend.config import settings
 from backend.database import db_session
 from backend.database.qa import QAHistory
 from backend.database.research_notes import ResearchNotes
 from backend.schemas.qa import QAResponse
-from backend.services.rag import get_chat_engine, get_report_engine
+from backend.services.rag import (
+    get_chat_engine,
+    get_chat_memory,
+    get_report_engine,
+    get_report_memory,
+    get_embed_model,
+    get_retriever,
+)
+from backend.utilities.condensing import refers_to_history
+from backend.utilities.executors import run_db, run_llm
+from backend.utilities.hybrid_retrieval import PrecomputedRetriever, aretrieve_with_dense_scores
+from backend.utilities.model_routing import AUTO_MODEL, ModelRouter, auto_model_label, requested_model
+from backend.utilities.semantic_cache import SemanticAnswerCache
+from backend.utilities.single_flight import SingleFlight, normalize_prompt
 
+logger = logging.getLogger(__name__)
+
+answer_cache = SemanticAnswerCache(
+    similarity_threshold=settings.QA_CACHE_SIMILARITY_THRESHOLD,
+    ttl_seconds=settings.QA_CACHE_TTL_SECONDS,
+    max_entries=settings.QA_CACHE_MAX_ENTRIES,
+)
+# Concurrent identical questions and reports on an article share one retrieval and completion
+qa_flight = SingleFlight()
+report_flight = SingleFlight()
+model_router = ModelRouter(
+    cheap_model=settings.ROUTER_CHEAP_MODEL,
+    strong_model=settings.ROUTER_STRONG_MODEL,
+    max_cheap_terms=settings.ROUTER_MAX_CHEAP_TERMS,
+    min_top_score_z=settings.ROUTER_MIN_TOP_SCORE_Z,
+)
+
+
+def _depends_on_history(memory: BaseMemory, prompt: str) -> bool:
+    """Whether the chat engine will condense the prompt with the history, making its answer this session's own"""
+    return bool(memory.get_all()) and refers_to_history(prompt)
+
+
+async def _coalesce(
+    flight: SingleFlight,
+    key,
+    memory: BaseMemory,
+    prompt: str,
+    func,
+    progress: Callable[[str], None] = lambda message: None,
+):
+    """
+    Share one run of `func` among concurrent askers of the same standalone question, returning its result and
+    whether it was another asker's run. Only the chat engine of that asker records the exchange in its memory.
+    `func` is given a progress callback reporting to the `progress` of every asker sharing the run. Questions that
+    depend on the asker's history run on their own.
+    """
+    if _depends_on_history(memory, prompt):
+        return await func(progress), False
+    ran = False
+
+    async def run(report_progress):
+        nonlocal ran
+        ran = True
+        return await func(report_progress)
+
+    result = await flight.do(key, run, progress)
+    return result, not ran
+
+
+def _record_exchange(memory: BaseMemory, prompt: str, answer: str):
+    """Write a turn answered without the session's own chat engine into its memory, for the follow-ups"""
+    memory.put(ChatMessage(role=MessageRole.USER, content=prompt))
+    memory.put(ChatMessage(role=MessageRole.ASSISTANT, content=answer))
+
+
+async def _lookup_cached_answer(article_id: str, model: str, prompt: str, memory: BaseMemory):
+    # Follow-ups condensed with the history are answered in the context of their own conversation, never from or
+    # for another one; standalone questions are shared whatever turn of a session they are asked in
+    if not settings.QA_CACHE_ENABLED or _depends_on_history(memory, prompt):
+        return None, None
+    question_embedding = await get_embed_model().aget_query_embedding(prompt)
+    cached = answer_cache.lookup(article_id, model, question_embedding)
+    if cached:
+        logger.debug(f"Answer cache hit for article {article_id}: {cached.question}")
+    return cached, question_embedding
+
+
+async def _get_chat_engine(article_id: str, prompt: str, model: str, user_id: int, memory: BaseMemory):
+    """
+    The chat engine answering with the requested model, or the routed one, and the routing decision if any. A
+    routed question is retrieved once, for the router's scores and for the answer.
+    """
+    if model != AUTO_MODEL:
+        return await run_llm(get_chat_engine, user_id, article_id, model), None
+    retriever = await run_llm(get_retriever, article_id)
+    if _depends_on_history(memory, prompt):
+        # The engine retrieves with the condensed question, unknown until the condense call
+        decision = model_router.route(prompt, None)
+    else:
+        nodes, dense_scores = await aretrieve_with_dense_scores(retriever, prompt)
+        decision = model_router.route(prompt, dense_scores)
+        retriever = PrecomputedRetriever(retriever, prompt, nodes)
+    chat_engine = await run_llm(
+        get_chat_engine, user_id, article_id, decision.model, AUTO_MODEL, retriever
+    )
+    return chat_engine, decision
 
-async def process_qa_query(
-    article_id: str, prompt: str, model: str, user_id: int
-) -> QAResponse:
-    """Process a Q/A query and store the result"""
-    chat_engine = get_chat_engine(user_id, article_id, model)
-    response = chat_engine.chat(prompt)
 
+def _save_qa_history(
+    article_id: str, prompt: str, answer: str, sources: List[dict], model: str, user_id: int
+):
     qa_history = QAHistory(
         id=uuid.uuid4().hex,
         a_id=article_id,
         question=prompt,
-        answer=response.response,
-        referenced_pages=json.dumps([src.model_dump() for src in response.sources]),
+        answer=answer,
+        referenced_pages=json.dumps(sources),
         user_id=user_id,
         model=model,
     )
@@ -30,11 +134,124 @@ async def process_qa_query(
         session.add(qa_history)
         session.commit()
 
-    return response.response
+
+async def process_qa_query(
+    article_id: str, prompt: str, model: str, user_id: int
+) -> QAResponse:
+    """Process a Q/A query and store the result"""
+    memory = await run_llm(get_chat_memory, user_id, article_id, model)
+    cached, question_embedding = await _lookup_cached_answer(article_id, model, prompt, memory)
+
+    if cached:
+        answer, sources = cached.answer, cached.sources
+        answered_by = model
+        _record_exchange(memory, prompt, answer)
+    else:
+        async def answer_query(progress):
+            start = time.perf_counter()
+            chat_engine, decision = await _get_chat_engine(article_id, prompt, model, user_id, memory)
+            response = await chat_engine.achat(prompt)
+            answer = response.response
+            sources = [src.model_dump() for src in response.sources]
+            if decision:
+                model_router.record(decision, time.perf_counter() - start)
+            if question_embedding is not None:
+                answer_cache.store(
+                    article_id, model, prompt, question_embedding, answer, sources
+                )
+            return answer, sources, auto_model_label(decision.model) if decision else model
+
+        (answer, sources, answered_by), shared = await _coalesce(
+            qa_flight, (article_id, model, normalize_prompt(prompt)), memory, prompt, answer_query
+        )
+        if shared:
+            _record_exchange(memory, prompt, answer)
+
+    await run_db(_save_qa_history, article_id, prompt, answer, sources, answered_by, user_id)
+    return answer
+
+
+async def stream_qa_query(
+    article_id: str, prompt: str, model: str, user_id: int
+) -> AsyncIterator[str]:
+    """Stream the answer to a Q/A query token by token, storing the result once the stream completes"""
+    memory = await run_llm(get_chat_memory, user_id, article_id, model)
+    cached, question_embedding = await _lookup_cached_answer(article_id, model, prompt, memory)
+
+    if cached:
+        answer, sources = cached.answer, cached.sources
+        answered_by = model
+        _record_exchange(memory, prompt, answer)
+        yield answer
+    else:
+        start = time.perf_counter()
+        chat_engine, decision = await _get_chat_engine(article_id, prompt, model, user_id, memory)
+        response = await chat_engine.astream_chat(prompt)
+        async for token in response.async_response_gen():
+            yield token
+        answer = response.response
+        sources = [src.model_dump() for src in response.sources]
+        if decision:
+            model_router.record(decision, time.perf_counter() - start)
+        if question_embedding is not None:
+            answer_cache.store(
+                article_id, model, prompt, question_embedding, answer, sources
+            )
+        answered_by = auto_model_label(decision.model) if decision else model
+
+    await run_db(_save_qa_history, article_id, prompt, answer, sources, answered_by, user_id)
+
+
+def _select_recent_qa_history() -> List[tuple]:
+    since = datetime.now() - timedelta(seconds=settings.QA_CACHE_TTL_SECONDS)
+    with db_session() as session:
+        history = (
+            session.query(QAHistory)
+            .filter(QAHistory.created_at >= since)
+            .order_by(QAHistory.created_at.desc())
+            .limit(settings.QA_CACHE_MAX_ENTRIES)
+            .all()
+        )
+        return [
+            (h.a_id, h.model, h.question, h.answer, h.referenced_pages, h.created_at)
+            for h in history
+        ]
+
+
+async def seed_answer_cache_from_history():
+    """Warm the answer cache with the questions answered within the cache TTL"""
+    # Questions that only made sense within their conversation were answered from it
+    rows = [row for row in await run_db(_select_recent_qa_history) if not refers_to_history(row[2])]
+    if not rows:
+        return 0
+
+    embeddings = await get_embed_model().aget_text_embedding_batch(
+        [question for _, _, question, *_ in rows]
+    )
+    # Oldest first, so the most recent answer wins for duplicate questions
+    for (a_id, model, question, answer, sources, created_at), embedding in reversed(
+        list(zip(rows, embeddings))
+    ):
+        # Routed answers were cached under "auto", the model they were requested with
+        answer_cache.store(
+            a_id,
+            requested_model(model),
+            question,
+            embedding,
+            answer,
+            json.loads(sources) if sources else [],
+            created_at=created_at.timestamp(),
+        )
+    logger.info(f"Seeded answer cache with {len(rows)} questions from qa_history")
+    return len(rows)
 
 
 async def get_qa_history(article_id: int, user_id: int) -> List[dict]:
     """Retrieve Q/A history for an article"""
+    return await run_db(_select_qa_history, article_id, user_id)
+
+
+def _select_qa_history(article_id: int, user_id: int) -> List[dict]:
     with db_session() as session:
         history = (
             session.query(QAHistory)
@@ -61,11 +278,35 @@ async def generate_research_report(
     article_id: str,
     prompt: str,
     model: str,
-    user_id: int
+    user_id: int,
+    progress: Callable[[str], None] = lambda message: None,
 ):
     """Generate a research report from multiple questions"""
-    report_engine = get_report_engine(user_id, article_id, model)
-    response = report_engine.chat(prompt)
+    memory = await run_llm(get_report_memory, user_id, article_id, model)
+    report, shared = await _coalesce(
+        report_flight,
+        (article_id, model, normalize_prompt(prompt)),
+        memory,
+        prompt,
+        lambda report_progress: _generate_research_report(article_id, prompt, model, user_id, report_progress),
+        progress,
+    )
+    if shared:
+        _record_exchange(memory, prompt, report["response"])
+    return report
+
+
+async def _generate_research_report(
+    article_id: str,
+    prompt: str,
+    model: str,
+    user_id: int,
+    progress: Callable[[str], None],
+):
+    progress("Loading the article index")
+    report_engine = await run_llm(get_report_engine, user_id, article_id, model)
+    progress("Generating the report")
+    response = await report_engine.achat(prompt)
     formatted_response = response.response
 
     # Store report
@@ -79,20 +320,29 @@ async def generate_research_report(
         validated=False,
     )
 
-    with db_session() as session:
-        session.add(report)
-        session.commit()
-        session.refresh(report)
+    progress("Saving the report")
+    await run_db(_save_report, report)
     return {
         "response": formatted_response,
         "report_id": report.id,
     }
 
 
+def _save_report(report: ResearchNotes):
+    with db_session() as session:
+        session.add(report)
+        session.commit()
+        session.refresh(report)
+
+
 async def index_report(
     article_id: str, report_id: int, user_id: int
 ):
     """Validate and index a report"""
+    return await run_db(_validate_report, article_id, report_id)
+
+
+def _validate_report(article_id: str, report_id: int):
     with db_session() as session:
         report = (
             session.query(ResearchNotes)
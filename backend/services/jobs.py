@@ -0,0 +1,37 @@
+from backend.config import settings
+from backend.schemas.articles import ArticleSummariesResponse
+from backend.services.articles import _generate_summaries
+from backend.services.chat import generate_research_report
+from backend.utilities.catalog_cache import ArticleRecord
+from backend.utilities.job_queue import Job, JobQueue
+
+SUMMARY = "summary"
+REPORT = "report"
+
+job_queue = JobQueue(
+    workers=settings.JOB_WORKERS, retention_seconds=settings.JOB_RETENTION_SECONDS
+)
+
+
+def submit_summary_job(article: ArticleRecord) -> Job:
+    async def run(progress):
+        progress("Downloading, parsing and summarizing the article")
+        summaries = await _generate_summaries(article.a_id)
+        if not summaries:
+            raise RuntimeError("Failed to generate summary")
+        return ArticleSummariesResponse(
+            article_id=article.a_id,
+            title=article.title,
+            summaries=summaries,
+        ).model_dump()
+
+    # One run produces every length, so requests for any length of the article share the job
+    return job_queue.submit(SUMMARY, article.a_id, run)
+
+
+def submit_report_job(article_id: str, prompt: str, model: str, user_id: int) -> Job:
+    async def run(progress):
+        return await generate_research_report(article_id, prompt, model, user_id, progress)
+
+    # Each user's report is generated in, and recorded to, that user's own report session, and only they can read it
+    return job_queue.submit(REPORT, (article_id, model, prompt), run, user_id=user_id)
@@ -1,65 +1,235 @@
 import base64
+import logging
+import os
 from functools import lru_cache
-from typing import List, Any
+from typing import List, Any, Optional
 
-from llama_index.core import VectorStoreIndex, Settings
+from llama_index.core import VectorStoreIndex
+from llama_index.core.base.base_retriever import BaseRetriever
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.memory import ChatMemoryBuffer
+from llama_index.core.query_engine import RetrieverQueryEngine
+from llama_index.core.vector_stores import MetadataFilter, MetadataFilters
+from llama_index.core.vector_stores.types import BasePydanticVectorStore
 from llama_index.embeddings.openai import OpenAIEmbedding
 from llama_index.llms.openai import OpenAI
 from llama_index.vector_stores.milvus import MilvusVectorStore
 from pydantic import BaseModel, Field
 
 from backend.config import settings
+from backend.utilities.condensing import AdaptiveCondenseChatEngine, CondenseStats
+from backend.utilities.context_packing import ContextPacker, ContextPackingStats
+from backend.utilities.embedding_cache import cached_embed_model
+from backend.utilities.hybrid_retrieval import HybridRetriever
+from backend.utilities.lexical_index import LexicalIndex
+from backend.utilities.local_vector_store import LocalVectorStore
+from backend.utilities.reranking import BudgetedReranker, RerankingRetriever, get_scorer
+from backend.utilities.session_pool import ChatSessionPool
+
+logger = logging.getLogger(__name__)
 
 CHAT_ENGINE_CACHE = {}
+# Metadata key stamped on every indexed node by the DAG indexer, used to scope retrieval to one article
+ARTICLE_ID_METADATA_KEY = "a_id"
 CHAT_LLM_SYSTEM_PROMPT = """You are a multimodal assistant designed to efficiently answer user queries by retrieving relevant document excerpts. Only return the most relevant information instead of full documents, and combine text and image data for a comprehensive response."""
+REPORT_LLM_SYSTEM_PROMPT = """\
+You are a report generation assistant tasked with producing a well-formatted context given parsed context.
+
+You will be given context from one or more reports that take the form of parsed text.
+
+You are responsible for producing a report with interleaving text and images - in the format of interleaving text and "image" blocks.
+Since you cannot directly produce an image, the image block takes in a file path - you should write in the file path of the image instead.
+
+How do you know which image to generate? Each context chunk will contain metadata including an image render of the source chunk, given as a file path. 
+Include ONLY the images from the chunks that have heavy visual elements (you can get a hint of this if the parsed text contains a lot of tables).
+You MUST include at least one image block in the output.
+
+You MUST output your response as a tool call in order to adhere to the required output format. Do NOT give back normal text.
+
+"""
+
+context_packing_stats = ContextPackingStats()
+chat_context_packer = ContextPacker(settings.CONTEXT_TOKEN_BUDGET, context_packing_stats)
+# The report prompt asks for the image file paths of the chunks
+report_context_packer = ContextPacker(
+    settings.CONTEXT_TOKEN_BUDGET, context_packing_stats, keep_metadata_keys=["image"]
+)
+condense_stats = CondenseStats()
+
+# Chat engines are built per request from the shared index and LLM clients; only the chat memory of a session
+# (user, article, model, engine) is kept between requests
+chat_sessions = ChatSessionPool(
+    token_limit=settings.CHAT_SESSION_TOKEN_LIMIT,
+    ttl_seconds=settings.CHAT_SESSION_TTL_SECONDS,
+    max_bytes=settings.CHAT_SESSIONS_MAX_BYTES,
+)
 
 
 @lru_cache
-def get_index(collection_name: str) -> VectorStoreIndex:
-    vector_store = MilvusVectorStore(
+def get_embed_model() -> BaseEmbedding:
+    return cached_embed_model(
+        OpenAIEmbedding(model="text-embedding-3-small", embed_batch_size=100), dim=1536
+    )
+
+
+def get_vector_store(collection_name: str) -> BasePydanticVectorStore:
+    if settings.VECTOR_STORE == "local":
+        path = os.path.join(settings.LOCAL_VECTOR_STORE_DIR, collection_name)
+        if not os.path.isdir(path) or not os.listdir(path):
+            logger.warning(
+                f"The local vector store at {path} is empty until the indexer writes to it; check that "
+                "LOCAL_VECTOR_STORE_DIR is on the volume the indexer writes to"
+            )
+        return LocalVectorStore(
+            path,
+            dim=1536,
+            partition_key=ARTICLE_ID_METADATA_KEY,
+            ivf_min_vectors=settings.LOCAL_VECTOR_STORE_IVF_MIN_VECTORS,
+            nprobe=settings.LOCAL_VECTOR_STORE_NPROBE,
+        )
+    return MilvusVectorStore(
         uri=settings.MILVUS_CLOUD_URI,
         token=settings.MILVUS_API_KEY,
         collection_name=collection_name,
         dim=1536
     )
-    Settings.embed_model = OpenAIEmbedding(
-        model="text-embedding-3-small", embed_batch_size=100
+
+
+@lru_cache
+def get_index(collection_name: str) -> VectorStoreIndex:
+    return VectorStoreIndex.from_vector_store(
+        vector_store=get_vector_store(collection_name), embed_model=get_embed_model()
     )
-    return VectorStoreIndex.from_vector_store(vector_store=vector_store)
 
 
-@lru_cache(maxsize=128)
-def get_chat_engine(user_id: int, article_id: str, model: str = "gpt-4o"):
-    index = get_index(settings.MILVUS_DOCUMENTS_COLLECTION)
-    _llm = OpenAI(
-        model=model,
-        system_prompt="You are a multimodal assistant designed to efficiently answer user queries by retrieving relevant document excerpts. Only return the most relevant information instead of full documents, and combine text and image data for a comprehensive response.",
+def get_article_filters(article_id: str) -> MetadataFilters:
+    """Restrict a vector search to the nodes of a single article (a partition-key pre-filter in either store)"""
+    return MetadataFilters(
+        filters=[MetadataFilter(key=ARTICLE_ID_METADATA_KEY, value=article_id)]
     )
-    return index.as_chat_engine(similarity_top_k=10, llm=_llm, response_mode="compact")
 
 
-@lru_cache(maxsize=128)
-def get_report_engine(user_id: int, article_id: str, model: str = "gpt-4o"):
+@lru_cache
+def get_lexical_index() -> Optional[LexicalIndex]:
+    if not settings.HYBRID_RETRIEVAL_ENABLED:
+        return None
+    if not os.path.exists(settings.LEXICAL_INDEX_PATH):
+        logger.warning(
+            f"No lexical index at {settings.LEXICAL_INDEX_PATH}, retrieval is dense only until the indexer writes "
+            "one there; check that LEXICAL_INDEX_PATH is on the volume the indexer writes to"
+        )
+    return LexicalIndex(settings.LEXICAL_INDEX_PATH)
+
+
+@lru_cache
+def get_reranker() -> Optional[BudgetedReranker]:
+    if not settings.RERANK_ENABLED:
+        return None
+    return BudgetedReranker(
+        get_scorer(settings.RERANK_MODEL),
+        top_n=settings.RERANK_TOP_N,
+        budget_seconds=settings.RERANK_BUDGET_MS / 1000,
+    )
+
+
+def get_retriever(article_id: str) -> BaseRetriever:
+    """
+    Hybrid BM25 + vector retrieval over an article, fused by reciprocal rank, or dense retrieval if the article
+    has no lexical index. With reranking, it retrieves the many candidates the reranker picks from.
+    """
     index = get_index(settings.MILVUS_DOCUMENTS_COLLECTION)
-    _llm = OpenAI(
-        model=model,
-        system_prompt="""\
-You are a report generation assistant tasked with producing a well-formatted context given parsed context.
+    lexical_index = get_lexical_index()
+    reranking = settings.RERANK_ENABLED
+    if lexical_index is not None and not lexical_index.has_article(article_id):
+        logger.warning(f"Article {article_id} is not in the lexical index, retrieving it by vector only")
+        lexical_index = None
+    if lexical_index is None:
+        return index.as_retriever(
+            similarity_top_k=settings.RERANK_CANDIDATES if reranking else 10,
+            filters=get_article_filters(article_id),
+        )
+    candidates = max(settings.HYBRID_CANDIDATES, settings.RERANK_CANDIDATES if reranking else 0)
+    return HybridRetriever(
+        index.as_retriever(
+            similarity_top_k=candidates,
+            filters=get_article_filters(article_id),
+        ),
+        lexical_index,
+        article_id,
+        top_k=settings.RERANK_CANDIDATES if reranking else settings.HYBRID_TOP_K,
+        candidates=candidates,
+    )
 
-You will be given context from one or more reports that take the form of parsed text.
 
-You are responsible for producing a report with interleaving text and images - in the format of interleaving text and "image" blocks.
-Since you cannot directly produce an image, the image block takes in a file path - you should write in the file path of the image instead.
+def _as_chat_engine(retriever: BaseRetriever, llm, memory, context_packer: ContextPacker):
+    # Retrieves with the message as asked and answers in one completion; only follow-ups that refer back to the
+    # history are first rewritten into a standalone question, by the small condense model
+    reranker = get_reranker()
+    query_engine = RetrieverQueryEngine.from_args(
+        RerankingRetriever(retriever, reranker) if reranker else retriever,
+        llm=llm,
+        response_mode="compact",
+        node_postprocessors=[context_packer],
+    )
+    return AdaptiveCondenseChatEngine.from_defaults(
+        query_engine=query_engine,
+        llm=get_condense_llm(),
+        memory=memory,
+        condense_stats=condense_stats,
+    )
 
-How do you know which image to generate? Each context chunk will contain metadata including an image render of the source chunk, given as a file path. 
-Include ONLY the images from the chunks that have heavy visual elements (you can get a hint of this if the parsed text contains a lot of tables).
-You MUST include at least one image block in the output.
 
-You MUST output your response as a tool call in order to adhere to the required output format. Do NOT give back normal text.
+@lru_cache
+def get_condense_llm() -> OpenAI:
+    return OpenAI(model=settings.CONDENSE_MODEL, temperature=0)
+
+
+@lru_cache
+def get_chat_llm(model: str) -> OpenAI:
+    return OpenAI(model=model, system_prompt=CHAT_LLM_SYSTEM_PROMPT)
 
-"""    )
-    formatted_llm = _llm.as_structured_llm(output_cls=ReportOutput)
-    return index.as_chat_engine(similarity_top_k=10, llm=formatted_llm, response_mode="compact")
+
+@lru_cache
+def get_report_llm(model: str):
+    return OpenAI(model=model, system_prompt=REPORT_LLM_SYSTEM_PROMPT).as_structured_llm(
+        output_cls=ReportOutput
+    )
+
+
+def get_chat_memory(user_id: int, article_id: str, model: str) -> ChatMemoryBuffer:
+    return chat_sessions.memory(("chat", user_id, article_id, model))
+
+
+def get_chat_engine(
+    user_id: int,
+    article_id: str,
+    model: str = "gpt-4o",
+    session_model: Optional[str] = None,
+    retriever: Optional[BaseRetriever] = None,
+):
+    """
+    `session_model` keys the chat memory when it differs from the answering model, as for routed questions, and
+    `retriever` replaces the article's retriever, as for questions already retrieved while routing
+    """
+    return _as_chat_engine(
+        retriever or get_retriever(article_id),
+        get_chat_llm(model),
+        get_chat_memory(user_id, article_id, session_model or model),
+        chat_context_packer,
+    )
+
+
+def get_report_memory(user_id: int, article_id: str, model: str) -> ChatMemoryBuffer:
+    return chat_sessions.memory(("report", user_id, article_id, model))
+
+
+def get_report_engine(user_id: int, article_id: str, model: str = "gpt-4o"):
+    return _as_chat_engine(
+        get_retriever(article_id),
+        get_report_llm(model),
+        get_report_memory(user_id, article_id, model),
+        report_context_packer,
+    )
 
 
 class TextBlock(BaseModel):
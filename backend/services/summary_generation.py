@@ -1,15 +1,20 @@
 # SPDX-FileCopyrightText: Copyright (c) 2023-2024 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
 # SPDX-License-Identifier: Apache-2.0
 
-from llama_index.core import Settings
-from llama_index.core import VectorStoreIndex, StorageContext
-from llama_index.core.node_parser import SentenceSplitter
-from llama_index.embeddings.nvidia import NVIDIAEmbedding
+from typing import Dict, Iterable
+
 from llama_index.llms.nvidia import NVIDIA
-from llama_index.vector_stores.milvus import MilvusVectorStore
 
 from backend.config import settings
 from backend.utilities.document_processors import load_pdf_file
+from backend.utilities.summarization import MapReduceSummarizer
+
+LENGTH_PROMPTS = {
+    "short": "Provide a brief 2-3 sentence summary of the main points in the document.",
+    "medium": "Provide a comprehensive paragraph summarizing the key points and main ideas in the document.",
+    "long": "Provide a detailed summary of the document, including main points, key details, and important conclusions.",
+}
+SUMMARY_LENGTHS = tuple(LENGTH_PROMPTS)
 
 
 class DocumentSummarizer:
@@ -17,57 +22,37 @@ class DocumentSummarizer:
         self.initialize_settings()
 
     def initialize_settings(self):
-        """Initialize LlamaIndex settings with NVIDIA models"""
-        Settings.embed_model = NVIDIAEmbedding(
-            model="nvidia/nv-embedqa-e5-v5", truncate="END"
+        """Initialize the map-reduce summarizer with the NVIDIA LLM"""
+        self.summarizer = MapReduceSummarizer(
+            NVIDIA(
+                model="mistralai/mistral-7b-instruct-v0.3",
+                nvidia_api_key=settings.NVIDIA_API_KEY,
+            ),
+            group_tokens=settings.SUMMARY_GROUP_TOKENS,
+            max_concurrency=settings.SUMMARY_MAX_CONCURRENCY,
         )
-        Settings.llm = NVIDIA(
-            model="mistralai/mistral-7b-instruct-v0.3",
-            nvidia_api_key=settings.NVIDIA_API_KEY,
-        )
-        Settings.text_splitter = SentenceSplitter(chunk_size=900)
-
-    def create_index(self, documents):
-        vector_store = MilvusVectorStore(
-            uri=settings.MILVUS_CLOUD_URI, token=settings.MILVUS_API_KEY, dim=1024
-        )
-        # vector_store = MilvusVectorStore(uri="./milvus_demo.db", dim=1024, overwrite=True) #For CPU only vector store
-        storage_context = StorageContext.from_defaults(vector_store=vector_store)
-        return VectorStoreIndex.from_documents(
-            documents, storage_context=storage_context
-        )
-
-    def generate_summary(self, index, doc_length="medium"):
-        """Generate a summary of the documents"""
-        length_prompts = {
-            "short": "Provide a brief 2-3 sentence summary of the main points in the document.",
-            "medium": "Provide a comprehensive paragraph summarizing the key points and main ideas in the document.",
-            "long": "Provide a detailed summary of the document, including main points, key details, and important conclusions.",
-        }
-        
-        prompt = length_prompts.get(doc_length, length_prompts["medium"])
-        query_engine = index.as_query_engine(similarity_top_k=1)
-        print(query_engine)
-        response = query_engine.query(prompt)
-        print(response.response)
-        return response.response
 
-    def summarize_directory(self, directory_path, summary_length="medium"):
-        """Process a directory of documents and generate a summary"""
+    def summarize_pdf(
+        self, pdf_path, summary_lengths: Iterable[str] = SUMMARY_LENGTHS
+    ) -> Dict[str, str]:
+        """Parse a PDF once and summarize all of it, writing a summary of each of the given lengths"""
 
-        print(f"Processing documents from directory: {directory_path}")
-        documents = load_pdf_file(directory_path)
+        print(f"Processing documents from: {pdf_path}")
+        documents = load_pdf_file(pdf_path)
         print(f"Found {len(documents)} documents")
 
-        print("Creating document index...")
-        index = self.create_index(documents)
-
-        print("Generating summary...")
-        summary = self.generate_summary(index, summary_length)
-        documents = load_pdf_file(directory_path)
-        print(f"Found {len(documents)} documents")
+        print("Generating summaries...")
+        result = self.summarizer.summarize(
+            documents,
+            {summary_length: LENGTH_PROMPTS[summary_length] for summary_length in summary_lengths},
+        )
+        for level in result.levels:
+            print(level)
+        return result.summaries
 
-        return summary
+    def summarize_directory(self, directory_path, summary_length="medium"):
+        """Process a directory of documents and generate a summary"""
+        return self.summarize_pdf(directory_path, [summary_length])[summary_length]
 
 
 def main():
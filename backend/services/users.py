@@ -7,6 +7,7 @@ from sqlalchemy.exc import IntegrityError
 from backend.database import db_session
 from backend.database.users import UserModel
 from backend.schemas.users import UserRequest, UserCreateRequest
+from backend.utilities.executors import run_auth, run_db
 
 logger = logging.getLogger(__name__)
 
@@ -22,24 +23,9 @@ async def _create_user(user: UserRequest) -> Optional[UserModel]:
         UserModel if creation successful, None if user already exists or on error
     """
     try:
-        # Using synchronous context manager
-        with db_session() as session:
-            # Convert the request to a UserCreateRequest for password hashing
-            user_create = UserCreateRequest(**user.model_dump())
-
-            # Create new user instance excluding id field
-            user_dict = user_create.model_dump(
-                exclude={"id"} if "id" in user_create.model_dump() else set()
-            )
-            new_user = UserModel(**user_dict)
-
-            # Add and commit
-            session.add(new_user)
-            session.commit()
-
-            # Refresh to get the generated ID and timestamps
-            session.refresh(new_user)
-            return new_user
+        # Convert the request to a UserCreateRequest for password hashing
+        user_create = await run_auth(UserCreateRequest, **user.model_dump())
+        return await run_db(_insert_user, user_create)
 
     except IntegrityError as ie:
         logger.error(f"User creation failed - integrity error: {str(ie)}")
@@ -50,6 +36,24 @@ async def _create_user(user: UserRequest) -> Optional[UserModel]:
         return None
 
 
+def _insert_user(user_create: UserCreateRequest) -> UserModel:
+    # Using synchronous context manager
+    with db_session() as session:
+        # Create new user instance excluding id field
+        user_dict = user_create.model_dump(
+            exclude={"id"} if "id" in user_create.model_dump() else set()
+        )
+        new_user = UserModel(**user_dict)
+
+        # Add and commit
+        session.add(new_user)
+        session.commit()
+
+        # Refresh to get the generated ID and timestamps
+        session.refresh(new_user)
+        return new_user
+
+
 async def _get_user(username: str) -> Optional[UserModel]:
     """
     Retrieve a user by username.
@@ -61,26 +65,30 @@ async def _get_user(username: str) -> Optional[UserModel]:
         UserModel if found, None if not found or on error
     """
     try:
-        # Using synchronous context manager
-        with db_session() as session:
-            # Use select to query the user
-            stmt = select(UserModel).where(UserModel.username == username)
-
-            # Execute query and return first result or None
-            result = session.execute(stmt)
-            user = result.scalar_one_or_none()
-
-            if user:
-                # Ensure the instance is attached to this session
-                session.refresh(user)
-
-            return user
+        return await run_db(_select_user, username)
 
     except Exception as e:
         logger.error(f"Error fetching user {username}: {str(e)}", exc_info=True)
         return None
 
 
+def _select_user(username: str) -> Optional[UserModel]:
+    # Using synchronous context manager
+    with db_session() as session:
+        # Use select to query the user
+        stmt = select(UserModel).where(UserModel.username == username)
+
+        # Execute query and return first result or None
+        result = session.execute(stmt)
+        user = result.scalar_one_or_none()
+
+        if user:
+            # Ensure the instance is attached to this session
+            session.refresh(user)
+
+        return user
+
+
 async def _update_user(username: str, update_data: dict) -> Optional[UserModel]:
     """
     Update user details.
@@ -93,23 +101,7 @@ async def _update_user(username: str, update_data: dict) -> Optional[UserModel]:
         Updated UserModel if successful, None if user not found or on error
     """
     try:
-        with db_session() as session:
-            # Get existing user
-            stmt = select(UserModel).where(UserModel.username == username)
-            result = session.execute(stmt)
-            user = result.scalar_one_or_none()
-
-            if not user:
-                return None
-
-            # Update fields
-            for key, value in update_data.items():
-                if hasattr(user, key):
-                    setattr(user, key, value)
-
-            session.commit()
-            session.refresh(user)
-            return user
+        return await run_db(_update_user_row, username, update_data)
 
     except IntegrityError as ie:
         logger.error(f"User update failed - integrity error: {str(ie)}")
@@ -120,6 +112,26 @@ async def _update_user(username: str, update_data: dict) -> Optional[UserModel]:
         return None
 
 
+def _update_user_row(username: str, update_data: dict) -> Optional[UserModel]:
+    with db_session() as session:
+        # Get existing user
+        stmt = select(UserModel).where(UserModel.username == username)
+        result = session.execute(stmt)
+        user = result.scalar_one_or_none()
+
+        if not user:
+            return None
+
+        # Update fields
+        for key, value in update_data.items():
+            if hasattr(user, key):
+                setattr(user, key, value)
+
+        session.commit()
+        session.refresh(user)
+        return user
+
+
 async def _delete_user(username: str) -> bool:
     """
     Delete a user from the database.
@@ -131,18 +143,22 @@ async def _delete_user(username: str) -> bool:
         True if user was deleted, False if user not found or on error
     """
     try:
-        with db_session() as session:
-            stmt = select(UserModel).where(UserModel.username == username)
-            result = session.execute(stmt)
-            user = result.scalar_one_or_none()
-
-            if not user:
-                return False
-
-            session.delete(user)
-            session.commit()
-            return True
+        return await run_db(_delete_user_row, username)
 
     except Exception as e:
         logger.error(f"Error deleting user {username}: {str(e)}", exc_info=True)
         return False
+
+
+def _delete_user_row(username: str) -> bool:
+    with db_session() as session:
+        stmt = select(UserModel).where(UserModel.username == username)
+        result = session.execute(stmt)
+        user = result.scalar_one_or_none()
+
+        if not user:
+            return False
+
+        session.delete(user)
+        session.commit()
+        return True
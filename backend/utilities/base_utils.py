@@ -1,3 +1,4 @@
+import hashlib
 import logging
 import os
 
@@ -6,6 +7,7 @@ from botocore.exceptions import ClientError
 from passlib.context import CryptContext
 
 from backend.config import settings
+from backend.utilities.single_flight import ThreadSingleFlight
 
 LOCAL_EXTRACTS_DIRECTORY = os.path.join("resources", "extracts")
 BASE_RESOURCES_PATH = os.path.join("resources")
@@ -15,6 +17,7 @@ CACHED_RESOURCES_PATH = os.path.join(BASE_RESOURCES_PATH, "cached")
 
 logger = logging.getLogger(__name__)
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+s3_downloads = ThreadSingleFlight()
 
 
 def get_password_hash(plain_password: str) -> str:
@@ -29,6 +32,14 @@ def ensure_directory_exists(directory):
     os.makedirs(directory, exist_ok=True)
 
 
+def file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
 def get_s3_client():
     return boto3.client(
         "s3",
@@ -44,9 +55,29 @@ def load_s3_bucket():
     raise ValueError("Missing AWS S3 Bucket")
 
 
-def fetch_file_from_s3(key: str, dest_filename: str | None):
+def _download_file_from_s3(key: str, local_filepath: str):
+    # Check again, another download of the same file may have completed meanwhile
+    if os.path.exists(local_filepath):
+        return local_filepath
     s3_client = get_s3_client()
+    try:
+        _ = s3_client.head_object(Bucket=load_s3_bucket(), Key=key)
+        # Readers only ever see a complete file
+        partial_filepath = f"{local_filepath}.part"
+        s3_client.download_file(load_s3_bucket(), key, partial_filepath)
+        os.replace(partial_filepath, local_filepath)
+        logger.info(f"Downloaded file {key} from S3")
+        return local_filepath
+    except ClientError as e:
+        if e.response["Error"]["Code"] == "404":  # File not found
+            logger.error(f"File {key} not found on S3")
+            return False
+        else:
+            logger.error("")
+            return False
+
 
+def fetch_file_from_s3(key: str, dest_filename: str | None):
     filename = (
         os.path.basename(key)
         if not dest_filename
@@ -56,16 +87,7 @@ def fetch_file_from_s3(key: str, dest_filename: str | None):
     # Check locally before downloading
     if os.path.exists(local_filepath):
         return local_filepath
-    else:
-        try:
-            _ = s3_client.head_object(Bucket=load_s3_bucket(), Key=key)
-            s3_client.download_file(load_s3_bucket(), key, local_filepath)
-            logger.info(f"Downloaded file {key} from S3")
-            return local_filepath
-        except ClientError as e:
-            if e.response["Error"]["Code"] == "404":  # File not found
-                logger.error(f"File {key} not found on S3")
-                return False
-            else:
-                logger.error("")
-                return False
+    # Concurrent requests for the same file share a single download
+    return s3_downloads.do(
+        (key, local_filepath), lambda: _download_file_from_s3(key, local_filepath)
+    )
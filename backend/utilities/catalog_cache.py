@@ -0,0 +1,153 @@
+import asyncio
+import base64
+import bisect
+import hashlib
+import json
+import time
+from dataclasses import astuple, dataclass, fields
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+# Keyset of the catalog order, newest first: (publication_date, a_id)
+SortKey = Tuple[datetime, str]
+
+
+@dataclass(frozen=True, slots=True)
+class ArticleRecord:
+    a_id: str
+    title: str
+    description: str
+    publication_date: datetime
+    authors: str
+    pdf_url: str
+    image_url: str
+
+    @classmethod
+    def from_model(cls, article) -> "ArticleRecord":
+        return cls(
+            a_id=article.a_id,
+            title=article.title,
+            description=article.description,
+            publication_date=article.publication_date,
+            authors=article.authors,
+            pdf_url=article.pdf_url,
+            image_url=article.image_url,
+        )
+
+    @property
+    def sort_key(self) -> SortKey:
+        return self.publication_date, self.a_id
+
+    def project(self, field_names: List[str]) -> dict:
+        return {name: getattr(self, name) for name in field_names}
+
+
+ARTICLE_FIELDS = [field.name for field in fields(ArticleRecord)]
+
+
+def encode_cursor(key: SortKey) -> str:
+    return base64.urlsafe_b64encode(
+        json.dumps([key[0].isoformat(), key[1]]).encode("utf-8")
+    ).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> SortKey:
+    """Raises ValueError for a cursor that was not produced by `encode_cursor`."""
+    try:
+        publication_date, a_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return datetime.fromisoformat(publication_date), str(a_id)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+@dataclass(frozen=True, slots=True)
+class CatalogSnapshot:
+    articles: Tuple[ArticleRecord, ...]
+    by_id: Dict[str, ArticleRecord]
+    etag: str
+    loaded_at: float
+    # The sort keys of `articles` in ascending order, for bisecting a cursor
+    ascending_keys: Tuple[SortKey, ...]
+
+    @classmethod
+    def build(cls, records: List[ArticleRecord]) -> "CatalogSnapshot":
+        articles = tuple(sorted(records, key=lambda record: record.sort_key, reverse=True))
+        digest = hashlib.sha256(
+            json.dumps([astuple(record) for record in articles], default=str).encode("utf-8")
+        ).hexdigest()
+        return cls(
+            articles=articles,
+            by_id={record.a_id: record for record in articles},
+            etag=f'"{digest[:32]}"',
+            loaded_at=time.monotonic(),
+            ascending_keys=tuple(record.sort_key for record in reversed(articles)),
+        )
+
+    def page(
+        self,
+        after: Optional[SortKey],
+        limit: int,
+        predicate: Callable[[ArticleRecord], bool] = lambda record: True,
+    ) -> Tuple[List[ArticleRecord], Optional[SortKey]]:
+        """
+        Keyset pagination: up to `limit` matching articles that sort strictly after the `after` key, and the key to
+        continue from, or None on the last page.
+        """
+        start = 0
+        if after is not None:
+            start = len(self.articles) - bisect.bisect_left(self.ascending_keys, after)
+        items = []
+        for index in range(start, len(self.articles)):
+            record = self.articles[index]
+            if predicate(record):
+                if len(items) == limit:
+                    return items, items[-1].sort_key
+                items.append(record)
+        return items, None
+
+
+class CatalogCache:
+    """
+    Read-through cache of the article catalog. The whole catalog is loaded at once into an immutable snapshot,
+    indexed by a_id and tagged with an ETag derived from its content. Snapshots expire after `ttl_seconds`;
+    concurrent requests for an expired catalog share a single load, and `invalidate` drops it immediately.
+    """
+
+    def __init__(
+        self, loader: Callable[[], Awaitable[List[ArticleRecord]]], ttl_seconds: int
+    ):
+        self.loader = loader
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.loads = 0
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._generation = 0
+        self._lock = asyncio.Lock()
+
+    def _is_fresh(self, snapshot: Optional[CatalogSnapshot]) -> bool:
+        return (
+            snapshot is not None
+            and time.monotonic() - snapshot.loaded_at < self.ttl_seconds
+        )
+
+    async def get(self) -> CatalogSnapshot:
+        snapshot = self._snapshot
+        if self._is_fresh(snapshot):
+            self.hits += 1
+            return snapshot
+
+        async with self._lock:
+            if self._is_fresh(self._snapshot):
+                self.hits += 1
+                return self._snapshot
+            generation = self._generation
+            snapshot = CatalogSnapshot.build(await self.loader())
+            self.loads += 1
+            # A load that raced with an invalidation may predate the change, so serve it once but do not keep it
+            if generation == self._generation:
+                self._snapshot = snapshot
+            return snapshot
+
+    def invalidate(self):
+        self._generation += 1
+        self._snapshot = None
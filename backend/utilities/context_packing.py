@@ -0,0 +1,93 @@
+import logging
+import threading
+from typing import List, Optional, Sequence
+
+from llama_index.core.postprocessor.types import BaseNodePostprocessor
+from llama_index.core.schema import BaseNode, MetadataMode, NodeWithScore, QueryBundle
+from llama_index.core.utils import get_tokenizer
+from pydantic import Field, PrivateAttr
+
+logger = logging.getLogger(__name__)
+
+# Set by the indexer: the number of tokens of the node's LLM view
+TOKEN_COUNT_METADATA_KEY = "token_count"
+# Metadata that only costs tokens in a prompt or an embedding: bounding boxes, local file paths, ids, and the
+# caption that the text of table and image nodes already contains. Must match the DAG indexer's list.
+NOISY_METADATA_KEYS = ("x1", "y1", "x2", "x3", "dataframe", "image", "source", "caption", TOKEN_COUNT_METADATA_KEY)
+
+
+class ContextPackingStats:
+    def __init__(self):
+        self.requests = 0
+        self.tokens_before = 0
+        self.tokens_after = 0
+        self._lock = threading.Lock()
+
+    def record(self, tokens_before: int, tokens_after: int):
+        with self._lock:
+            self.requests += 1
+            self.tokens_before += tokens_before
+            self.tokens_after += tokens_after
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "tokens_before": self.tokens_before,
+                "tokens_after": self.tokens_after,
+                "saved_ratio": 1 - self.tokens_after / self.tokens_before if self.tokens_before else 0.0,
+            }
+
+
+class ContextPacker(BaseNodePostprocessor):
+    """
+    Packs the retrieved nodes into a token budget for the LLM context. Noisy metadata is dropped from each node's
+    LLM view and `keep_metadata_keys` put back into it, then nodes are taken in the order they come, best first,
+    while they fit in `token_budget`; the first node is always kept. Node sizes come from the token count stored at
+    index time, counted here for nodes indexed before it was. Records the context tokens of every request with and without
+    packing in `stats`.
+    """
+
+    token_budget: int = Field(description="Maximum number of context tokens.")
+    keep_metadata_keys: List[str] = Field(default_factory=list, description="Noisy metadata the LLM still needs.")
+    _stats: ContextPackingStats = PrivateAttr()
+    _tokenizer = PrivateAttr()
+
+    def __init__(self, token_budget: int, stats: ContextPackingStats, keep_metadata_keys: Sequence[str] = ()):
+        super().__init__(token_budget=token_budget, keep_metadata_keys=list(keep_metadata_keys))
+        self._stats = stats
+        self._tokenizer = get_tokenizer()
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "ContextPacker"
+
+    def count_tokens(self, node: BaseNode) -> int:
+        return len(self._tokenizer(node.get_content(metadata_mode=MetadataMode.LLM)))
+
+    def _postprocess_nodes(
+        self, nodes: List[NodeWithScore], query_bundle: Optional[QueryBundle] = None
+    ) -> List[NodeWithScore]:
+        tokens_before = sum(self.count_tokens(node.node) for node in nodes)
+
+        packed, tokens_after = [], 0
+        # In the order retrieved, or reranked, the scores of different retrievers are not comparable
+        for node in nodes:
+            # A copy, the retrieved nodes are shared with the other holders of the index
+            packed_node = node.node.model_copy()
+            packed_node.excluded_llm_metadata_keys = sorted(
+                (set(packed_node.excluded_llm_metadata_keys) | set(NOISY_METADATA_KEYS)) - set(self.keep_metadata_keys)
+            )
+            tokens = packed_node.metadata.get(TOKEN_COUNT_METADATA_KEY)
+            if tokens is None or self.keep_metadata_keys:
+                tokens = self.count_tokens(packed_node)
+            if packed and tokens_after + tokens > self.token_budget:
+                continue
+            packed.append(NodeWithScore(node=packed_node, score=node.score))
+            tokens_after += tokens
+
+        self._stats.record(tokens_before, tokens_after)
+        logger.info(
+            f"Packed {len(packed)}/{len(nodes)} nodes into {tokens_after} context tokens ({tokens_before} unpacked)"
+        )
+        return packed
@@ -1,71 +1,154 @@
 
+import asyncio
+import math
+import multiprocessing
 import os
 import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
 
 import fitz
 from llama_index.core import Document
 from pptx import Presentation
 
 from backend.utilities.nvidia_utils import (
-    describe_image, is_graph, process_graph, extract_text_around_item,
+    NvidiaVisionClient, describe_image, extract_text_around_item,
     process_text_blocks, save_uploaded_file
 )
 
+# Bump whenever a change to the parsing changes the documents it produces, so indexed PDFs are re-processed
+PROCESSOR_VERSION = "1"
+# Pages parsed per batch when streaming documents; bounds the memory held by a batch in flight
+PAGES_PER_BATCH = 16
 
-def get_pdf_documents(pdf_file):
-    """Process a PDF file and extract text, tables, and images."""
-    all_pdf_documents = []
-    ongoing_tables = {}
 
+def get_pdf_documents(pdf_file, workers=1):
+    """
+    Process a PDF file and extract text, tables, and images. With more than one worker, page ranges are parsed in
+    a process pool; the documents are identical to the serial path and in the same order.
+    """
+    return list(iter_pdf_documents(pdf_file, workers))
+
+def iter_pdf_documents(pdf_file, workers=1):
+    """Yield the documents of a PDF file in page order, one batch of pages at a time, as soon as each batch is parsed."""
     try:
-        f = fitz.open(stream=pdf_file.read(), filetype="pdf")
+        pdf_bytes = pdf_file.read()
+        f = fitz.open(stream=pdf_bytes, filetype="pdf")
     except Exception as e:
         print(f"Error opening or processing the PDF file: {e}")
-        return []
-
-    for i in range(len(f)):
-        page = f[i]
-        text_blocks = [block for block in page.get_text("blocks", sort=True) 
-                       if block[-1] == 0 and not (block[1] < page.rect.height * 0.1 or block[3] > page.rect.height * 0.9)]
-        grouped_text_blocks = process_text_blocks(text_blocks)
-        
-        table_docs, table_bboxes, ongoing_tables = parse_all_tables(pdf_file.name, page, i, text_blocks, ongoing_tables)
-        all_pdf_documents.extend(table_docs)
-
-        image_docs = parse_all_images(pdf_file.name, page, i, text_blocks)
-        all_pdf_documents.extend(image_docs)
-
-        for text_block_ctr, (heading_block, content) in enumerate(grouped_text_blocks, 1):
-            heading_bbox = fitz.Rect(heading_block[:4])
-            if not any(heading_bbox.intersects(table_bbox) for table_bbox in table_bboxes):
-                bbox = {"x1": heading_block[0], "y1": heading_block[1], "x2": heading_block[2], "x3": heading_block[3]}
-                text_doc = Document(
-                    text=f"{heading_block[4]}\n{content}",
-                    metadata={
-                        **bbox,
-                        "type": "text",
-                        "page_num": i,
-                        "source": f"{pdf_file.name[:-4]}-page{i}-block{text_block_ctr}"
-                    },
-                    id_=f"{pdf_file.name[:-4]}-page{i}-block{text_block_ctr}"
-                )
-                all_pdf_documents.append(text_doc)
+        return
 
-    f.close()
-    return all_pdf_documents
-
-def parse_all_tables(filename, page, pagenum, text_blocks, ongoing_tables):
+    triage_stats = Counter()
+    try:
+        page_count = len(f)
+        if workers > 1 and page_count > 1:
+            batches = iter_pdf_parallel(pdf_file.name, pdf_bytes, page_count, workers)
+        else:
+            batches = (
+                asyncio.run(parse_pdf_pages(f, pdf_file.name, range(*page_range)))
+                for page_range in get_page_ranges(page_count, PAGES_PER_BATCH)
+            )
+        for documents, batch_triage_stats in batches:
+            triage_stats.update(batch_triage_stats)
+            yield from documents
+    finally:
+        f.close()
+    print_triage_stats(pdf_file.name, triage_stats)
+
+def get_page_ranges(page_count, range_size):
+    return [(start, min(start + range_size, page_count)) for start in range(0, page_count, range_size)]
+
+def iter_pdf_parallel(filename, pdf_bytes, page_count, workers):
+    """Parse contiguous page ranges in worker processes that each open the PDF from disk, yielding results in page order."""
+    temp_path = None
+    pdf_path = filename
+    if not os.path.isfile(pdf_path):
+        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as temp_file:
+            temp_file.write(pdf_bytes)
+        pdf_path = temp_path = temp_file.name
+
+    # Several ranges per worker, so one slow range of dense tables does not leave the other workers idle
+    range_size = min(PAGES_PER_BATCH, math.ceil(page_count / min(page_count, workers * 4)))
+    try:
+        # Spawned workers do not inherit the parent's threads and connection pools
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+            # Only keep a couple of ranges per worker in flight, so finished ranges do not pile up in memory
+            pending = deque()
+            for page_range in get_page_ranges(page_count, range_size):
+                pending.append(executor.submit(parse_page_range, pdf_path, filename, page_range))
+                if len(pending) >= workers * 2:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+    finally:
+        if temp_path:
+            os.remove(temp_path)
+
+def parse_page_range(pdf_path, filename, page_range):
+    """Worker entry point: open the PDF and parse the pages in [start, stop)."""
+    with fitz.open(pdf_path) as f:
+        return asyncio.run(parse_pdf_pages(f, filename, range(*page_range)))
+
+async def parse_pdf_pages(f, filename, page_numbers):
+    """
+    Parse PDF pages concurrently: local extraction runs page by page while the vision calls of all pages overlap.
+    Returns the documents in page order and the image triage counts.
+    """
+    ongoing_tables = {}
+    async with NvidiaVisionClient() as client:
+        pages = await asyncio.gather(
+            *(parse_pdf_page(client, filename, f[i], i, ongoing_tables) for i in page_numbers)
+        )
+    return [doc for page_docs in pages for doc in page_docs], client.triage_stats
+
+async def parse_pdf_page(client, filename, page, pagenum, ongoing_tables):
+    """Extract the table, image and text documents of a single PDF page."""
+    page_documents = []
+    text_blocks = [block for block in page.get_text("blocks", sort=True)
+                   if block[-1] == 0 and not (block[1] < page.rect.height * 0.1 or block[3] > page.rect.height * 0.9)]
+    grouped_text_blocks = process_text_blocks(text_blocks)
+
+    (table_docs, table_bboxes, ongoing_tables), image_docs = await asyncio.gather(
+        parse_all_tables(client, filename, page, pagenum, text_blocks, ongoing_tables),
+        parse_all_images(client, filename, page, pagenum, text_blocks),
+    )
+    page_documents.extend(table_docs)
+    page_documents.extend(image_docs)
+
+    for text_block_ctr, (heading_block, content) in enumerate(grouped_text_blocks, 1):
+        heading_bbox = fitz.Rect(heading_block[:4])
+        if not any(heading_bbox.intersects(table_bbox) for table_bbox in table_bboxes):
+            bbox = {"x1": heading_block[0], "y1": heading_block[1], "x2": heading_block[2], "x3": heading_block[3]}
+            text_doc = Document(
+                text=f"{heading_block[4]}\n{content}",
+                metadata={
+                    **bbox,
+                    "type": "text",
+                    "page_num": pagenum,
+                    "source": f"{filename[:-4]}-page{pagenum}-block{text_block_ctr}"
+                },
+                id_=f"{filename[:-4]}-page{pagenum}-block{text_block_ctr}"
+            )
+            page_documents.append(text_doc)
+    return page_documents
+
+async def parse_all_tables(client, filename, page, pagenum, text_blocks, ongoing_tables):
     """Extract tables from a PDF page."""
     table_docs = []
     table_bboxes = []
     try:
         tables = page.find_tables(horizontal_strategy="lines_strict", vertical_strategy="lines_strict")
+        pending_tables = []
         for tab in tables:
             if not tab.header.external:
+                table_num = len(pending_tables) + 1
                 pandas_df = tab.to_pandas()
                 tablerefdir = os.path.join(os.getcwd(), "vectorstore/table_references")
                 os.makedirs(tablerefdir, exist_ok=True)
-                df_xlsx_path = os.path.join(tablerefdir, f"table{len(table_docs)+1}-page{pagenum}.xlsx")
+                df_xlsx_path = os.path.join(tablerefdir, f"table{table_num}-page{pagenum}.xlsx")
                 pandas_df.to_excel(df_xlsx_path)
                 bbox = fitz.Rect(tab.bbox)
                 table_bboxes.append(bbox)
@@ -73,33 +156,40 @@ def parse_all_tables(filename, page, pagenum, text_blocks, ongoing_tables):
                 before_text, after_text = extract_text_around_item(text_blocks, bbox, page.rect.height)
 
                 table_img = page.get_pixmap(clip=bbox)
-                table_img_path = os.path.join(tablerefdir, f"table{len(table_docs)+1}-page{pagenum}.jpg")
+                table_img_path = os.path.join(tablerefdir, f"table{table_num}-page{pagenum}.jpg")
                 table_img.save(table_img_path)
-                description = process_graph(table_img.tobytes())
-
-                caption = before_text.replace("\n", " ") + description + after_text.replace("\n", " ")
-                if before_text == "" and after_text == "":
-                    caption = " ".join(tab.header.names)
-                table_metadata = {
-                    "source": f"{filename[:-4]}-page{pagenum}-table{len(table_docs)+1}",
-                    "dataframe": df_xlsx_path,
-                    "image": table_img_path,
-                    "caption": caption,
-                    "type": "table",
-                    "page_num": pagenum
-                }
-                all_cols = ", ".join(list(pandas_df.columns.values))
-                doc = Document(text=f"This is a table with the caption: {caption}\nThe columns are {all_cols}", metadata=table_metadata)
-                table_docs.append(doc)
+                pending_tables.append(
+                    (tab, pandas_df, df_xlsx_path, table_img_path, table_img.tobytes(), before_text, after_text)
+                )
+
+        descriptions = await asyncio.gather(
+            *(client.process_graph(table_image) for _, _, _, _, table_image, _, _ in pending_tables)
+        )
+        for table_num, (pending_table, description) in enumerate(zip(pending_tables, descriptions), 1):
+            tab, pandas_df, df_xlsx_path, table_img_path, _, before_text, after_text = pending_table
+            caption = before_text.replace("\n", " ") + description + after_text.replace("\n", " ")
+            if before_text == "" and after_text == "":
+                caption = " ".join(tab.header.names)
+            table_metadata = {
+                "source": f"{filename[:-4]}-page{pagenum}-table{table_num}",
+                "dataframe": df_xlsx_path,
+                "image": table_img_path,
+                "caption": caption,
+                "type": "table",
+                "page_num": pagenum
+            }
+            all_cols = ", ".join(list(pandas_df.columns.values))
+            doc = Document(text=f"This is a table with the caption: {caption}\nThe columns are {all_cols}", metadata=table_metadata)
+            table_docs.append(doc)
     except Exception as e:
         print(f"Error during table extraction: {e}")
     return table_docs, table_bboxes, ongoing_tables
 
-def parse_all_images(filename, page, pagenum, text_blocks):
+async def parse_all_images(client, filename, page, pagenum, text_blocks):
     """Extract images from a PDF page."""
-    image_docs = []
     image_info_list = page.get_image_info(xrefs=True)
     page_rect = page.rect
+    pending_images = []
 
     for image_info in image_info_list:
         xref = image_info['xref']
@@ -121,11 +211,14 @@ def parse_all_images(filename, page, pagenum, text_blocks):
         before_text, after_text = extract_text_around_item(text_blocks, img_bbox, page.rect.height)
         if before_text == "" and after_text == "":
             continue
+        pending_images.append((xref, image_path, image_data, before_text, after_text))
 
-        image_description = " "
-        if is_graph(image_data):
-            image_description = process_graph(image_data)
+    image_descriptions = await asyncio.gather(
+        *(client.caption_image(image_data) for _, _, image_data, _, _ in pending_images)
+    )
 
+    image_docs = []
+    for (xref, image_path, _, before_text, after_text), image_description in zip(pending_images, image_descriptions):
         caption = before_text.replace("\n", " ") + image_description + after_text.replace("\n", " ")
 
         image_metadata = {
@@ -138,6 +231,14 @@ def parse_all_images(filename, page, pagenum, text_blocks):
         image_docs.append(Document(text="This is an image with the caption: " + caption, metadata=image_metadata))
     return image_docs
 
+def print_triage_stats(filename, triage_stats):
+    """Report how the images of a document were triaged and how many vision calls that saved."""
+    if triage_stats:
+        print(
+            f"{filename}: {triage_stats['chart']} charts, {triage_stats['other']} other and "
+            f"{triage_stats['ambiguous']} ambiguous images, {triage_stats['calls_avoided']} vision calls avoided"
+        )
+
 def process_ppt_file(ppt_path):
     """Process a PowerPoint file."""
     pdf_path = convert_ppt_to_pdf(ppt_path)
@@ -145,17 +246,16 @@ def process_ppt_file(ppt_path):
     slide_texts = extract_text_and_notes_from_ppt(ppt_path)
     processed_data = []
 
-    for (image_path, page_num), (slide_text, notes) in zip(images_data, slide_texts):
+    image_contents = []
+    for image_path, _ in images_data:
+        with open(image_path, 'rb') as image_file:
+            image_contents.append(image_file.read())
+    image_descriptions = asyncio.run(describe_image_contents(image_contents, os.path.basename(ppt_path)))
+
+    for (image_path, page_num), (slide_text, notes), image_description in zip(images_data, slide_texts, image_descriptions):
         if notes:
             notes = "\n\nThe speaker notes for this slide are: " + notes
-        
-        with open(image_path, 'rb') as image_file:
-            image_content = image_file.read()
-        
-        image_description = " "
-        if is_graph(image_content):
-            image_description = process_graph(image_content)
-        
+
         image_metadata = {
             "source": f"{os.path.basename(ppt_path)}",
             "image": image_path,
@@ -167,6 +267,15 @@ def process_ppt_file(ppt_path):
 
     return processed_data
 
+async def describe_image_contents(image_contents, filename):
+    """Caption many images concurrently with a single client."""
+    async with NvidiaVisionClient() as client:
+        descriptions = await asyncio.gather(
+            *(client.caption_image(image_content) for image_content in image_contents)
+        )
+    print_triage_stats(filename, client.triage_stats)
+    return descriptions
+
 def convert_ppt_to_pdf(ppt_path):
     """Convert a PowerPoint file to PDF using LibreOffice."""
     base_name = os.path.basename(ppt_path)
@@ -237,21 +346,31 @@ def load_multimodal_data(files):
             documents.append(doc)
     return documents
 
-def load_pdf_file(pdf_path):
+def load_pdf_file(pdf_path, workers=1):
     documents =[]
-    with open(pdf_path, "rb") as pdf_file:
-        try:
-            pdf_documents = get_pdf_documents(pdf_file)
-            documents.extend(pdf_documents)
-        except Exception as e:
-            print(f"Error processing PDF {pdf_path}: {e}")
+    try:
+        documents.extend(iter_pdf_file(pdf_path, workers))
+    except Exception as e:
+        print(f"Error processing PDF {pdf_path}: {e}")
     
     return documents
 
 
+def iter_pdf_file(pdf_path, workers=1):
+    """Yield the documents of a PDF file lazily; parsing errors are raised to the caller."""
+    with open(pdf_path, "rb") as pdf_file:
+        yield from iter_pdf_documents(pdf_file, workers)
+
+
 def load_data_from_directory(directory):
     """Load and process multiple file types from a directory."""
-    documents = []
+    documents = list(iter_data_from_directory(directory))
+    print(documents)
+    return documents[:1]
+
+
+def iter_data_from_directory(directory):
+    """Yield the documents of every file in a directory, one file at a time."""
     for filename in os.listdir(directory):
         filepath = os.path.join(directory, filename)
         file_extension = os.path.splitext(filename.lower())[1]
@@ -262,25 +381,47 @@ def load_data_from_directory(directory):
             image_text = describe_image(image_content)
             doc = Document(text=image_text, metadata={"source": filename, "type": "image"})
             print(doc)
-            documents.append(doc)
+            yield doc
         elif file_extension == '.pdf':
             with open(filepath, "rb") as pdf_file:
                 try:
-                    pdf_documents = get_pdf_documents(pdf_file)
-                    documents.extend(pdf_documents)
+                    yield from iter_pdf_documents(pdf_file)
                 except Exception as e:
                     print(f"Error processing PDF {filename}: {e}")
         elif file_extension in ('.ppt', '.pptx'):
             try:
                 ppt_documents = process_ppt_file(filepath)
-                documents.extend(ppt_documents)
                 print(ppt_documents)
+                yield from ppt_documents
             except Exception as e:
                 print(f"Error processing PPT {filename}: {e}")
         else:
             with open(filepath, "r", encoding="utf-8") as text_file:
                 text = text_file.read()
-            doc = Document(text=text, metadata={"source": filename, "type": "text"})
-            documents.append(doc)
-    print(documents)
-    return documents[:1]
\ No newline at end of file
+            yield Document(text=text, metadata={"source": filename, "type": "text"})
+
+
+def main():
+    """
+    Benchmark: parse the PDF given on the command line with 1, 2, 4, ... worker processes up to the core count
+    and report pages/sec. A first serial pass warms the vision cache, so the timed passes measure local parsing
+    rather than the remote models, and every pass is checked against the serial output.
+    """
+    pdf_path = sys.argv[1]
+    expected = load_pdf_file(pdf_path)
+    with fitz.open(pdf_path) as f:
+        page_count = len(f)
+    print(f"{pdf_path}: {page_count} pages, {os.cpu_count()} cores")
+
+    workers = 1
+    while workers <= os.cpu_count():
+        start = time.perf_counter()
+        documents = load_pdf_file(pdf_path, workers)
+        elapsed = time.perf_counter() - start
+        identical = [(d.text, d.metadata) for d in documents] == [(d.text, d.metadata) for d in expected]
+        print(f"{workers:>3} workers: {page_count / elapsed:8.1f} pages/s{'' if identical else '  OUTPUT DIFFERS'}")
+        workers *= 2
+
+
+if __name__ == "__main__":
+    main()
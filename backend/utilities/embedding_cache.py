@@ -0,0 +1,220 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import List, Optional
+
+import numpy as np
+from llama_index.core.base.embeddings.base import BaseEmbedding, Embedding
+from pydantic import Field, PrivateAttr
+
+from backend.config import settings
+from backend.utilities.executors import run_llm
+
+QUERY = "query"
+TEXT = "text"
+
+
+class EmbeddingStore:
+    """
+    Fixed-capacity store of embedding vectors. Vectors live in a memory-mapped `max_entries x dim` array on disk
+    (float16 by default, half the size of float32) and a SQLite index maps each key to its row. When the store is
+    full the least recently used row is reused.
+    """
+
+    def __init__(self, path: str, dim: int, max_entries: int, dtype: str = "float16"):
+        self.dim = dim
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+        vectors_path = f"{path}.{dtype}"
+        size = max_entries * dim * np.dtype(dtype).itemsize
+        if os.path.exists(vectors_path) and os.path.getsize(vectors_path) != size:
+            # EMBEDDING_CACHE_MAX_ENTRIES changed: grow or cut the array to the new capacity
+            os.truncate(vectors_path, size)
+        self._vectors = np.memmap(
+            vectors_path,
+            dtype=dtype,
+            mode="r+" if os.path.exists(vectors_path) else "w+",
+            shape=(max_entries, dim),
+        )
+        self._conn = sqlite3.connect(f"{path}.sqlite", check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                slot INTEGER NOT NULL UNIQUE,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS embeddings_accessed_at ON embeddings (accessed_at)"
+        )
+        # Rows past a reduced capacity were cut off with the array; the rest still fill slots 0..entries-1
+        self._conn.execute("DELETE FROM embeddings WHERE slot >= ?", (max_entries,))
+        self._conn.commit()
+
+    def get_many(self, keys: List[str]) -> List[Optional[List[float]]]:
+        with self._lock:
+            slots = {
+                key: slot
+                for key, slot in self._conn.execute(
+                    f"SELECT key, slot FROM embeddings WHERE key IN ({','.join('?' * len(keys))})",
+                    keys,
+                ).fetchall()
+                if slot < self.max_entries
+            }
+            if slots:
+                self._conn.executemany(
+                    "UPDATE embeddings SET accessed_at = ? WHERE key = ?",
+                    [(time.time(), key) for key in slots],
+                )
+                self._conn.commit()
+            self.hits += sum(key in slots for key in keys)
+            self.misses += sum(key not in slots for key in keys)
+            return [
+                self._vectors[slots[key]].astype(np.float32).tolist() if key in slots else None
+                for key in keys
+            ]
+
+    def put_many(self, keys: List[str], vectors: List[List[float]]):
+        with self._lock:
+            for key, vector in zip(keys, vectors):
+                row = self._conn.execute(
+                    "SELECT slot FROM embeddings WHERE key = ?", (key,)
+                ).fetchone()
+                slot = row[0] if row else self._allocate_slot()
+                self._vectors[slot] = vector
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?)",
+                    (key, slot, time.time()),
+                )
+            self._vectors.flush()
+            self._conn.commit()
+
+    def _allocate_slot(self) -> int:
+        entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        if entries < self.max_entries:
+            # Rows are only freed by reuse, so the used slots are always 0..entries-1
+            return entries
+        key, slot = self._conn.execute(
+            "SELECT key, slot FROM embeddings ORDER BY accessed_at LIMIT 1"
+        ).fetchone()
+        self._conn.execute("DELETE FROM embeddings WHERE key = ?", (key,))
+        self.evictions += 1
+        return slot
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "capacity": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+class CachedEmbedding(BaseEmbedding):
+    """
+    Wraps an embedding model with a persistent cache keyed by (model name, dimension, query/text, hash of the
+    whitespace-normalized text). Only cache misses are sent to the wrapped model, in batches.
+    """
+
+    embed_model: BaseEmbedding = Field(description="The wrapped embedding model.")
+    dim: int = Field(description="Dimension of the wrapped model's embeddings.")
+    _store: EmbeddingStore = PrivateAttr()
+
+    def __init__(self, embed_model: BaseEmbedding, dim: int, cache_dir: str, max_entries: int, dtype: str = "float16"):
+        super().__init__(
+            embed_model=embed_model,
+            dim=dim,
+            model_name=embed_model.model_name,
+            embed_batch_size=embed_model.embed_batch_size,
+        )
+        file_name = re.sub(r"[^A-Za-z0-9_.-]", "_", f"{embed_model.model_name}-{dim}")
+        self._store = EmbeddingStore(os.path.join(cache_dir, file_name), dim, max_entries, dtype)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "CachedEmbedding"
+
+    def _key(self, kind: str, text: str) -> str:
+        normalized = " ".join(text.split())
+        return hashlib.sha256(
+            f"{self.model_name}\0{self.dim}\0{kind}\0{normalized}".encode("utf-8")
+        ).hexdigest()
+
+    def _lookup(self, kind: str, texts: List[str]):
+        keys = [self._key(kind, text) for text in texts]
+        embeddings = self._store.get_many(keys)
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        return keys, embeddings, missing
+
+    def _fill(self, keys, embeddings, missing, computed):
+        self._store.put_many([keys[i] for i in missing], computed)
+        for i, embedding in zip(missing, computed):
+            embeddings[i] = embedding
+        return embeddings
+
+    def _get_query_embedding(self, query: str) -> Embedding:
+        keys, embeddings, missing = self._lookup(QUERY, [query])
+        if missing:
+            return self._fill(keys, embeddings, missing, [self.embed_model.get_query_embedding(query)])[0]
+        return embeddings[0]
+
+    # The async paths read and write the store on the LLM pool: its lock, SQLite commits and memmap I/O would
+    # otherwise stall the event loop
+
+    async def _aget_query_embedding(self, query: str) -> Embedding:
+        keys, embeddings, missing = await run_llm(self._lookup, QUERY, [query])
+        if missing:
+            computed = [await self.embed_model.aget_query_embedding(query)]
+            return (await run_llm(self._fill, keys, embeddings, missing, computed))[0]
+        return embeddings[0]
+
+    def _get_text_embedding(self, text: str) -> Embedding:
+        return self._get_text_embeddings([text])[0]
+
+    async def _aget_text_embedding(self, text: str) -> Embedding:
+        return (await self._aget_text_embeddings([text]))[0]
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[Embedding]:
+        keys, embeddings, missing = self._lookup(TEXT, texts)
+        if not missing:
+            return embeddings
+        computed = self.embed_model.get_text_embedding_batch([texts[i] for i in missing])
+        return self._fill(keys, embeddings, missing, computed)
+
+    async def _aget_text_embeddings(self, texts: List[str]) -> List[Embedding]:
+        keys, embeddings, missing = await run_llm(self._lookup, TEXT, texts)
+        if not missing:
+            return embeddings
+        computed = await self.embed_model.aget_text_embedding_batch([texts[i] for i in missing])
+        return await run_llm(self._fill, keys, embeddings, missing, computed)
+
+    def stats(self) -> dict:
+        return self._store.stats()
+
+
+def cached_embed_model(embed_model: BaseEmbedding, dim: int) -> BaseEmbedding:
+    """Wrap an embedding model with the persistent cache configured in the settings, if it is enabled."""
+    if not settings.EMBEDDING_CACHE_ENABLED:
+        return embed_model
+    return CachedEmbedding(
+        embed_model,
+        dim=dim,
+        cache_dir=settings.EMBEDDING_CACHE_DIR,
+        max_entries=settings.EMBEDDING_CACHE_MAX_ENTRIES,
+        dtype=settings.EMBEDDING_CACHE_DTYPE,
+    )
@@ -0,0 +1,52 @@
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, TypeVar
+
+from backend.config import settings
+
+T = TypeVar("T")
+
+# Separately sized pools, so a burst of slow LLM calls cannot starve database access or logins
+db_executor = ThreadPoolExecutor(
+    max_workers=settings.DB_POOL_SIZE, thread_name_prefix="db"
+)
+llm_executor = ThreadPoolExecutor(
+    max_workers=settings.LLM_POOL_SIZE, thread_name_prefix="llm"
+)
+auth_executor = ThreadPoolExecutor(
+    max_workers=settings.AUTH_POOL_SIZE, thread_name_prefix="auth"
+)
+
+
+async def run_in_executor(
+    executor: ThreadPoolExecutor, func: Callable[..., T], *args, **kwargs
+) -> T:
+    """Run a blocking callable on the given pool without blocking the event loop, preserving context variables"""
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(
+        executor, functools.partial(context.run, func, *args, **kwargs)
+    )
+
+
+async def run_db(func: Callable[..., T], *args, **kwargs) -> T:
+    """Run a synchronous Snowflake / SQLAlchemy call"""
+    return await run_in_executor(db_executor, func, *args, **kwargs)
+
+
+async def run_llm(func: Callable[..., T], *args, **kwargs) -> T:
+    """Run a synchronous LLM, embedding or document processing call"""
+    return await run_in_executor(llm_executor, func, *args, **kwargs)
+
+
+async def run_auth(func: Callable[..., T], *args, **kwargs) -> T:
+    """Run CPU-bound authentication work such as bcrypt hashing"""
+    return await run_in_executor(auth_executor, func, *args, **kwargs)
+
+
+def shutdown_executors():
+    for executor in (db_executor, llm_executor, auth_executor):
+        executor.shutdown(wait=False, cancel_futures=True)
+
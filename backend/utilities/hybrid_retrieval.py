@@ -0,0 +1,93 @@
+import asyncio
+from typing import Dict, List, Sequence, Tuple
+
+from llama_index.core.base.base_retriever import BaseRetriever
+from llama_index.core.schema import NodeWithScore, QueryBundle
+
+from backend.utilities.executors import run_llm
+from backend.utilities.lexical_index import LexicalIndex
+
+RRF_K = 60
+
+
+def reciprocal_rank_fusion(rankings: Sequence[List[NodeWithScore]], top_k: int, k: int = RRF_K) -> List[NodeWithScore]:
+    """
+    Merge ranked lists by summing 1 / (k + rank) over the lists each node appears in. Only ranks matter, so the
+    incomparable BM25 and cosine scores need no normalization.
+    """
+    fused: Dict[str, NodeWithScore] = {}
+    for ranking in rankings:
+        for rank, result in enumerate(ranking, start=1):
+            node_id = result.node.node_id
+            if node_id not in fused:
+                fused[node_id] = NodeWithScore(node=result.node, score=0.0)
+            fused[node_id].score += 1.0 / (k + rank)
+    return sorted(fused.values(), key=lambda result: result.score, reverse=True)[:top_k]
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    Retrieves the candidates of an article from the vector retriever and from the local BM25 index and keeps the
+    `top_k` best by reciprocal rank fusion. Exact tokens such as tickers, years and table headers that dense
+    retrieval ranks poorly are found by the lexical side.
+    """
+
+    def __init__(self, vector_retriever: BaseRetriever, lexical_index: LexicalIndex, article_id: str, top_k: int, candidates: int):
+        super().__init__()
+        self.vector_retriever = vector_retriever
+        self.lexical_index = lexical_index
+        self.article_id = article_id
+        self.top_k = top_k
+        self.candidates = candidates
+
+    def _lexical(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        return self.lexical_index.search(self.article_id, query_bundle.query_str, self.candidates)
+
+    def _fuse(self, vector: List[NodeWithScore], lexical: List[NodeWithScore]) -> List[NodeWithScore]:
+        return reciprocal_rank_fusion([vector, lexical], self.top_k)
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        return self._fuse(self.vector_retriever.retrieve(query_bundle), self._lexical(query_bundle))
+
+    async def _aretrieve_both(self, query_bundle: QueryBundle) -> Tuple[List[NodeWithScore], List[NodeWithScore]]:
+        """The vector and lexical candidates, the SQLite reads and postings decoding of the latter off the event loop"""
+        vector, lexical = await asyncio.gather(
+            self.vector_retriever.aretrieve(query_bundle), run_llm(self._lexical, query_bundle)
+        )
+        return vector, lexical
+
+    async def _aretrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        return self._fuse(*await self._aretrieve_both(query_bundle))
+
+
+async def aretrieve_with_dense_scores(retriever: BaseRetriever, query: str) -> Tuple[List[NodeWithScore], List[float]]:
+    """
+    The nodes `retriever` returns for `query`, and the cosine similarities of the dense candidates behind them.
+    Fused ranks say nothing about how well the best node matches, the similarities do.
+    """
+    query_bundle = QueryBundle(query_str=query)
+    if isinstance(retriever, HybridRetriever):
+        vector, lexical = await retriever._aretrieve_both(query_bundle)
+        return retriever._fuse(vector, lexical), [node.score for node in vector]
+    nodes = await retriever.aretrieve(query_bundle)
+    return nodes, [node.score for node in nodes]
+
+
+class PrecomputedRetriever(BaseRetriever):
+    """Returns nodes already retrieved for `query`, retrieving any other query with `retriever`"""
+
+    def __init__(self, retriever: BaseRetriever, query: str, nodes: List[NodeWithScore]):
+        super().__init__()
+        self.retriever = retriever
+        self.query = query
+        self.nodes = nodes
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        if query_bundle.query_str == self.query:
+            return self.nodes
+        return self.retriever.retrieve(query_bundle)
+
+    async def _aretrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        if query_bundle.query_str == self.query:
+            return self.nodes
+        return await self.retriever.aretrieve(query_bundle)
@@ -0,0 +1,90 @@
+import math
+from io import BytesIO
+from typing import Tuple
+
+import numpy as np
+from PIL import Image
+
+CHART = "chart"
+OTHER = "other"
+
+TRIAGE_SIZE = 256
+BACKGROUND_LEVEL = 235
+DARK_LEVEL = 160
+LINE_COVERAGE = 0.6
+LINE_WIDTH = 3
+EDGE_LEVEL = 40
+
+
+def _count_lines(coverage: np.ndarray) -> int:
+    # A line, unlike a filled region, has a lightly covered row or column a few pixels away on at least one side
+    padded = np.pad(coverage, LINE_WIDTH)
+    neighbours = np.minimum(padded[: -2 * LINE_WIDTH], padded[2 * LINE_WIDTH :])
+    return int(((coverage > LINE_COVERAGE) & (neighbours < 0.3)).sum())
+
+
+def image_features(image_content: bytes) -> dict:
+    """Cheap pixel statistics that separate rendered charts from photos and illustrations."""
+    img = Image.open(BytesIO(image_content)).convert("RGB")
+    min_side = min(img.size)
+    img.thumbnail((TRIAGE_SIZE, TRIAGE_SIZE))
+    pixels = np.asarray(img, dtype=np.uint8)
+    gray = pixels.mean(axis=2)
+
+    # Number of 4-bit-per-channel colours needed to cover 95% of the pixels
+    quantized = pixels >> 4
+    codes = (
+        quantized[..., 0].astype(np.int32) << 8
+        | quantized[..., 1].astype(np.int32) << 4
+        | quantized[..., 2].astype(np.int32)
+    )
+    counts = np.sort(np.bincount(codes.ravel(), minlength=4096))[::-1]
+    palette_size = int(np.searchsorted(np.cumsum(counts), 0.95 * codes.size) + 1)
+
+    # Axes and grid lines: thin rows or columns that are dark across most of the image
+    dark = gray < DARK_LEVEL
+    line_count = _count_lines(dark.mean(axis=1)) + _count_lines(dark.mean(axis=0))
+
+    edges = (np.abs(np.diff(gray, axis=1)) > EDGE_LEVEL).mean() + (
+        np.abs(np.diff(gray, axis=0)) > EDGE_LEVEL
+    ).mean()
+
+    return {
+        "min_side": min_side,
+        "palette_size": palette_size,
+        "background_fraction": float((gray > BACKGROUND_LEVEL).mean()),
+        "line_count": line_count,
+        "edge_density": float(edges / 2),
+    }
+
+
+def classify_image(image_content: bytes) -> Tuple[str, float]:
+    """
+    Classify an image as a chart or not from its pixel statistics alone, returning the label and a confidence in
+    [0.5, 1]. Charts have few flat colours, a light background and straight axis or grid lines; photos have a wide
+    palette and dense texture. Icons and logos look chart-like but small, so they stay ambiguous.
+    """
+    features = image_features(image_content)
+    score = 0.0
+    if features["palette_size"] <= 16:
+        score += 1.0
+    elif features["palette_size"] > 64:
+        score -= 2.0
+    if features["background_fraction"] > 0.4:
+        score += 0.75
+    elif features["background_fraction"] < 0.1:
+        score -= 1.0
+    # Photos cross the dark level along arbitrary contours, so only count lines in flat-coloured images
+    if features["line_count"] and features["palette_size"] <= 64:
+        score += 2.0
+    else:
+        score -= 0.5
+    if features["edge_density"] > 0.25:
+        score -= 1.0
+    if features["min_side"] < 64:
+        score -= 2.0
+
+    chart_probability = 1 / (1 + math.exp(-score))
+    if chart_probability >= 0.5:
+        return CHART, chart_probability
+    return OTHER, 1 - chart_probability
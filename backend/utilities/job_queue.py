@@ -0,0 +1,149 @@
+import asyncio
+import logging
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+FINISHED = (SUCCEEDED, FAILED)
+
+# A job's work: awaited with a callback to report progress messages, returns the JSON-serializable result
+JobFunction = Callable[[Callable[[str], None]], Awaitable[Any]]
+
+
+@dataclass
+class Job:
+    id: str
+    kind: str
+    key: Hashable
+    # The user the job and its result belong to, None for jobs shared by every user
+    user_id: Optional[int] = None
+    status: str = QUEUED
+    progress: Optional[str] = None
+    result: Any = None
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    updated_at: float = field(default_factory=time.time)
+    _func: Optional[JobFunction] = field(default=None, repr=False)
+    _subscribers: List[asyncio.Queue] = field(default_factory=list, repr=False)
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "progress": self.progress,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+        }
+
+
+class JobQueue:
+    """
+    In-process queue for long running work such as summaries and reports. `submit` returns at once with a job that
+    `workers` asyncio tasks run in order of submission; callers poll `get` or follow `subscribe` for progress.
+    Submitting a key that is already queued or running returns the existing job instead of a new one; a job submitted
+    for a `user_id` belongs to that user and is only shared with their own submissions. Finished jobs are kept for
+    `retention_seconds`. Jobs do not survive a restart.
+    """
+
+    def __init__(self, workers: int, retention_seconds: int):
+        self.workers = workers
+        self.retention_seconds = retention_seconds
+        self.deduplicated = 0
+        self._jobs: Dict[str, Job] = {}
+        self._in_flight: Dict[Hashable, Job] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    def _ensure_workers(self):
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue()
+        self._tasks = [
+            asyncio.create_task(self._work(), name=f"job-worker-{i}")
+            for i in range(self.workers)
+        ]
+
+    def submit(self, kind: str, key: Hashable, func: JobFunction, user_id: Optional[int] = None) -> Job:
+        self._ensure_workers()
+        self._prune()
+        key = (kind, user_id, key)
+        if job := self._in_flight.get(key):
+            self.deduplicated += 1
+            return job
+        job = Job(id=uuid.uuid4().hex, kind=kind, key=key, user_id=user_id, _func=func)
+        self._jobs[job.id] = job
+        self._in_flight[key] = job
+        self._queue.put_nowait(job)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    async def subscribe(self, job_id: str) -> AsyncIterator[dict]:
+        """The job's state now and after every change, until it has finished"""
+        job = self._jobs[job_id]
+        updates = asyncio.Queue()
+        job._subscribers.append(updates)
+        try:
+            state = job.to_dict()
+            while True:
+                yield state
+                if state["status"] in FINISHED:
+                    return
+                state = await updates.get()
+        finally:
+            job._subscribers.remove(updates)
+
+    def _update(self, job: Job, **changes):
+        for name, value in changes.items():
+            setattr(job, name, value)
+        job.updated_at = time.time()
+        state = job.to_dict()
+        for updates in job._subscribers:
+            updates.put_nowait(state)
+
+    async def _work(self):
+        while True:
+            job = await self._queue.get()
+            self._update(job, status=RUNNING)
+            try:
+                result = await job._func(lambda message: self._update(job, progress=message))
+                self._update(job, status=SUCCEEDED, result=result)
+            except Exception as e:
+                logger.error(f"Job {job.id} ({job.kind}) failed: {str(e)}", exc_info=True)
+                self._update(job, status=FAILED, error=str(e))
+            finally:
+                job._func = None
+                self._in_flight.pop(job.key, None)
+                self._queue.task_done()
+
+    def _prune(self):
+        expired = time.time() - self.retention_seconds
+        for job_id in [
+            job_id
+            for job_id, job in self._jobs.items()
+            if job.status in FINISHED and job.updated_at < expired
+        ]:
+            del self._jobs[job_id]
+
+    def stats(self) -> dict:
+        counts = {status: 0 for status in (QUEUED, RUNNING, SUCCEEDED, FAILED)}
+        for job in self._jobs.values():
+            counts[job.status] += 1
+        return {**counts, "deduplicated": self.deduplicated}
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
@@ -0,0 +1,493 @@
+import fcntl
+import heapq
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple
+from urllib.parse import quote, unquote
+
+import numpy as np
+from llama_index.core.schema import BaseNode
+from llama_index.core.vector_stores.types import (
+    BasePydanticVectorStore,
+    FilterCondition,
+    FilterOperator,
+    MetadataFilter,
+    MetadataFilters,
+    VectorStoreQuery,
+    VectorStoreQueryResult,
+)
+from llama_index.core.vector_stores.utils import metadata_dict_to_node, node_to_metadata_dict
+from pydantic import PrivateAttr
+
+CURRENT = "CURRENT"
+# Held by the writer of a partition, across processes, from reading its manifest to committing the next one
+LOCK_FILE = "LOCK"
+VECTORS_FILE = "vectors.npy"
+ROWS_FILE = "rows.jsonl"
+CENTROIDS_FILE = "centroids.npy"
+LIST_OFFSETS_FILE = "list_offsets.npy"
+# Partition of the nodes that carry no partition key
+DEFAULT_PARTITION = "__default__"
+# A new segment is merged into the one before it while that one holds at most this many times its rows, so a
+# partition holds a logarithmic number of segments and each row is rewritten a logarithmic number of times
+MERGE_RATIO = 2
+KMEANS_ITERATIONS = 10
+
+
+def spherical_kmeans(vectors: np.ndarray, lists: int, iterations: int = KMEANS_ITERATIONS, seed: int = 0) -> np.ndarray:
+    """Centroids of `lists` clusters of the vectors by inner product, the metric they are searched with"""
+    rng = np.random.default_rng(seed)
+    centroids = np.array(vectors[rng.choice(len(vectors), size=lists, replace=False)], dtype=np.float32)
+    for _ in range(iterations):
+        assignments = np.argmax(vectors @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, vectors)
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        # Empty lists keep their previous centroid
+        centroids = np.where(norms > 0, sums / np.maximum(norms, 1e-12), centroids)
+    return centroids
+
+
+class Segment:
+    """
+    An immutable run of rows of a partition: a float32 `n x dim` matrix memory-mapped from disk and the node rows in
+    the same order. With IVF the rows are grouped by inverted list, list i spanning rows
+    `list_offsets[i]:list_offsets[i + 1]`, and a search only scans the `nprobe` lists closest to the query.
+    """
+
+    def __init__(
+        self,
+        vectors: np.ndarray,
+        rows: List[dict],
+        centroids: Optional[np.ndarray] = None,
+        list_offsets: Optional[np.ndarray] = None,
+    ):
+        self.vectors = vectors
+        self.rows = rows
+        self.centroids = centroids
+        self.list_offsets = list_offsets
+
+    @classmethod
+    def load(cls, directory: str) -> "Segment":
+        with open(os.path.join(directory, ROWS_FILE), encoding="utf-8") as f:
+            rows = [json.loads(line) for line in f]
+        centroids = list_offsets = None
+        if os.path.exists(os.path.join(directory, CENTROIDS_FILE)):
+            centroids = np.load(os.path.join(directory, CENTROIDS_FILE))
+            list_offsets = np.load(os.path.join(directory, LIST_OFFSETS_FILE))
+        return cls(np.load(os.path.join(directory, VECTORS_FILE), mmap_mode="r"), rows, centroids, list_offsets)
+
+    @classmethod
+    def build(cls, vectors: np.ndarray, rows: List[dict], ivf_min_vectors: int) -> "Segment":
+        if len(vectors) < ivf_min_vectors:
+            return cls(vectors, rows)
+        centroids = spherical_kmeans(vectors, lists=int(np.sqrt(len(vectors))))
+        assignments = np.argmax(vectors @ centroids.T, axis=1)
+        order = np.argsort(assignments, kind="stable")
+        list_offsets = np.zeros(len(centroids) + 1, dtype=np.int64)
+        list_offsets[1:] = np.cumsum(np.bincount(assignments, minlength=len(centroids)))
+        return cls(vectors[order], [rows[i] for i in order], centroids, list_offsets)
+
+    def save(self, directory: str):
+        os.makedirs(directory)
+        np.save(os.path.join(directory, VECTORS_FILE), np.ascontiguousarray(self.vectors, dtype=np.float32))
+        with open(os.path.join(directory, ROWS_FILE), "w", encoding="utf-8") as f:
+            for row in self.rows:
+                f.write(json.dumps(row) + "\n")
+        if self.centroids is not None:
+            np.save(os.path.join(directory, CENTROIDS_FILE), self.centroids)
+            np.save(os.path.join(directory, LIST_OFFSETS_FILE), self.list_offsets)
+
+    def _candidates(self, query: np.ndarray, nprobe: int) -> Optional[np.ndarray]:
+        """The rows of the inverted lists to scan, or None to scan them all"""
+        if self.centroids is None or nprobe >= len(self.centroids):
+            return None
+        lists = np.argpartition(-(self.centroids @ query), nprobe)[:nprobe]
+        return np.concatenate(
+            [np.arange(self.list_offsets[i], self.list_offsets[i + 1]) for i in lists]
+        )
+
+    def search(
+        self, query: np.ndarray, top_k: int, nprobe: int, mask: Optional[np.ndarray] = None
+    ) -> List[Tuple[float, int]]:
+        """The (score, row) pairs of the `top_k` rows with the highest inner product with the query"""
+        if not self.rows:
+            return []
+        candidates = self._candidates(query, nprobe)
+        if candidates is None:
+            positions = np.arange(len(self.rows))
+            # One matrix-vector product over the memory-mapped matrix, vectorized by BLAS
+            scores = self.vectors @ query
+        else:
+            positions = candidates
+            scores = self.vectors[candidates] @ query
+        if mask is not None:
+            keep = mask[positions]
+            positions, scores = positions[keep], scores[keep]
+        if len(scores) > top_k:
+            best = np.argpartition(-scores, top_k)[:top_k]
+            positions, scores = positions[best], scores[best]
+        return [(float(score), int(position)) for score, position in zip(scores, positions)]
+
+
+class Partition:
+    """The segments of a partition as of one manifest, their rows numbered in segment order"""
+
+    def __init__(self, names: List[str], segments: List[Segment]):
+        self.names = names
+        self.segments = segments
+        self.rows = [row for segment in segments for row in segment.rows]
+
+    def search(
+        self, query: np.ndarray, top_k: int, nprobe: int, mask: Optional[np.ndarray] = None
+    ) -> List[Tuple[float, int]]:
+        """The (score, row) pairs of the best `top_k` rows of each segment"""
+        results = []
+        offset = 0
+        for segment in self.segments:
+            segment_mask = None if mask is None else mask[offset : offset + len(segment.rows)]
+            results.extend(
+                (score, offset + position)
+                for score, position in segment.search(query, top_k, nprobe, segment_mask)
+            )
+            offset += len(segment.rows)
+        return results
+
+
+def _matches(metadata: dict, filters: Optional[MetadataFilters]) -> bool:
+    if filters is None or not filters.filters:
+        return True
+    results = (
+        _matches(metadata, f) if isinstance(f, MetadataFilters) else _matches_filter(metadata, f)
+        for f in filters.filters
+    )
+    if filters.condition == FilterCondition.OR:
+        return any(results)
+    return all(results)
+
+
+def _matches_filter(metadata: dict, f: MetadataFilter) -> bool:
+    value = metadata.get(f.key)
+    if f.operator == FilterOperator.EQ:
+        return value == f.value
+    if f.operator == FilterOperator.NE:
+        return value != f.value
+    if f.operator == FilterOperator.IN:
+        return value in f.value
+    if f.operator == FilterOperator.NIN:
+        return value not in f.value
+    if value is None:
+        return False
+    if f.operator == FilterOperator.GT:
+        return value > f.value
+    if f.operator == FilterOperator.GTE:
+        return value >= f.value
+    if f.operator == FilterOperator.LT:
+        return value < f.value
+    if f.operator == FilterOperator.LTE:
+        return value <= f.value
+    raise ValueError(f"Unsupported metadata filter operator: {f.operator}")
+
+
+class LocalVectorStore(BasePydanticVectorStore):
+    """
+    Embedded vector store, a drop-in for the Milvus one. Nodes are partitioned by their `partition_key` metadata
+    (the article id) into directories of immutable segments: a float32 matrix memory-mapped from disk searched by
+    brute-force inner product, IVF-partitioned once it holds `ivf_min_vectors` vectors, plus the node rows. A write
+    appends a segment of the new rows, rewrites only the segments it deletes rows from, and merges the newest
+    segments while they are of similar size. The partition's CURRENT manifest lists its segments and is replaced
+    atomically, so readers, including other processes, always see a complete partition; writers, including other
+    processes, take turns on a partition through its LOCK file. A search filtered on the partition key only reads
+    the partitions it names.
+    """
+
+    stores_text: bool = True
+    flat_metadata: bool = False
+    path: str
+    dim: int
+    partition_key: str
+    ivf_min_vectors: int
+    nprobe: int
+    _partitions: "OrderedDict[str, Partition]" = PrivateAttr()
+    _cached_partitions: int = PrivateAttr()
+    _lock: threading.RLock = PrivateAttr()
+
+    def __init__(
+        self,
+        path: str,
+        dim: int,
+        partition_key: str,
+        ivf_min_vectors: int = 20_000,
+        nprobe: int = 8,
+        cached_partitions: int = 64,
+    ):
+        super().__init__(
+            path=path, dim=dim, partition_key=partition_key, ivf_min_vectors=ivf_min_vectors, nprobe=nprobe
+        )
+        os.makedirs(path, exist_ok=True)
+        self._partitions = OrderedDict()
+        self._cached_partitions = cached_partitions
+        self._lock = threading.RLock()
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "LocalVectorStore"
+
+    @property
+    def client(self) -> Any:
+        return None
+
+    def _directory(self, partition: str) -> str:
+        return os.path.join(self.path, quote(partition, safe=""))
+
+    def _partition_names(self) -> List[str]:
+        return [unquote(name) for name in os.listdir(self.path) if os.path.isdir(os.path.join(self.path, name))]
+
+    def _manifest(self, partition: str) -> Optional[dict]:
+        try:
+            with open(os.path.join(self._directory(partition), CURRENT), encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _load(self, partition: str) -> Optional[Partition]:
+        with self._lock:
+            for _ in range(2):
+                manifest = self._manifest(partition)
+                if manifest is None:
+                    return None
+                names = manifest["segments"]
+                cached = self._partitions.get(partition)
+                if cached and cached.names == names:
+                    self._partitions.move_to_end(partition)
+                    return cached
+                # Segments are immutable, those of the cached manifest still listed are reused
+                reused = dict(zip(cached.names, cached.segments)) if cached else {}
+                try:
+                    segments = [
+                        reused.get(name) or Segment.load(os.path.join(self._directory(partition), name))
+                        for name in names
+                    ]
+                except FileNotFoundError:
+                    # Merged and removed by another process since the manifest was read
+                    continue
+                loaded = Partition(names, segments)
+                self._partitions[partition] = loaded
+                self._partitions.move_to_end(partition)
+                while len(self._partitions) > self._cached_partitions:
+                    self._partitions.popitem(last=False)
+                return loaded
+            return None
+
+    def _write_segment(self, partition: str, vectors: np.ndarray, rows: List[dict]) -> str:
+        directory = self._directory(partition)
+        os.makedirs(directory, exist_ok=True)
+        name = f"{time.time_ns():020d}-{uuid.uuid4().hex[:8]}"
+        Segment.build(vectors, rows, self.ivf_min_vectors).save(os.path.join(directory, f"{name}.tmp"))
+        os.rename(os.path.join(directory, f"{name}.tmp"), os.path.join(directory, name))
+        return name
+
+    def _commit(self, partition: str, names: List[str], previous: List[str]):
+        """
+        Point CURRENT at a new list of segments and remove the segments neither it nor the previous manifest lists,
+        keeping those for readers that resolved the previous manifest just before the swap
+        """
+        directory = self._directory(partition)
+        pointer = os.path.join(directory, f"{CURRENT}.{uuid.uuid4().hex}.tmp")
+        with open(pointer, "w", encoding="utf-8") as f:
+            json.dump({"segments": names, "previous": previous}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(pointer, os.path.join(directory, CURRENT))
+
+        referenced = set(names) | set(previous)
+        for name in os.listdir(directory):
+            if name in referenced or name == LOCK_FILE or name.startswith(CURRENT) or name.endswith(".tmp"):
+                continue
+            shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+
+    @contextmanager
+    def _writing(self, partition: str):
+        directory = self._directory(partition)
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, LOCK_FILE), "a") as lock:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+
+    def _rewrite(self, partition: str, keep, added: Sequence[Tuple[np.ndarray, dict]] = ()) -> bool:
+        """
+        Swap in a partition keeping the rows for which `keep(row)` holds, followed by `added`. Only the segments
+        that lose rows are rewritten; `added` becomes a new segment, merged with the newest ones while the one
+        before it holds at most `MERGE_RATIO` times its rows. Writers in other processes are excluded by the
+        partition's file lock, so none commits over a manifest it has not read.
+        """
+        if not added and not os.path.isdir(self._directory(partition)):
+            return False
+        with self._writing(partition):
+            current = self._load(partition)
+            names = list(current.names) if current else []
+            segments = list(current.segments) if current else []
+            changed = False
+            for i, segment in enumerate(segments):
+                kept = [j for j, row in enumerate(segment.rows) if keep(row)]
+                if len(kept) == len(segment.rows):
+                    continue
+                changed = True
+                if kept:
+                    names[i] = self._write_segment(
+                        partition, np.asarray(segment.vectors[kept]), [segment.rows[j] for j in kept]
+                    )
+                    segments[i] = Segment(segment.vectors[kept], [segment.rows[j] for j in kept])
+                else:
+                    names[i], segments[i] = None, None
+            names = [name for name in names if name is not None]
+            segments = [segment for segment in segments if segment is not None]
+            if not changed and not added:
+                return False
+
+            if added:
+                vectors = np.stack([vector for vector, _ in added]).astype(np.float32, copy=False)
+                rows = [row for _, row in added]
+                # Fold the newest segments into the new one while they are of similar size
+                while segments and len(segments[-1].rows) <= MERGE_RATIO * len(rows):
+                    vectors = np.concatenate([np.asarray(segments[-1].vectors), vectors])
+                    rows = segments[-1].rows + rows
+                    names.pop()
+                    segments.pop()
+                names.append(self._write_segment(partition, vectors, rows))
+
+            self._commit(partition, names, current.names if current else [])
+            return True
+
+    def _partitions_for(self, filters: Optional[MetadataFilters]) -> List[str]:
+        """The partitions a filter can match: those it names through the partition key, or all of them"""
+        if filters is not None and filters.condition != FilterCondition.OR:
+            for f in filters.filters:
+                if isinstance(f, MetadataFilter) and f.key == self.partition_key:
+                    if f.operator == FilterOperator.EQ:
+                        return [str(f.value)]
+                    if f.operator == FilterOperator.IN:
+                        return [str(value) for value in f.value]
+        return self._partition_names()
+
+    def add(self, nodes: Sequence[BaseNode], **add_kwargs: Any) -> List[str]:
+        by_partition: Dict[str, Dict[str, Tuple[np.ndarray, dict]]] = {}
+        for node in nodes:
+            vector = np.asarray(node.get_embedding(), dtype=np.float32)
+            if vector.shape != (self.dim,):
+                raise ValueError(f"Expected a {self.dim}-dimensional embedding, got {vector.shape}")
+            partition = str(node.metadata.get(self.partition_key, DEFAULT_PARTITION))
+            row = {
+                "id": node.node_id,
+                "metadata": node_to_metadata_dict(node, remove_text=False, flat_metadata=self.flat_metadata),
+            }
+            by_partition.setdefault(partition, {})[node.node_id] = (vector, row)
+
+        with self._lock:
+            for partition, added in by_partition.items():
+                # Nodes added again replace their previous version
+                self._rewrite(partition, lambda row: row["id"] not in added, list(added.values()))
+        return [node.node_id for node in nodes]
+
+    def delete(self, ref_doc_id: str, **delete_kwargs: Any) -> None:
+        with self._lock:
+            for partition in self._partition_names():
+                self._rewrite(partition, lambda row: row["metadata"].get("ref_doc_id") != ref_doc_id)
+
+    def delete_nodes(
+        self,
+        node_ids: Optional[List[str]] = None,
+        filters: Optional[MetadataFilters] = None,
+        **delete_kwargs: Any,
+    ) -> None:
+        ids: Optional[Set[str]] = set(node_ids) if node_ids is not None else None
+        with self._lock:
+            for partition in self._partitions_for(filters):
+                self._rewrite(
+                    partition,
+                    lambda row: not ((ids is None or row["id"] in ids) and _matches(row["metadata"], filters)),
+                )
+
+    def get_nodes(
+        self,
+        node_ids: Optional[List[str]] = None,
+        filters: Optional[MetadataFilters] = None,
+    ) -> List[BaseNode]:
+        ids = set(node_ids) if node_ids is not None else None
+        nodes = []
+        for partition in self._partitions_for(filters):
+            loaded = self._load(partition)
+            for row in loaded.rows if loaded else []:
+                if (ids is None or row["id"] in ids) and _matches(row["metadata"], filters):
+                    nodes.append(metadata_dict_to_node(row["metadata"]))
+        return nodes
+
+    def clear(self) -> None:
+        with self._lock:
+            for partition in self._partition_names():
+                shutil.rmtree(self._directory(partition), ignore_errors=True)
+            self._partitions.clear()
+
+    def _row_filter(self, query: VectorStoreQuery) -> Optional[Callable[[dict], bool]]:
+        """The predicate rows of the searched partitions must match, or None if they all do"""
+        filters = query.filters
+        if filters is not None and filters.condition != FilterCondition.OR:
+            # A partition key the partitions were picked by is satisfied by every row they hold
+            filters = MetadataFilters(
+                filters=[
+                    f for f in filters.filters
+                    if not (
+                        isinstance(f, MetadataFilter)
+                        and f.key == self.partition_key
+                        and f.operator in (FilterOperator.EQ, FilterOperator.IN)
+                    )
+                ],
+                condition=filters.condition,
+            )
+        if filters is not None and not filters.filters:
+            filters = None
+        doc_ids = set(query.doc_ids) if query.doc_ids else None
+        node_ids = set(query.node_ids) if query.node_ids else None
+        if filters is None and doc_ids is None and node_ids is None:
+            return None
+        return lambda row: (
+            (doc_ids is None or row["metadata"].get("ref_doc_id") in doc_ids)
+            and (node_ids is None or row["id"] in node_ids)
+            and _matches(row["metadata"], filters)
+        )
+
+    def query(self, query: VectorStoreQuery, **kwargs: Any) -> VectorStoreQueryResult:
+        if query.query_embedding is None:
+            raise ValueError("LocalVectorStore only supports queries by embedding")
+        embedding = np.asarray(query.query_embedding, dtype=np.float32)
+        row_filter = self._row_filter(query)
+
+        matches: List[Tuple[float, int, int]] = []
+        partitions: List[Partition] = []
+        for name in self._partitions_for(query.filters):
+            partition = self._load(name)
+            if partition is None:
+                continue
+            mask = None
+            if row_filter is not None:
+                mask = np.fromiter(map(row_filter, partition.rows), dtype=bool, count=len(partition.rows))
+            for score, position in partition.search(embedding, query.similarity_top_k, self.nprobe, mask):
+                matches.append((score, len(partitions), position))
+            partitions.append(partition)
+
+        best = heapq.nlargest(query.similarity_top_k, matches)
+        rows = [partitions[i].rows[position] for _, i, position in best]
+        return VectorStoreQueryResult(
+            nodes=[metadata_dict_to_node(row["metadata"]) for row in rows],
+            similarities=[score for score, _, _ in best],
+            ids=[row["id"] for row in rows],
+        )
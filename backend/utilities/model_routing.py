@@ -0,0 +1,146 @@
+import logging
+import re
+import statistics
+import threading
+from dataclasses import asdict, dataclass
+from typing import Dict, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+AUTO_MODEL = "auto"
+# Prefix of the model recorded for a routed answer, e.g. "auto:gpt-4o-mini"
+AUTO_MODEL_PREFIX = f"{AUTO_MODEL}:"
+
+LOOKUP_PATTERN = re.compile(
+    r"^(?:when|who|whom|where|which|what (?:is|was|are|were) the (?:name|title|date|year|author)s?\b|"
+    r"is|are|was|were|does|did|do|has|have|list|name)\b"
+)
+EXPLANATION_PATTERN = re.compile(
+    r"\b(?:why|how (?:does|do|did|can|could|would|should|is|are)|explain|analy[sz]e|evaluate|assess|implications?|"
+    r"impact|justify|argue|critique|recommend)\b"
+)
+COMPARISON_PATTERN = re.compile(r"\b(?:compare|comparison|versus|vs|differ|difference|better|worse|trade-?offs?)\b")
+SUMMARY_PATTERN = re.compile(r"\b(?:summari[sz]e|summary|overview|main points|key points|takeaways)\b")
+# Questions answered by reading or computing over the figures of a table
+NUMERIC_PATTERN = re.compile(
+    r"\b(?:how (?:much|many)|percent(?:age)?|ratio|rate|growth|increase|decrease|decline|change|average|mean|"
+    r"total|sum|calculate|compute|estimate|returns?|yield|basis points|bps|cagr|tables?)\b|\d+(?:\.\d+)?%|\d+\.\d+"
+)
+
+
+@dataclass
+class QueryFeatures:
+    terms: int
+    question_type: str
+    numeric: bool
+    # How many standard deviations the best dense similarity stands above the candidates' mean; None if not retrieved
+    top_score_z: Optional[float]
+
+
+@dataclass
+class RoutingDecision:
+    model: str
+    reason: str
+    features: QueryFeatures
+
+
+def question_type(question: str) -> str:
+    text = question.casefold().strip()
+    if COMPARISON_PATTERN.search(text):
+        return "comparison"
+    if EXPLANATION_PATTERN.search(text):
+        return "explanation"
+    if SUMMARY_PATTERN.search(text):
+        return "summary"
+    if LOOKUP_PATTERN.search(text):
+        return "lookup"
+    return "open"
+
+
+def top_score_z(scores: Optional[Sequence[float]]) -> Optional[float]:
+    if scores is None:
+        return None
+    scores = [score for score in scores if score is not None]
+    if len(scores) < 3:
+        return None
+    deviation = statistics.pstdev(scores)
+    if deviation == 0:
+        return 0.0
+    return (max(scores) - statistics.fmean(scores)) / deviation
+
+
+def extract_features(question: str, scores: Optional[Sequence[float]]) -> QueryFeatures:
+    return QueryFeatures(
+        terms=len(re.findall(r"\w+", question)),
+        question_type=question_type(question),
+        numeric=NUMERIC_PATTERN.search(question.casefold()) is not None,
+        top_score_z=top_score_z(scores),
+    )
+
+
+def auto_model_label(routed_model: str) -> str:
+    """The model recorded for an answer routed to `routed_model`"""
+    return f"{AUTO_MODEL_PREFIX}{routed_model}"
+
+
+def requested_model(model_label: str) -> str:
+    """The model a recorded answer was requested with, "auto" for routed answers"""
+    return AUTO_MODEL if model_label.startswith(AUTO_MODEL_PREFIX) else model_label
+
+
+class ModelRouter:
+    """
+    Picks the model for a question answered in `model="auto"` mode from local features of the question and of its
+    retrieval, without an LLM call. Numeric reasoning over tables, comparisons, explanations and long questions go
+    to `strong_model`. Short lookups, and other questions whose retrieval clearly singles out a passage, go to
+    `cheap_model`. A passage is singled out when the best dense cosine similarity stands at least `min_top_score_z`
+    standard deviations above the mean of the candidates; the best of some 50 unrelated candidates is expected
+    about 2.25 above. Questions retrieved without scores, such as follow-ups, go to `strong_model`. Keeps the
+    requests and latency of every route.
+    """
+
+    def __init__(self, cheap_model: str, strong_model: str, max_cheap_terms: int, min_top_score_z: float):
+        self.cheap_model = cheap_model
+        self.strong_model = strong_model
+        self.max_cheap_terms = max_cheap_terms
+        self.min_top_score_z = min_top_score_z
+        self._routes: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def route(self, question: str, scores: Optional[Sequence[float]]) -> RoutingDecision:
+        features = extract_features(question, scores)
+        if features.numeric:
+            model, reason = self.strong_model, "numeric reasoning"
+        elif features.question_type in ("comparison", "explanation"):
+            model, reason = self.strong_model, features.question_type
+        elif features.terms > self.max_cheap_terms:
+            model, reason = self.strong_model, "long question"
+        elif features.question_type == "lookup":
+            model, reason = self.cheap_model, "lookup"
+        elif features.top_score_z is None:
+            model, reason = self.strong_model, "unscored retrieval"
+        elif features.top_score_z >= self.min_top_score_z:
+            model, reason = self.cheap_model, "focused retrieval"
+        else:
+            model, reason = self.strong_model, "diffuse retrieval"
+
+        decision = RoutingDecision(model=model, reason=reason, features=features)
+        logger.info(f"Routed question to {model} ({reason}): {asdict(features)}")
+        return decision
+
+    def record(self, decision: RoutingDecision, seconds: float):
+        with self._lock:
+            route = self._routes.setdefault(decision.model, {"requests": 0, "seconds": 0.0})
+            route["requests"] += 1
+            route["seconds"] += seconds
+        logger.info(f"Answered with {decision.model} ({decision.reason}) in {seconds * 1000:.0f}ms")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                model: {
+                    "requests": route["requests"],
+                    "average_latency_ms": route["seconds"] / route["requests"] * 1000,
+                }
+                for model, route in self._routes.items()
+            }
@@ -13,16 +13,45 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import asyncio
 import base64
 import os
+import random
+from collections import Counter
 from io import BytesIO
 
 import fitz
-import requests
+import httpx
 from PIL import Image
 from llama_index.llms.nvidia import NVIDIA
 
 from backend.config import settings
+from backend.utilities.image_triage import CHART, classify_image
+from backend.utilities.vision_cache import VisionCache
+
+NEVA_22B_URL = "https://ai.api.nvidia.com/v1/vlm/nvidia/neva-22b"
+DEPLOT_URL = "https://ai.api.nvidia.com/v1/vlm/google/deplot"
+CHART_EXPLANATION_MODEL = "meta/llama-3.1-70b-instruct"
+CHART_EXPLANATION_PROMPT = "Your responsibility is to explain charts. You are an expert in describing the responses of linearized tables into plain English text for LLMs to use. Explain the following linearized table. "
+GRAPH_KEYWORDS = ["graph", "plot", "chart", "table"]
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Bump when a prompt or its generation parameters change, so cached outputs of the old prompt are not reused
+DESCRIBE_PROMPT_VERSION = "describe-v1"
+DEPLOT_PROMPT_VERSION = "deplot-v1"
+CHART_EXPLANATION_PROMPT_VERSION = "explain-v1"
+
+_vision_cache = None
+
+
+def get_vision_cache() -> VisionCache | None:
+    """Return the process-wide vision output cache, or None when it is disabled."""
+    global _vision_cache
+    if settings.VISION_CACHE_ENABLED and _vision_cache is None:
+        _vision_cache = VisionCache(
+            settings.VISION_CACHE_PATH, settings.VISION_CACHE_MAX_BYTES
+        )
+    return _vision_cache
 
 
 def get_b64_image_from_content(image_content):
@@ -35,84 +64,224 @@ def get_b64_image_from_content(image_content):
     return base64.b64encode(buffered.getvalue()).decode("utf-8")
 
 
+class NvidiaVisionClient:
+    """
+    Async client for the NVIDIA vision endpoints. Connections are kept alive across calls, at most
+    `max_concurrency` requests are in flight at once and 429/5xx responses are retried with exponential backoff.
+    Outputs are read from and written to the vision cache, and identical images in flight are only sent once.
+    `triage_stats` counts how images were classified and how many remote calls the local triage avoided.
+    Use one client per event loop, as an async context manager.
+    """
+
+    def __init__(
+        self,
+        api_key: str | None = None,
+        max_concurrency: int = settings.NVIDIA_MAX_CONCURRENCY,
+        timeout: float = settings.NVIDIA_TIMEOUT_SECONDS,
+        max_retries: int = settings.NVIDIA_MAX_RETRIES,
+        cache: VisionCache | None = None,
+        triage_confidence: float | None = (
+            settings.IMAGE_TRIAGE_CONFIDENCE if settings.IMAGE_TRIAGE_ENABLED else None
+        ),
+    ):
+        api_key = api_key or settings.NVIDIA_API_KEY
+        if not api_key:
+            raise ValueError(
+                "NVIDIA API Key is not set. Please set the NVIDIA_API_KEY environment variable."
+            )
+        self.max_retries = max_retries
+        self.cache = cache if cache is not None else get_vision_cache()
+        self._in_flight: dict[tuple, asyncio.Future] = {}
+        self.triage_confidence = triage_confidence
+        self.triage_stats = Counter()
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._client = httpx.AsyncClient(
+            headers={"Authorization": f"Bearer {api_key}", "Accept": "application/json"},
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=max_concurrency,
+                max_keepalive_connections=max_concurrency,
+            ),
+        )
+        self._llm = NVIDIA(model_name=CHART_EXPLANATION_MODEL)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        await self._client.aclose()
+
+    @staticmethod
+    def _backoff_seconds(attempt: int, response: httpx.Response | None) -> float:
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return float(retry_after)
+        return min(2**attempt, 30) + random.uniform(0, 1)
+
+    async def _invoke(self, invoke_url: str, payload: dict) -> str:
+        async with self._semaphore:
+            for attempt in range(self.max_retries + 1):
+                response = None
+                try:
+                    response = await self._client.post(invoke_url, json=payload)
+                except httpx.TransportError:
+                    if attempt == self.max_retries:
+                        raise
+                else:
+                    if (
+                        response.status_code not in RETRYABLE_STATUS_CODES
+                        or attempt == self.max_retries
+                    ):
+                        response.raise_for_status()
+                        return response.json()["choices"][0]["message"]["content"]
+                await asyncio.sleep(self._backoff_seconds(attempt, response))
+
+    async def _cached(self, image_content, model: str, prompt_version: str, compute):
+        if self.cache is None:
+            return await compute()
+        key = (VisionCache.image_hash(image_content), model, prompt_version)
+        if key in self._in_flight:
+            return await asyncio.shield(self._in_flight[key])
+        output = self.cache.get(*key)
+        if output is not None:
+            return output
+        self._in_flight[key] = asyncio.ensure_future(compute())
+        try:
+            output = await asyncio.shield(self._in_flight[key])
+        finally:
+            del self._in_flight[key]
+        self.cache.set(*key, output)
+        return output
+
+    async def describe_image(self, image_content):
+        """Generate a description of an image using NVIDIA API."""
+        return await self._cached(
+            image_content,
+            NEVA_22B_URL,
+            DESCRIBE_PROMPT_VERSION,
+            lambda: self._describe_image(image_content),
+        )
+
+    async def _describe_image(self, image_content):
+        image_b64 = get_b64_image_from_content(image_content)
+        payload = {
+            "messages": [
+                {
+                    "role": "user",
+                    "content": f'Describe what you see in this image. <img src="data:image/png;base64,{image_b64}" />',
+                }
+            ],
+            "max_tokens": 1024,
+            "temperature": 0.20,
+            "top_p": 0.70,
+            "seed": 0,
+            "stream": False,
+        }
+        return await self._invoke(NEVA_22B_URL, payload)
+
+    async def process_graph_deplot(self, image_content):
+        """Process a graph image using NVIDIA's Deplot API."""
+        return await self._cached(
+            image_content,
+            DEPLOT_URL,
+            DEPLOT_PROMPT_VERSION,
+            lambda: self._process_graph_deplot(image_content),
+        )
+
+    async def _process_graph_deplot(self, image_content):
+        image_b64 = get_b64_image_from_content(image_content)
+        payload = {
+            "messages": [
+                {
+                    "role": "user",
+                    "content": f'Generate underlying data table of the figure below: <img src="data:image/png;base64,{image_b64}" />',
+                }
+            ],
+            "max_tokens": 1024,
+            "temperature": 0.20,
+            "top_p": 0.20,
+            "stream": False,
+        }
+        return await self._invoke(DEPLOT_URL, payload)
+
+    async def process_graph(self, image_content):
+        """Process a graph image and generate a description."""
+        return await self._cached(
+            image_content,
+            CHART_EXPLANATION_MODEL,
+            CHART_EXPLANATION_PROMPT_VERSION,
+            lambda: self._process_graph(image_content),
+        )
+
+    async def _process_graph(self, image_content):
+        deplot_description = await self.process_graph_deplot(image_content)
+        async with self._semaphore:
+            response = await self._llm.acomplete(
+                CHART_EXPLANATION_PROMPT + deplot_description
+            )
+        return response.text
+
+    async def is_graph(self, image_content):
+        """Determine if an image is a graph, plot, chart, or table."""
+        res = await self.describe_image(image_content)
+        return _describes_graph(res)
+
+    async def caption_image(self, image_content):
+        """
+        Caption an image with as few remote calls as possible. Images the local classifier is confident about skip
+        the VLM: charts go straight to deplot and the explanation model, other images get an empty caption. Only
+        ambiguous images are described by the VLM, and that description is kept as the caption unless it is a chart.
+        """
+        if self.triage_confidence is not None:
+            label, confidence = classify_image(image_content)
+            if confidence >= self.triage_confidence:
+                self.triage_stats[label] += 1
+                self.triage_stats["calls_avoided"] += 1
+                if label == CHART:
+                    return await self.process_graph(image_content)
+                return " "
+        self.triage_stats["ambiguous"] += 1
+        description = await self.describe_image(image_content)
+        if _describes_graph(description):
+            return await self.process_graph(image_content)
+        return description
+
+
+def _describes_graph(description):
+    return any(keyword in description.lower() for keyword in GRAPH_KEYWORDS)
+
+
+def _run_with_client(call):
+    """Run a single client call from synchronous code."""
+
+    async def runner():
+        async with NvidiaVisionClient() as client:
+            return await call(client)
+
+    return asyncio.run(runner())
+
+
 def is_graph(image_content):
     """Determine if an image is a graph, plot, chart, or table."""
-    res = describe_image(image_content)
-    return any(
-        keyword in res.lower() for keyword in ["graph", "plot", "chart", "table"]
-    )
+    return _run_with_client(lambda client: client.is_graph(image_content))
 
 
 def process_graph(image_content):
     """Process a graph image and generate a description."""
-    deplot_description = process_graph_deplot(image_content)
-    mixtral = NVIDIA(model_name="meta/llama-3.1-70b-instruct")
-    response = mixtral.complete(
-        "Your responsibility is to explain charts. You are an expert in describing the responses of linearized tables into plain English text for LLMs to use. Explain the following linearized table. "
-        + deplot_description
-    )
-    return response.text
+    return _run_with_client(lambda client: client.process_graph(image_content))
 
 
 def describe_image(image_content):
     """Generate a description of an image using NVIDIA API."""
-    image_b64 = get_b64_image_from_content(image_content)
-    invoke_url = "https://ai.api.nvidia.com/v1/vlm/nvidia/neva-22b"
-    api_key = settings.NVIDIA_API_KEY
-
-    if not api_key:
-        raise ValueError(
-            "NVIDIA API Key is not set. Please set the NVIDIA_API_KEY environment variable."
-        )
-
-    headers = {"Authorization": f"Bearer {api_key}", "Accept": "application/json"}
-
-    payload = {
-        "messages": [
-            {
-                "role": "user",
-                "content": f'Describe what you see in this image. <img src="data:image/png;base64,{image_b64}" />',
-            }
-        ],
-        "max_tokens": 1024,
-        "temperature": 0.20,
-        "top_p": 0.70,
-        "seed": 0,
-        "stream": False,
-    }
-
-    response = requests.post(invoke_url, headers=headers, json=payload)
-    return response.json()["choices"][0]["message"]["content"]
+    return _run_with_client(lambda client: client.describe_image(image_content))
 
 
 def process_graph_deplot(image_content):
     """Process a graph image using NVIDIA's Deplot API."""
-    invoke_url = "https://ai.api.nvidia.com/v1/vlm/google/deplot"
-    image_b64 = get_b64_image_from_content(image_content)
-    api_key = settings.NVIDIA_API_KEY
-
-    if not api_key:
-        raise ValueError(
-            "NVIDIA API Key is not set. Please set the NVIDIA_API_KEY environment variable."
-        )
-
-    headers = {"Authorization": f"Bearer {api_key}", "Accept": "application/json"}
-
-    payload = {
-        "messages": [
-            {
-                "role": "user",
-                "content": f'Generate underlying data table of the figure below: <img src="data:image/png;base64,{image_b64}" />',
-            }
-        ],
-        "max_tokens": 1024,
-        "temperature": 0.20,
-        "top_p": 0.20,
-        "stream": False,
-    }
-
-    response = requests.post(invoke_url, headers=headers, json=payload)
-    return response.json()["choices"][0]["message"]["content"]
+    return _run_with_client(lambda client: client.process_graph_deplot(image_content))
 
 
 def extract_text_around_item(text_blocks, bbox, page_height, threshold_percentage=0.1):
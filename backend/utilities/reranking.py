@@ -0,0 +1,148 @@
+import logging
+import math
+import time
+from collections import Counter
+from typing import List, Optional
+
+from llama_index.core.base.base_retriever import BaseRetriever
+from llama_index.core.postprocessor.types import BaseNodePostprocessor
+from llama_index.core.schema import MetadataMode, NodeWithScore, QueryBundle
+from pydantic import Field, PrivateAttr
+
+from backend.utilities.executors import run_llm
+from backend.utilities.lexical_index import tokenize
+
+logger = logging.getLogger(__name__)
+
+
+class LexicalOverlapScorer:
+    """Scores a text by the query terms it contains, weighted by how rare they are among the candidates"""
+
+    batch_size = 64
+
+    def score(self, query: str, texts: List[str]) -> List[float]:
+        query_terms = set(tokenize(query))
+        documents = [set(tokenize(text)) for text in texts]
+        document_frequency = Counter(term for document in documents for term in document & query_terms)
+        return [
+            sum(
+                math.log(1 + len(documents) / document_frequency[term])
+                for term in document & query_terms
+            )
+            for document in documents
+        ]
+
+
+class CrossEncoderScorer:
+    """A sentence-transformers cross-encoder, scoring (query, text) pairs jointly"""
+
+    batch_size = 16
+
+    def __init__(self, model_name: str):
+        from sentence_transformers import CrossEncoder
+
+        self.model = CrossEncoder(model_name, max_length=512, device="cpu")
+
+    def score(self, query: str, texts: List[str]) -> List[float]:
+        return self.model.predict([(query, text) for text in texts], batch_size=self.batch_size).tolist()
+
+
+def get_scorer(model_name: Optional[str]):
+    """The cross-encoder if a model is configured and sentence-transformers is installed, lexical overlap otherwise"""
+    if model_name:
+        try:
+            return CrossEncoderScorer(model_name)
+        except ImportError:
+            logger.warning("sentence-transformers is not installed, reranking by lexical overlap")
+        except Exception as e:
+            logger.warning(f"Could not load cross-encoder {model_name}, reranking by lexical overlap: {str(e)}")
+    return LexicalOverlapScorer()
+
+
+class BudgetedReranker(BaseNodePostprocessor):
+    """
+    Reranks the retrieved candidates and keeps the `top_n` best. Candidates are scored in retrieval order, in
+    batches sized from the measured time per candidate to what still fits in `budget_seconds`; candidates left
+    unscored rank after the scored ones in their retrieval order, with scores by rank below the lowest scored one,
+    so a slow request degrades to plain retrieval rather than waiting. Until the time per candidate is known,
+    candidates are scored one at a time.
+    """
+
+    top_n: int = Field(description="Number of nodes to keep.")
+    budget_seconds: float = Field(description="Time allowed for scoring per request.")
+    _scorer = PrivateAttr()
+    # Moving average of the seconds to score one candidate, shared by the requests
+    _seconds_per_pair: Optional[float] = PrivateAttr(default=None)
+
+    def __init__(self, scorer, top_n: int, budget_seconds: float):
+        super().__init__(top_n=top_n, budget_seconds=budget_seconds)
+        self._scorer = scorer
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "BudgetedReranker"
+
+    def _next_batch_size(self, remaining: float) -> int:
+        if self._seconds_per_pair is None:
+            return 1
+        return min(self._scorer.batch_size, int(remaining / self._seconds_per_pair))
+
+    def _record_batch(self, pairs: int, seconds: float):
+        per_pair = seconds / pairs
+        if self._seconds_per_pair is None:
+            self._seconds_per_pair = per_pair
+        else:
+            self._seconds_per_pair = 0.8 * self._seconds_per_pair + 0.2 * per_pair
+
+    def _postprocess_nodes(
+        self, nodes: List[NodeWithScore], query_bundle: Optional[QueryBundle] = None
+    ) -> List[NodeWithScore]:
+        if query_bundle is None or len(nodes) <= self.top_n:
+            return nodes[: self.top_n]
+
+        start = time.perf_counter()
+        deadline = start + self.budget_seconds
+        scored = []
+        while len(scored) < len(nodes):
+            batch_start = time.perf_counter()
+            batch_size = self._next_batch_size(deadline - batch_start)
+            if batch_size < 1:
+                break
+            batch = nodes[len(scored) : len(scored) + batch_size]
+            scores = self._scorer.score(
+                query_bundle.query_str,
+                [node.node.get_content(metadata_mode=MetadataMode.LLM) for node in batch],
+            )
+            self._record_batch(len(batch), time.perf_counter() - batch_start)
+            scored.extend(NodeWithScore(node=node.node, score=score) for node, score in zip(batch, scores))
+
+        reranked = sorted(scored, key=lambda node: node.score, reverse=True)
+        # Retrieval scores are on another scale than the scorer's, so the unscored tail gets scores by rank below
+        # the lowest scored node and keeps its retrieval order
+        lowest = reranked[-1].score if reranked else 0.0
+        reranked.extend(
+            NodeWithScore(node=node.node, score=lowest - rank)
+            for rank, node in enumerate(nodes[len(scored) :], start=1)
+        )
+        logger.info(
+            f"Reranked {len(scored)}/{len(nodes)} candidates in {(time.perf_counter() - start) * 1000:.0f}ms, "
+            f"keeping {self.top_n}"
+        )
+        return reranked[: self.top_n]
+
+
+class RerankingRetriever(BaseRetriever):
+    """Reranks the candidates of `retriever`, scoring them on the LLM pool when retrieving asynchronously"""
+
+    def __init__(self, retriever: BaseRetriever, reranker: BudgetedReranker):
+        super().__init__()
+        self.retriever = retriever
+        self.reranker = reranker
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        return self.reranker.postprocess_nodes(self.retriever.retrieve(query_bundle), query_bundle)
+
+    async def _aretrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        nodes = await self.retriever.aretrieve(query_bundle)
+        # Scoring is CPU bound, off the event loop
+        return await run_llm(self.reranker.postprocess_nodes, nodes, query_bundle)
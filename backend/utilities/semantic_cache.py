@@ -0,0 +1,115 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+
+@dataclass
+class CachedAnswer:
+    question: str
+    answer: str
+    sources: List[dict]
+    embedding: np.ndarray = field(repr=False)
+    created_at: float = field(default_factory=time.time)
+
+
+class SemanticAnswerCache:
+    """
+    In-process cache of LLM answers, looked up by (article_id, model) and the cosine similarity of the question
+    embedding. Entries expire after `ttl_seconds` and the least recently used entry is evicted once `max_entries`
+    is reached.
+    """
+
+    def __init__(
+        self, similarity_threshold: float, ttl_seconds: int, max_entries: int
+    ):
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: OrderedDict[Tuple[str, str, str], CachedAnswer] = OrderedDict()
+        self._buckets: dict[Tuple[str, str], set[Tuple[str, str, str]]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _is_expired(self, entry: CachedAnswer, now: float) -> bool:
+        return now - entry.created_at > self.ttl_seconds
+
+    def _remove(self, key: Tuple[str, str, str]):
+        self._entries.pop(key, None)
+        bucket = self._buckets.get(key[:2])
+        if bucket is not None:
+            bucket.discard(key)
+            if not bucket:
+                del self._buckets[key[:2]]
+
+    def lookup(
+        self, article_id: str, model: str, embedding: List[float]
+    ) -> Optional[CachedAnswer]:
+        query = self._normalize(embedding)
+        now = time.time()
+        with self._lock:
+            keys = []
+            for key in list(self._buckets.get((article_id, model), ())):
+                if self._is_expired(self._entries[key], now):
+                    self._remove(key)
+                else:
+                    keys.append(key)
+            if keys:
+                matrix = np.stack([self._entries[key].embedding for key in keys])
+                similarities = matrix @ query
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.similarity_threshold:
+                    self._entries.move_to_end(keys[best])
+                    self.hits += 1
+                    return self._entries[keys[best]]
+            self.misses += 1
+            return None
+
+    def store(
+        self,
+        article_id: str,
+        model: str,
+        question: str,
+        embedding: List[float],
+        answer: str,
+        sources: List[dict],
+        created_at: Optional[float] = None,
+    ):
+        key = (article_id, model, question.strip().lower())
+        entry = CachedAnswer(
+            question=question,
+            answer=answer,
+            sources=sources,
+            embedding=self._normalize(embedding),
+            created_at=created_at or time.time(),
+        )
+        if self._is_expired(entry, time.time()):
+            return
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            self._buckets.setdefault(key[:2], set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,84 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Hashable
+
+from llama_index.core.memory import ChatMemoryBuffer
+
+
+def memory_bytes(memory: ChatMemoryBuffer) -> int:
+    return sum(len(str(message.content or "").encode("utf-8")) for message in memory.get_all())
+
+
+@dataclass
+class ChatSession:
+    memory: ChatMemoryBuffer
+    last_used: float
+    # Size of the memory as of the session's last resume
+    bytes: int = 0
+
+
+class ChatSessionPool:
+    """
+    The chat memories of the active sessions, the only per-session state of a chat engine. A memory is trimmed to
+    its most recent `token_limit` tokens whenever its session is resumed, so each holds at most one turn more than
+    that. Sessions idle for `ttl_seconds` are dropped, and the least recently used ones are dropped while the
+    memories take more than `max_bytes` of text. Each memory is measured when its session is resumed, so the turn
+    added since is only counted on the next resume.
+    """
+
+    def __init__(self, token_limit: int, ttl_seconds: int, max_bytes: int):
+        self.token_limit = token_limit
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.evictions = 0
+        self._bytes = 0
+        self._sessions: "OrderedDict[Hashable, ChatSession]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def memory(self, key: Hashable) -> ChatMemoryBuffer:
+        with self._lock:
+            now = time.monotonic()
+            self._evict_idle(now)
+            session = self._sessions.pop(key, None)
+            if session is None:
+                session = ChatSession(
+                    memory=ChatMemoryBuffer.from_defaults(token_limit=self.token_limit),
+                    last_used=now,
+                )
+            else:
+                # Keep only what fits the token limit, older messages would never be sent again
+                session.memory.set(session.memory.get())
+                session.last_used = now
+                self._bytes -= session.bytes
+                session.bytes = memory_bytes(session.memory)
+                self._bytes += session.bytes
+            self._sessions[key] = session
+            self._evict_over_budget()
+            return session.memory
+
+    def _evict_idle(self, now: float):
+        while self._sessions:
+            key, session = next(iter(self._sessions.items()))
+            if now - session.last_used < self.ttl_seconds:
+                return
+            del self._sessions[key]
+            self._bytes -= session.bytes
+            self.evictions += 1
+
+    def _evict_over_budget(self):
+        # Never the session just resumed, the last one
+        while len(self._sessions) > 1 and self._bytes > self.max_bytes:
+            _, session = self._sessions.popitem(last=False)
+            self._bytes -= session.bytes
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "evictions": self.evictions,
+            }
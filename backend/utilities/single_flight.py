@@ -0,0 +1,117 @@
+import asyncio
+import threading
+from typing import Awaitable, Callable, Dict, Hashable, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+def normalize_prompt(prompt: str) -> str:
+    return " ".join(prompt.casefold().split())
+
+
+class _Counters:
+    def __init__(self):
+        self.calls = 0
+        self.executions = 0
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "executions": self.executions,
+            "saved": self.calls - self.executions,
+        }
+
+
+class _Progress:
+    """The progress callbacks of the callers sharing a call, the latest message replayed to those joining late"""
+
+    def __init__(self):
+        self.listeners: List[Callable[[str], None]] = []
+        self.latest: Optional[str] = None
+
+    def subscribe(self, listener: Callable[[str], None]):
+        self.listeners.append(listener)
+        if self.latest is not None:
+            listener(self.latest)
+
+    def __call__(self, message: str):
+        self.latest = message
+        for listener in list(self.listeners):
+            listener(message)
+
+
+class SingleFlight(_Counters):
+    """
+    Coalesces concurrent calls with the same key: the first caller runs the coroutine, later callers arriving while
+    it is in flight wait for and share its result (or exception). The coroutine is given a progress callback that
+    reports to the `progress` of every caller waiting on it. Nothing is cached once the call has completed.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._in_flight: Dict[Hashable, asyncio.Task] = {}
+        self._progress: Dict[Hashable, _Progress] = {}
+
+    async def do(
+        self,
+        key: Hashable,
+        func: Callable[[Callable[[str], None]], Awaitable[T]],
+        progress: Callable[[str], None] = lambda message: None,
+    ) -> T:
+        self.calls += 1
+        task = self._in_flight.get(key)
+        if task is None:
+            self.executions += 1
+            reporter = self._progress[key] = _Progress()
+            task = asyncio.ensure_future(func(reporter))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._finish(key, reporter))
+        self._progress[key].subscribe(progress)
+        # A caller that is cancelled must not cancel the call the others are waiting on
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, reporter: _Progress):
+        self._in_flight.pop(key, None)
+        if self._progress.get(key) is reporter:
+            del self._progress[key]
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class ThreadSingleFlight(_Counters):
+    """`SingleFlight` for blocking functions called from several threads"""
+
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.Lock()
+        self._in_flight: Dict[Hashable, _Call] = {}
+
+    def do(self, key: Hashable, func: Callable[[], T]) -> T:
+        with self._lock:
+            self.calls += 1
+            call = self._in_flight.get(key)
+            leader = call is None
+            if leader:
+                self.executions += 1
+                call = self._in_flight[key] = _Call()
+
+        if leader:
+            try:
+                call.result = func()
+            except BaseException as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    del self._in_flight[key]
+                call.done.set()
+        else:
+            call.done.wait()
+
+        if call.error is not None:
+            raise call.error
+        return call.result
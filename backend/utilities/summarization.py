@@ -0,0 +1,135 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Sequence
+
+from llama_index.core.llms import LLM
+from llama_index.core.node_parser import SentenceSplitter
+from llama_index.core.schema import Document, MetadataMode
+from llama_index.core.utils import get_tokenizer
+
+logger = logging.getLogger(__name__)
+
+MAP_PROMPT = (
+    "Summarize the following part of a document. Keep the key facts, figures, names and conclusions.\n\n"
+    "{text}\n\nSummary:"
+)
+REDUCE_PROMPT = (
+    "The following are summaries of consecutive parts of a document. Combine them into a single summary that keeps "
+    "the key facts, figures, names and conclusions.\n\n{text}\n\nSummary:"
+)
+FINAL_PROMPT = "The following are summaries of consecutive parts of a document.\n\n{text}\n\n{instruction}"
+SEPARATOR = "\n\n"
+
+
+@dataclass
+class LevelStats:
+    level: str
+    calls: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    seconds: float = 0.0
+
+    def __str__(self):
+        return (
+            f"{self.level}: {self.calls} calls, {self.input_tokens} input / {self.output_tokens} output tokens, "
+            f"{self.seconds:.1f}s"
+        )
+
+
+@dataclass
+class SummaryResult:
+    summaries: Dict[str, str]
+    levels: List[LevelStats] = field(default_factory=list)
+
+
+class MapReduceSummarizer:
+    """
+    Summarizes whole documents without a vector index. The text is split into chunks that are packed into groups
+    of at most `group_tokens` tokens; every group is summarized (map), then the partial summaries are packed and
+    summarized again level by level (reduce) until they fit a single group, from which each requested summary is
+    written. The calls of a level run concurrently, at most `max_concurrency` at a time, so a level takes about as
+    long as its slowest call.
+    """
+
+    def __init__(self, llm: LLM, group_tokens: int = 3000, chunk_tokens: int = 512, max_concurrency: int = 8):
+        self.llm = llm
+        self.group_tokens = group_tokens
+        self.splitter = SentenceSplitter(chunk_size=chunk_tokens, chunk_overlap=0)
+        self.max_concurrency = max_concurrency
+        self._tokenizer = get_tokenizer()
+
+    def count_tokens(self, text: str) -> int:
+        return len(self._tokenizer(text))
+
+    def pack(self, texts: Sequence[str]) -> List[List[str]]:
+        """Consecutive texts in groups of at most `group_tokens` tokens, at least two per group so a reduce shrinks"""
+        groups, group, group_tokens = [], [], 0
+        for text in texts:
+            tokens = self.count_tokens(text)
+            if len(group) >= 2 and group_tokens + tokens > self.group_tokens:
+                groups.append(group)
+                group, group_tokens = [], 0
+            group.append(text)
+            group_tokens += tokens
+        if group:
+            groups.append(group)
+        return groups
+
+    async def _complete_all(self, level: str, prompts: List[str], semaphore: asyncio.Semaphore):
+        stats = LevelStats(level, calls=len(prompts))
+        start = time.perf_counter()
+
+        async def complete(prompt: str) -> str:
+            async with semaphore:
+                return (await self.llm.acomplete(prompt)).text.strip()
+
+        outputs = await asyncio.gather(*(complete(prompt) for prompt in prompts))
+        stats.seconds = time.perf_counter() - start
+        stats.input_tokens = sum(self.count_tokens(prompt) for prompt in prompts)
+        stats.output_tokens = sum(self.count_tokens(output) for output in outputs)
+        logger.info(f"Summarization {stats}")
+        return outputs, stats
+
+    async def asummarize(self, documents: Sequence[Document], instructions: Dict[str, str]) -> SummaryResult:
+        """One summary per entry of `instructions` (name -> what to write), sharing the map and reduce levels"""
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        result = SummaryResult(summaries={})
+        chunks = [
+            node.get_content(metadata_mode=MetadataMode.NONE)
+            for node in self.splitter.get_nodes_from_documents(documents)
+        ]
+        chunks = [chunk for chunk in chunks if chunk.strip()]
+        if not chunks:
+            return result
+
+        partials, stats = await self._complete_all(
+            "map",
+            [MAP_PROMPT.format(text=SEPARATOR.join(group)) for group in self.pack(chunks)],
+            semaphore,
+        )
+        result.levels.append(stats)
+
+        level = 0
+        while len(partials) > 1 and self.count_tokens(SEPARATOR.join(partials)) > self.group_tokens:
+            level += 1
+            partials, stats = await self._complete_all(
+                f"reduce {level}",
+                [REDUCE_PROMPT.format(text=SEPARATOR.join(group)) for group in self.pack(partials)],
+                semaphore,
+            )
+            result.levels.append(stats)
+
+        text = SEPARATOR.join(partials)
+        summaries, stats = await self._complete_all(
+            "final",
+            [FINAL_PROMPT.format(text=text, instruction=instruction) for instruction in instructions.values()],
+            semaphore,
+        )
+        result.levels.append(stats)
+        result.summaries = dict(zip(instructions, summaries))
+        return result
+
+    def summarize(self, documents: Sequence[Document], instructions: Dict[str, str]) -> SummaryResult:
+        return asyncio.run(self.asummarize(documents, instructions))
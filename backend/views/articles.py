@@ -1,26 +1,109 @@
-from typing import List
+import hashlib
+import secrets
+from datetime import date
+from typing import Optional
 
-from fastapi import APIRouter, status, HTTPException, Depends
+from fastapi import APIRouter, status, HTTPException, Depends, Header, Query, Request, Response
 
+from backend.config import settings
 from backend.schemas.articles import (
+    ArticlePageResponse,
     ArticleResponse,
     ArticleSummaryResponse,
+    SummaryLength,
+)
+from backend.schemas.jobs import JobResponse
+from backend.services.articles import (
+    _get_article,
+    _get_articles_page,
+    _get_catalog,
+    _get_stored_summary,
+    _invalidate_catalog,
 )
-from backend.services.articles import _get_article, _get_all_articles, _generate_summary
 from backend.services.auth_bearer import security_scheme
+from backend.services.jobs import submit_summary_job
+from backend.utilities.catalog_cache import ARTICLE_FIELDS
 
 articles_router = APIRouter(prefix="/articles", tags=["articles"])
 
 
 @articles_router.get(
     "/",
-    response_model=List[ArticleResponse],
+    response_model=ArticlePageResponse,
+    responses={status.HTTP_400_BAD_REQUEST: {"model": None}},
 )
 async def get_all_articles(
+    request: Request,
+    response: Response,
+    limit: int = Query(default=settings.ARTICLES_PAGE_SIZE, ge=1, le=settings.ARTICLES_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = Query(default=None, description="Comma separated article fields to return"),
+    author: Optional[str] = None,
+    published_from: Optional[date] = None,
+    published_to: Optional[date] = None,
+    title_prefix: Optional[str] = None,
     token: str = Depends(security_scheme),
-) -> List[ArticleResponse]:
-    articles = await _get_all_articles()
-    return articles
+) -> ArticlePageResponse:
+    """
+    A page of the article catalog, newest first, served from the in-process cache. Pass the returned `next_cursor`
+    back as `cursor` for the following page. Responses carry an ETag of the catalog version and the query; a
+    request whose If-None-Match matches it gets an empty 304 Not Modified.
+    """
+    field_names = ARTICLE_FIELDS
+    if fields:
+        field_names = ["a_id"] + [name for name in fields.split(",") if name and name != "a_id"]
+        if unknown := set(field_names) - set(ARTICLE_FIELDS):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unknown article fields: {', '.join(sorted(unknown))}",
+            )
+
+    snapshot = await _get_catalog()
+    if not snapshot:
+        return ArticlePageResponse(items=[])
+    etag = f'"{hashlib.sha256(f"{snapshot.etag}?{request.url.query}".encode("utf-8")).hexdigest()[:32]}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+    try:
+        articles, next_cursor = _get_articles_page(
+            snapshot,
+            limit,
+            cursor,
+            author=author,
+            published_from=published_from,
+            published_to=published_to,
+            title_prefix=title_prefix,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    response.headers["ETag"] = etag
+    return ArticlePageResponse(
+        items=[article.project(field_names) for article in articles],
+        next_cursor=next_cursor,
+    )
+
+
+@articles_router.post(
+    "/cache/invalidate",
+    status_code=status.HTTP_204_NO_CONTENT,
+    responses={status.HTTP_403_FORBIDDEN: {"model": None}},
+)
+async def invalidate_catalog_cache(
+    x_catalog_token: str | None = Header(default=None),
+) -> Response:
+    """
+    Drop the cached article catalog, called by the ingestion DAG once it has loaded new articles.
+    Authenticated with the shared CATALOG_INVALIDATION_TOKEN rather than a user token.
+    """
+    if not (
+        settings.CATALOG_INVALIDATION_TOKEN
+        and x_catalog_token
+        and secrets.compare_digest(x_catalog_token, settings.CATALOG_INVALIDATION_TOKEN)
+    ):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid catalog token")
+    _invalidate_catalog()
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 
 @articles_router.get(
@@ -39,29 +122,53 @@ async def get_article( article_id: str,
     )
 
 
-@articles_router.post(
+@articles_router.get(
     "/generate-summary/{article_id}",
     response_model=ArticleSummaryResponse,
     responses={status.HTTP_404_NOT_FOUND: {"model": None}},
 )
-async def generate_summary(
-    article_id: str, token: str = Depends(security_scheme)
+async def get_summary(
+    article_id: str,
+    summary_length: SummaryLength = "medium",
+    token: str = Depends(security_scheme),
 ) -> ArticleSummaryResponse:
+    """
+    The stored summary of an article. 404 until it has been generated with POST.
+    """
     article = await _get_article(article_id=article_id)
-    if not article:
+    summary = await _get_stored_summary(article_id, summary_length) if article else None
+    if not summary:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Article with id {article_id} not found",
+            detail=f"No {summary_length} summary of article {article_id}",
         )
-    print(article)
+    return ArticleSummaryResponse(
+        article_id=article_id,
+        title=article.title,
+        summary_length=summary_length,
+        summary=summary,
+    )
 
-    summary = await _generate_summary(article_id)
-    if not summary:
+
+@articles_router.post(
+    "/generate-summary/{article_id}",
+    response_model=JobResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+    responses={status.HTTP_404_NOT_FOUND: {"model": None}},
+)
+async def generate_summary(
+    article_id: str,
+    token: str = Depends(security_scheme),
+) -> JobResponse:
+    """
+    Queue the summaries of an article. Poll GET /jobs/{job_id} for the ArticleSummariesResponse, with every length,
+    as its result; a summary of the same article that is already queued or running is returned instead of a new
+    job. All lengths are generated and stored at once, and only generated again once the PDF has changed.
+    """
+    article = await _get_article(article_id=article_id)
+    if not article:
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Failed to generate summary",
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Article with id {article_id} not found",
         )
-
-    return ArticleSummaryResponse(
-        article_id=article_id, title=article.title, summary=summary
-    )
+    return JobResponse(**submit_summary_job(article).to_dict())
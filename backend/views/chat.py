@@ -1,22 +1,156 @@
-from typing import List
+import json
+import logging
+from typing import AsyncIterator, List
 
 from fastapi import APIRouter, status, HTTPException, Depends
+from fastapi.responses import StreamingResponse
 
 from backend.schemas.qa import (
     QARequest,
     ChatHistoryResponse,
     ReportGenerationRequest,
     IndexReportResponse,
+    AnswerCacheStatsResponse,
+    EmbeddingCacheStatsResponse,
+    CoalescingStatsResponse,
+    ChatSessionStatsResponse,
+    ContextPackingStatsResponse,
+    CondenseStatsResponse,
+    ModelRoutingStatsResponse,
 )
-from backend.services.auth_bearer import get_current_user_id
+from backend.schemas.jobs import JobResponse
+from backend.services.auth_bearer import get_current_user_id, security_scheme
 from backend.services.chat import (
     process_qa_query,
-    get_qa_history, generate_research_report, index_report,
+    get_qa_history, index_report,
+    answer_cache,
+    qa_flight,
+    report_flight,
+    stream_qa_query,
+    model_router,
 )
+from backend.services.jobs import submit_report_job
+from backend.services.rag import get_embed_model, chat_sessions, condense_stats, context_packing_stats
+from backend.utilities.base_utils import s3_downloads
+from backend.utilities.embedding_cache import CachedEmbedding
+
+logger = logging.getLogger(__name__)
 
 chat_router = APIRouter(prefix="/chat", tags=["qa-interface"])
 
 
+async def _server_sent_events(tokens: AsyncIterator[str]) -> AsyncIterator[str]:
+    try:
+        async for token in tokens:
+            yield f"data: {json.dumps({'token': token})}\n\n"
+    except Exception as e:
+        logger.error(f"Error while streaming answer: {str(e)}", exc_info=True)
+        yield f"event: error\ndata: {json.dumps({'detail': str(e)})}\n\n"
+        return
+    yield "event: done\ndata: {}\n\n"
+
+
+@chat_router.get(
+    "/cache/stats",
+    response_model=AnswerCacheStatsResponse,
+)
+async def get_answer_cache_stats(
+    token: str = Depends(security_scheme),
+) -> AnswerCacheStatsResponse:
+    """
+    Hit/miss counters of the semantic answer cache
+    """
+    return AnswerCacheStatsResponse(**answer_cache.stats())
+
+
+@chat_router.get(
+    "/cache/embeddings/stats",
+    response_model=EmbeddingCacheStatsResponse,
+)
+async def get_embedding_cache_stats(
+    token: str = Depends(security_scheme),
+) -> EmbeddingCacheStatsResponse:
+    """
+    Hit/miss counters and size of the persistent embedding cache
+    """
+    embed_model = get_embed_model()
+    if not isinstance(embed_model, CachedEmbedding):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Embedding cache is disabled",
+        )
+    return EmbeddingCacheStatsResponse(**embed_model.stats())
+
+
+@chat_router.get(
+    "/sessions/stats",
+    response_model=ChatSessionStatsResponse,
+)
+async def get_chat_session_stats(
+    token: str = Depends(security_scheme),
+) -> ChatSessionStatsResponse:
+    """
+    Resident chat sessions and the size of their chat memories
+    """
+    return ChatSessionStatsResponse(**chat_sessions.stats())
+
+
+@chat_router.get(
+    "/context/stats",
+    response_model=ContextPackingStatsResponse,
+)
+async def get_context_packing_stats(
+    token: str = Depends(security_scheme),
+) -> ContextPackingStatsResponse:
+    """
+    Retrieved context tokens sent to the LLM, with and without packing into the token budget
+    """
+    return ContextPackingStatsResponse(**context_packing_stats.stats())
+
+
+@chat_router.get(
+    "/routing/stats",
+    response_model=ModelRoutingStatsResponse,
+)
+async def get_model_routing_stats(
+    token: str = Depends(security_scheme),
+) -> ModelRoutingStatsResponse:
+    """
+    Questions answered per model in model="auto" mode, and their average latency
+    """
+    return ModelRoutingStatsResponse(routes=model_router.stats())
+
+
+@chat_router.get(
+    "/condense/stats",
+    response_model=CondenseStatsResponse,
+)
+async def get_condense_stats(
+    token: str = Depends(security_scheme),
+) -> CondenseStatsResponse:
+    """
+    Chat turns answered without a condense-question call, and the latency those calls take when needed
+    """
+    return CondenseStatsResponse(**condense_stats.stats())
+
+
+@chat_router.get(
+    "/coalescing/stats",
+    response_model=CoalescingStatsResponse,
+)
+async def get_coalescing_stats(
+    token: str = Depends(security_scheme),
+) -> CoalescingStatsResponse:
+    """
+    Calls saved by sharing in-flight answers, reports and S3 downloads between concurrent identical requests
+    """
+    return CoalescingStatsResponse(
+        qa=qa_flight.stats(),
+        reports=report_flight.stats(),
+        s3_downloads=s3_downloads.stats(),
+    )
+
+
 @chat_router.post(
     "/{article_id}/qa",
     # response_model=QAResponse,
@@ -38,6 +172,25 @@ async def question_answer(
     }
 
 
+@chat_router.post(
+    "/{article_id}/qa/stream",
+    response_class=StreamingResponse,
+)
+async def question_answer_stream(
+    article_id: str, request: QARequest, user_id: int = Depends(get_current_user_id)
+) -> StreamingResponse:
+    """
+    Stream the answer to a Q/A query as Server-Sent Events, one `data` event per token followed by a `done` event
+    """
+    return StreamingResponse(
+        _server_sent_events(
+            stream_qa_query(article_id, request.question, request.model, user_id)
+        ),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @chat_router.get(
     "/{article_id}/history",
     # response_model=List[ChatHistoryResponse]
@@ -59,21 +212,20 @@ async def get_history(
 
 @chat_router.post(
     "/{article_id}/generate-report",
+    response_model=JobResponse,
+    status_code=status.HTTP_202_ACCEPTED,
 )
 async def create_report(
     article_id: str,
     request: ReportGenerationRequest,
     user_id: int = Depends(get_current_user_id),
-):
+) -> JobResponse:
     """
-    Generate a comprehensive research report for an article
+    Queue a comprehensive research report for an article. Poll GET /jobs/{job_id} for the report and its
+    report_id as the result
     """
-    return await generate_research_report(
-        article_id,
-        request.question,
-        request.model,
-        user_id,
-    )
+    job = submit_report_job(article_id, request.question, request.model, user_id)
+    return JobResponse(**job.to_dict())
 
 
 @chat_router.post(
@@ -0,0 +1,74 @@
+import json
+from typing import AsyncIterator
+
+from fastapi import APIRouter, status, HTTPException, Depends
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+
+from backend.schemas.jobs import JobQueueStatsResponse, JobResponse
+from backend.services.auth_bearer import get_current_user_id, security_scheme
+from backend.services.jobs import job_queue
+
+jobs_router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+
+def _get_job_or_404(job_id: str, user_id: int):
+    """The job, if it is shared or belongs to the user; the jobs of other users are not found"""
+    job = job_queue.get(job_id)
+    if job and job.user_id in (None, user_id):
+        return job
+    raise HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND,
+        detail=f"Job with id {job_id} not found",
+    )
+
+
+async def _server_sent_events(job_id: str) -> AsyncIterator[str]:
+    async for state in job_queue.subscribe(job_id):
+        payload = jsonable_encoder(JobResponse(**state))
+        yield f"event: {state['status']}\ndata: {json.dumps(payload)}\n\n"
+
+
+@jobs_router.get(
+    "/stats",
+    response_model=JobQueueStatsResponse,
+)
+async def get_job_queue_stats(
+    token: str = Depends(security_scheme),
+) -> JobQueueStatsResponse:
+    """
+    Number of jobs per status and of submissions served by a job already in flight
+    """
+    return JobQueueStatsResponse(**job_queue.stats())
+
+
+@jobs_router.get(
+    "/{job_id}",
+    response_model=JobResponse,
+    responses={status.HTTP_404_NOT_FOUND: {"model": None}},
+)
+async def get_job(job_id: str, user_id: int = Depends(get_current_user_id)) -> JobResponse:
+    """
+    Status, latest progress message and, once it has succeeded, the result of a job
+    """
+    return JobResponse(**_get_job_or_404(job_id, user_id).to_dict())
+
+
+@jobs_router.get(
+    "/{job_id}/events",
+    response_class=StreamingResponse,
+    responses={status.HTTP_404_NOT_FOUND: {"model": None}},
+)
+async def get_job_events(
+    job_id: str, user_id: int = Depends(get_current_user_id)
+) -> StreamingResponse:
+    """
+    Follow a job as Server-Sent Events: its state now and after every change, named after its status, ending with
+    a `succeeded` or `failed` event
+    """
+    _get_job_or_404(job_id, user_id)
+    return StreamingResponse(
+        _server_sent_events(job_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,7 +1,9 @@
 import json
 import os
+import time
 from datetime import datetime
 
+import requests
 import snowflake.connector
 from dotenv import load_dotenv
 
@@ -15,6 +17,10 @@ password = os.getenv("SNOWFLAKE_DB_PASSWORD")
 database = "DAMG_7245_A3"
 warehouse = "MY_WAREHOUSE"  # Make sure this is set in your .env file
 
+# Backend whose article catalog cache is invalidated after a load
+backend_url = os.getenv("BACKEND_URL")
+catalog_invalidation_token = os.getenv("CATALOG_INVALIDATION_TOKEN")
+
 
 # Function to convert date string to Snowflake-compatible format
 def convert_date(date_string):
@@ -25,28 +31,61 @@ def convert_date(date_string):
         return None
 
 
-# Function to insert an article
-def insert_article(cursor, article):
-    insert_query = """
-    INSERT INTO ARTICLES (A_ID, TITLE, DESCRIPTION, PUBLICATION_DATE, AUTHORS, PDF_URL, IMAGE_URL)
-    VALUES (%s, %s, %s, %s, %s, %s, %s)
-    """
-    converted_date = convert_date(article["date"])
-    cursor.execute(
-        insert_query,
-        (
-            article["id"],  # Use 'id' from JSON as A_ID
-            article["title"],
-            article["description"],
-            converted_date,
-            article["authors"],
-            article["pdf_url"],
-            article["image_url"],
-        ),
+ARTICLE_COLUMNS = [
+    "A_ID",
+    "TITLE",
+    "DESCRIPTION",
+    "PUBLICATION_DATE",
+    "AUTHORS",
+    "PDF_URL",
+    "IMAGE_URL",
+]
+# Rows sent per multi-row INSERT into the staging table
+STAGE_BATCH_SIZE = 5000
+
+
+# Function to convert a scraped article to an ARTICLES row
+def article_row(article):
+    return (
+        article["id"],  # Use 'id' from JSON as A_ID
+        article["title"],
+        article["description"],
+        convert_date(article["date"]),
+        article["authors"],
+        article["pdf_url"],
+        article["image_url"],
     )
 
 
-def insert_articles_from_json(json_file_path):
+def _merge_query():
+    updated = " OR ".join(
+        f"t.{column} IS DISTINCT FROM s.{column}" for column in ARTICLE_COLUMNS[1:]
+    )
+    return f"""
+    MERGE INTO ARTICLES t
+    USING ARTICLES_STAGE s
+    ON t.A_ID = s.A_ID
+    WHEN MATCHED AND ({updated}) THEN UPDATE SET
+        {", ".join(f"{column} = s.{column}" for column in ARTICLE_COLUMNS[1:])}
+    WHEN NOT MATCHED THEN INSERT ({", ".join(ARTICLE_COLUMNS)})
+        VALUES ({", ".join(f"s.{column}" for column in ARTICLE_COLUMNS)})
+    """
+
+
+def insert_articles_from_json(json_file_path, prune_missing=True):
+    """
+    Upsert the scraped articles into ARTICLES, keyed on A_ID. The rows are bulk loaded into a temporary staging
+    table and applied with a single MERGE; with `prune_missing`, articles that are no longer in the JSON are
+    deleted in the same transaction. Readers see either the old or the new catalog, never an empty table, and
+    loading the same file twice changes nothing.
+    """
+    # Load articles from JSON file, the last occurrence of an id wins
+    with open(json_file_path, "r", encoding="utf-8") as f:
+        rows = list({article["id"]: article_row(article) for article in json.load(f)}.values())
+    if not rows:
+        print("No articles to load.")
+        return
+
     # Establish connection to Snowflake
     conn = snowflake.connector.connect(
         account=account,
@@ -59,50 +98,55 @@ def insert_articles_from_json(json_file_path):
     cursor = conn.cursor()
 
     try:
+        start = time.perf_counter()
         # Explicitly set the warehouse and schema
         cursor.execute(f"USE WAREHOUSE {warehouse}")
         cursor.execute(
             f"USE SCHEMA {database}.PUBLIC"
         )  # Assuming PUBLIC schema, adjust if different
 
-        # Check if the table exists and has content
-        cursor.execute("SHOW TABLES LIKE 'ARTICLES'")
-        table_exists = cursor.fetchone() is not None
-
-        if table_exists:
-            cursor.execute("SELECT COUNT(*) FROM ARTICLES")
-            row_count = cursor.fetchone()[0]
-            if row_count > 0:
-                # Truncate the table if it has content
-                cursor.execute("TRUNCATE TABLE ARTICLES")
-                print("Existing data in ARTICLES table has been truncated.")
-        else:
-            # Create the table if it doesn't exist
-            create_table_query = """
-            CREATE TABLE IF NOT EXISTS ARTICLES (
-                A_ID STRING,  # Changed to STRING to accommodate UUID
-                TITLE STRING,
-                DESCRIPTION STRING,
-                PUBLICATION_DATE DATE,
-                AUTHORS STRING,
-                PDF_URL STRING,
-                IMAGE_URL STRING
+        # DDL commits implicitly in Snowflake, so create the tables before the transaction starts
+        create_table_query = """
+        CREATE TABLE IF NOT EXISTS ARTICLES (
+            A_ID STRING,  -- STRING to accommodate UUID
+            TITLE STRING,
+            DESCRIPTION STRING,
+            PUBLICATION_DATE DATE,
+            AUTHORS STRING,
+            PDF_URL STRING,
+            IMAGE_URL STRING
+        )
+        """
+        cursor.execute(create_table_query)
+        cursor.execute(
+            create_table_query.replace(
+                "CREATE TABLE IF NOT EXISTS ARTICLES", "CREATE OR REPLACE TEMPORARY TABLE ARTICLES_STAGE"
             )
-            """
-            cursor.execute(create_table_query)
-            print("ARTICLES table created.")
-
-        # Load articles from JSON file
-        with open(json_file_path, "r", encoding="utf-8") as f:
-            articles = json.load(f)
-
-        # Insert all articles
-        for article in articles:
-            insert_article(cursor, article)
-
-        # Commit the changes
-        conn.commit()
-        print("Data inserted successfully.")
+        )
+
+        # executemany batches the rows into multi-row INSERTs
+        insert_query = f"""
+        INSERT INTO ARTICLES_STAGE ({", ".join(ARTICLE_COLUMNS)})
+        VALUES ({", ".join(["%s"] * len(ARTICLE_COLUMNS))})
+        """
+        for i in range(0, len(rows), STAGE_BATCH_SIZE):
+            cursor.executemany(insert_query, rows[i : i + STAGE_BATCH_SIZE])
+
+        cursor.execute("BEGIN")
+        cursor.execute(_merge_query())
+        inserted, updated = cursor.fetchone()
+        deleted = 0
+        if prune_missing:
+            cursor.execute(
+                "DELETE FROM ARTICLES WHERE A_ID NOT IN (SELECT A_ID FROM ARTICLES_STAGE)"
+            )
+            deleted = cursor.rowcount
+        cursor.execute("COMMIT")
+        print(
+            f"Loaded {len(rows)} articles in {time.perf_counter() - start:.1f}s: "
+            f"{inserted} inserted, {updated} updated, {deleted} deleted."
+        )
+        invalidate_catalog_cache()
     except Exception as e:
         print(f"An error occurred: {e}")
         conn.rollback()
@@ -112,6 +156,21 @@ def insert_articles_from_json(json_file_path):
         conn.close()
 
 
+def invalidate_catalog_cache():
+    """Tell the backend to drop its cached article catalog, so the new articles are served right away"""
+    if not backend_url or not catalog_invalidation_token:
+        return
+    try:
+        response = requests.post(
+            f"{backend_url}/articles/cache/invalidate",
+            headers={"X-Catalog-Token": catalog_invalidation_token},
+            timeout=10,
+        )
+        response.raise_for_status()
+    except requests.RequestException as e:
+        print(f"Could not invalidate the backend catalog cache: {e}")
+
+
 def get_all_articles():
     # Establish connection to Snowflake
     conn = snowflake.connector.connect(
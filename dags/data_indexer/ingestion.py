@@ -0,0 +1,93 @@
+import queue
+import threading
+from typing import Callable, Iterable, List, Optional
+
+from llama_index.core import Settings
+from llama_index.core.ingestion import run_transformations
+from llama_index.core.schema import BaseNode, Document, MetadataMode
+
+_DONE = object()
+
+
+def _drain(batches: queue.Queue):
+    # Keep consuming after a failure, so the upstream stage is never left blocked on a full queue
+    while batches.get() is not _DONE:
+        pass
+
+
+def stream_into_vector_store(
+    documents: Iterable[Document],
+    vector_store,
+    embed_model=None,
+    transformations=None,
+    queue_size: int = 4,
+    before_insert: Optional[Callable[[List[BaseNode]], None]] = None,
+) -> int:
+    """
+    Split, embed and insert documents as a three stage pipeline connected by bounded queues: the calling thread
+    pulls documents and splits them into nodes, one thread embeds the nodes in batches of `embed_batch_size` and
+    another inserts every embedded batch into the vector store. The stages overlap and at most `queue_size` batches
+    wait between two stages, so memory stays flat however many documents are streamed through. `before_insert` is
+    called with each batch before it is written. Returns the number of nodes inserted.
+    """
+    embed_model = embed_model or Settings.embed_model
+    transformations = transformations or Settings.transformations
+    batch_size = embed_model.embed_batch_size
+    node_batches = queue.Queue(maxsize=queue_size)
+    embedded_batches = queue.Queue(maxsize=queue_size)
+    errors = []
+    inserted = 0
+
+    def embed():
+        try:
+            while (batch := node_batches.get()) is not _DONE:
+                embeddings = embed_model.get_text_embedding_batch(
+                    [node.get_content(metadata_mode=MetadataMode.EMBED) for node in batch]
+                )
+                for node, embedding in zip(batch, embeddings):
+                    node.embedding = embedding
+                embedded_batches.put(batch)
+        except Exception as e:
+            errors.append(e)
+            _drain(node_batches)
+        finally:
+            embedded_batches.put(_DONE)
+
+    def insert():
+        nonlocal inserted
+        try:
+            while (batch := embedded_batches.get()) is not _DONE:
+                if before_insert:
+                    before_insert(batch)
+                vector_store.add(batch)
+                inserted += len(batch)
+        except Exception as e:
+            errors.append(e)
+            _drain(embedded_batches)
+
+    workers = [
+        threading.Thread(target=embed, name="embed", daemon=True),
+        threading.Thread(target=insert, name="insert", daemon=True),
+    ]
+    for worker in workers:
+        worker.start()
+
+    try:
+        batch = []
+        for document in documents:
+            if errors:
+                break
+            batch.extend(run_transformations([document], transformations))
+            while len(batch) >= batch_size:
+                node_batches.put(batch[:batch_size])
+                batch = batch[batch_size:]
+        if batch and not errors:
+            node_batches.put(batch)
+    finally:
+        node_batches.put(_DONE)
+        for worker in workers:
+            worker.join()
+
+    if errors:
+        raise errors[0]
+    return inserted
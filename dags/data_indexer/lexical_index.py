@@ -0,0 +1,205 @@
+import io
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+from llama_index.core.schema import BaseNode, MetadataMode, NodeWithScore
+from llama_index.core.storage.docstore.utils import doc_to_json, json_to_doc
+
+# Keeps tickers, years, amounts and names with inner punctuation together: "s&p", "2023", "10.5", "e-mini"
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[.&'-][a-z0-9]+)*")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were which with".split()
+)
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in TOKEN_PATTERN.findall(text.casefold()) if token not in STOPWORDS]
+
+
+class ArticlePostings:
+    """
+    BM25 postings of one article: the sorted vocabulary, and for each term a run of (node position, term frequency)
+    pairs in two flat arrays, `offsets` marking where each term's run starts.
+    """
+
+    def __init__(self, terms: np.ndarray, offsets: np.ndarray, positions: np.ndarray, frequencies: np.ndarray, lengths: np.ndarray):
+        self.terms = terms
+        self.offsets = offsets
+        self.positions = positions
+        self.frequencies = frequencies
+        self.lengths = lengths
+        self.average_length = float(lengths.mean()) if len(lengths) else 0.0
+        self._term_index = {term: i for i, term in enumerate(terms.tolist())}
+
+    @classmethod
+    def build(cls, term_counts: List[Counter]) -> "ArticlePostings":
+        postings = {}
+        for position, counts in enumerate(term_counts):
+            for term, frequency in counts.items():
+                postings.setdefault(term, []).append((position, frequency))
+        terms = sorted(postings)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(postings[term]) for term in terms])
+        pairs = [pair for term in terms for pair in postings[term]]
+        return cls(
+            terms=np.array(terms, dtype=str),
+            offsets=offsets,
+            positions=np.array([position for position, _ in pairs], dtype=np.uint32),
+            frequencies=np.array([min(frequency, 65_535) for _, frequency in pairs], dtype=np.uint16),
+            lengths=np.array([sum(counts.values()) for counts in term_counts], dtype=np.uint32),
+        )
+
+    def to_bytes(self) -> bytes:
+        buffer = io.BytesIO()
+        np.savez_compressed(
+            buffer,
+            terms=self.terms,
+            offsets=self.offsets,
+            positions=self.positions,
+            frequencies=self.frequencies,
+            lengths=self.lengths,
+        )
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "ArticlePostings":
+        with np.load(io.BytesIO(data), allow_pickle=False) as arrays:
+            return cls(**{name: arrays[name] for name in arrays.files})
+
+    def search(self, query_terms: Iterable[str], top_k: int) -> List[Tuple[int, float]]:
+        """The positions and BM25 scores of the best matching nodes"""
+        node_count = len(self.lengths)
+        scores = np.zeros(node_count, dtype=np.float32)
+        length_norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths / max(self.average_length, 1.0))
+        for term in set(query_terms):
+            i = self._term_index.get(term)
+            if i is None:
+                continue
+            start, end = self.offsets[i], self.offsets[i + 1]
+            positions = self.positions[start:end]
+            frequencies = self.frequencies[start:end].astype(np.float32)
+            idf = math.log(1 + (node_count - (end - start) + 0.5) / ((end - start) + 0.5))
+            scores[positions] += idf * frequencies * (BM25_K1 + 1) / (frequencies + length_norm[positions])
+
+        matches = np.flatnonzero(scores)
+        if len(matches) > top_k:
+            matches = matches[np.argpartition(-scores[matches], top_k)[:top_k]]
+        matches = matches[np.argsort(-scores[matches], kind="stable")]
+        return [(int(position), float(scores[position])) for position in matches]
+
+
+class LexicalIndex:
+    """
+    Local BM25 index of the indexed nodes, partitioned by article. Each article is stored as one compressed
+    postings row plus its nodes (without embeddings), so a lexical search reads no more than the article it is
+    scoped to and returns complete nodes without a vector store round trip. Recently searched articles are kept
+    decoded in memory.
+    """
+
+    def __init__(self, path: str, cached_articles: int = 64):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.cached_articles = cached_articles
+        self._lock = threading.Lock()
+        self._postings: "OrderedDict[str, Tuple[float, ArticlePostings]]" = OrderedDict()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS lexical_articles (
+                article_id TEXT PRIMARY KEY,
+                postings BLOB NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS lexical_nodes (
+                article_id TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                node TEXT NOT NULL,
+                PRIMARY KEY (article_id, position)
+            )
+            """
+        )
+        self._conn.commit()
+
+    def put_article(self, article_id: str, nodes: Iterable[BaseNode]):
+        """Replace the indexed nodes of an article"""
+        term_counts, rows = [], []
+        for position, node in enumerate(nodes):
+            term_counts.append(Counter(tokenize(node.get_content(metadata_mode=MetadataMode.EMBED))))
+            node = node.model_copy(update={"embedding": None})
+            rows.append((article_id, position, json.dumps(doc_to_json(node))))
+        postings = ArticlePostings.build(term_counts)
+
+        with self._lock:
+            with self._conn:
+                self._conn.execute("DELETE FROM lexical_nodes WHERE article_id = ?", (article_id,))
+                self._conn.executemany("INSERT INTO lexical_nodes VALUES (?, ?, ?)", rows)
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO lexical_articles VALUES (?, ?, ?)",
+                    (article_id, postings.to_bytes(), time.time()),
+                )
+            self._postings.pop(article_id, None)
+
+    def has_article(self, article_id: str) -> bool:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT 1 FROM lexical_articles WHERE article_id = ?", (article_id,)
+            ).fetchone() is not None
+
+    def _get_postings(self, article_id: str) -> Optional[ArticlePostings]:
+        row = self._conn.execute(
+            "SELECT updated_at FROM lexical_articles WHERE article_id = ?", (article_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        updated_at = row[0]
+        cached = self._postings.get(article_id)
+        # The indexer may have replaced the article since it was cached
+        if cached and cached[0] == updated_at:
+            self._postings.move_to_end(article_id)
+            return cached[1]
+        data = self._conn.execute(
+            "SELECT postings FROM lexical_articles WHERE article_id = ?", (article_id,)
+        ).fetchone()[0]
+        postings = ArticlePostings.from_bytes(data)
+        self._postings[article_id] = (updated_at, postings)
+        while len(self._postings) > self.cached_articles:
+            self._postings.popitem(last=False)
+        return postings
+
+    def search(self, article_id: str, query: str, top_k: int) -> List[NodeWithScore]:
+        with self._lock:
+            postings = self._get_postings(article_id)
+            if postings is None:
+                return []
+            matches = postings.search(tokenize(query), top_k)
+            if not matches:
+                return []
+            nodes = dict(
+                self._conn.execute(
+                    f"SELECT position, node FROM lexical_nodes WHERE article_id = ? "
+                    f"AND position IN ({','.join('?' * len(matches))})",
+                    [article_id] + [position for position, _ in matches],
+                ).fetchall()
+            )
+        return [
+            NodeWithScore(node=json_to_doc(json.loads(nodes[position])), score=score)
+            for position, score in matches
+            if position in nodes
+        ]
+
+    def close(self):
+        self._conn.close()
@@ -0,0 +1,183 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+PENDING = "pending"
+INDEXED = "indexed"
+FAILED = "failed"
+
+
+@dataclass
+class ManifestEntry:
+    article_id: str
+    pdf_hash: str
+    processor_version: str
+    embed_model: str
+    status: str
+    chunk_ids: List[str] = field(default_factory=list)
+    stale_chunk_ids: List[str] = field(default_factory=list)
+    error: Optional[str] = None
+    updated_at: float = 0.0
+
+    def is_current(self, pdf_hash: str, processor_version: str, embed_model: str) -> bool:
+        return (
+            self.status == INDEXED
+            and self.pdf_hash == pdf_hash
+            and self.processor_version == processor_version
+            and self.embed_model == embed_model
+        )
+
+    def chunks_to_delete(self) -> List[str]:
+        """Chunks that may be in the vector store but are not part of a completed index of the current content."""
+        if self.status == INDEXED:
+            return self.chunk_ids
+        # A run stopped between recording its chunks and completing: both its own (possibly partially inserted)
+        # chunks and the ones it was replacing may still be there
+        return self.stale_chunk_ids + self.chunk_ids
+
+
+class IndexManifest:
+    """
+    Record of what has been indexed per article: the PDF content hash, the processor version and embedding model
+    that produced the vectors, and the chunk ids written to the vector store. Chunk ids are recorded with a
+    `pending` status before they are inserted and the entry is only marked `indexed` once the insert completed,
+    so a crashed run is detected and cleaned up on the next one. Safe to share with the pipeline's insert thread.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS index_manifest (
+                article_id TEXT PRIMARY KEY,
+                pdf_hash TEXT NOT NULL,
+                processor_version TEXT NOT NULL,
+                embed_model TEXT NOT NULL,
+                status TEXT NOT NULL,
+                chunk_ids TEXT NOT NULL,
+                stale_chunk_ids TEXT NOT NULL,
+                error TEXT,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def file_hash(path: str) -> str:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def get(self, article_id: str) -> Optional[ManifestEntry]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM index_manifest WHERE article_id = ?", (article_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        article_id, pdf_hash, processor_version, embed_model, status, chunk_ids, stale_chunk_ids, error, updated_at = row
+        return ManifestEntry(
+            article_id=article_id,
+            pdf_hash=pdf_hash,
+            processor_version=processor_version,
+            embed_model=embed_model,
+            status=status,
+            chunk_ids=json.loads(chunk_ids),
+            stale_chunk_ids=json.loads(stale_chunk_ids),
+            error=error,
+            updated_at=updated_at,
+        )
+
+    def _put(self, entry: ManifestEntry):
+        entry.updated_at = time.time()
+        with self._lock:
+            self._write(entry)
+
+    def _write(self, entry: ManifestEntry):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO index_manifest VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                entry.article_id,
+                entry.pdf_hash,
+                entry.processor_version,
+                entry.embed_model,
+                entry.status,
+                json.dumps(entry.chunk_ids),
+                json.dumps(entry.stale_chunk_ids),
+                entry.error,
+                entry.updated_at,
+            ),
+        )
+        self._conn.commit()
+
+    def begin(
+        self,
+        article_id: str,
+        pdf_hash: str,
+        processor_version: str,
+        embed_model: str,
+        chunk_ids: Optional[List[str]] = None,
+    ) -> List[str]:
+        """Start (re)indexing an article, optionally with the chunks about to be inserted, and return the chunk ids they replace."""
+        previous = self.get(article_id)
+        stale_chunk_ids = previous.chunks_to_delete() if previous else []
+        self._put(
+            ManifestEntry(
+                article_id=article_id,
+                pdf_hash=pdf_hash,
+                processor_version=processor_version,
+                embed_model=embed_model,
+                status=PENDING,
+                chunk_ids=chunk_ids or [],
+                stale_chunk_ids=stale_chunk_ids,
+            )
+        )
+        return stale_chunk_ids
+
+    def add_chunks(self, article_id: str, chunk_ids: List[str]):
+        """Record chunks of an article that is being indexed, before they are inserted."""
+        with self._lock:
+            entry = self.get(article_id)
+            entry.chunk_ids.extend(chunk_ids)
+            self._put(entry)
+
+    def complete(self, article_id: str):
+        entry = self.get(article_id)
+        entry.status = INDEXED
+        entry.stale_chunk_ids = []
+        entry.error = None
+        self._put(entry)
+
+    def fail(self, article_id: str, error: str):
+        entry = self.get(article_id) or ManifestEntry(
+            article_id=article_id,
+            pdf_hash="",
+            processor_version="",
+            embed_model="",
+            status=FAILED,
+        )
+        entry.status = FAILED
+        entry.error = error
+        self._put(entry)
+
+    def status_counts(self) -> dict:
+        with self._lock:
+            return dict(
+                self._conn.execute(
+                    "SELECT status, COUNT(*) FROM index_manifest GROUP BY status"
+                ).fetchall()
+            )
+
+    def close(self):
+        self._conn.close()
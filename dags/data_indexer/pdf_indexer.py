@@ -1,56 +1,218 @@
 import os
 
 from dotenv import load_dotenv
-from llama_index.core import Settings, StorageContext, VectorStoreIndex
+from llama_index.core import Settings
 from llama_index.core.node_parser import SentenceSplitter
+from llama_index.core.schema import MetadataMode
+from llama_index.core.utils import get_tokenizer
+from llama_index.core.vector_stores import MetadataFilter, MetadataFilters
 from llama_index.embeddings.openai import OpenAIEmbedding
 from llama_index.llms.openai import OpenAI
 from llama_index.vector_stores.milvus import MilvusVectorStore
+from pymilvus import DataType, MilvusClient
 
 from dags.articles import get_all_articles
-from dags.data_indexer.document_processors import load_data_from_directory
+from dags.data_indexer.document_processors import PROCESSOR_VERSION, iter_pdf_file
+from dags.data_indexer.ingestion import stream_into_vector_store
+from dags.data_indexer.lexical_index import LexicalIndex
+from dags.data_indexer.local_vector_store import LocalVectorStore
+from dags.data_indexer.manifest import IndexManifest
+from dags.data_indexer.utils import get_vision_cache
 from dags.data_ingestion.utils import (
     fetch_file_from_s3,
     ensure_resource_dir_exists,
-    CACHED_RESOURCES_PATH,
 )
 
 load_dotenv()
 
+DOCUMENTS_COLLECTION = "DocumentsIndex"
+EMBEDDING_DIM = 1536
+# Every node carries the article it was parsed from; Milvus uses it as the partition key
+ARTICLE_ID_METADATA_KEY = "a_id"
+ARTICLE_PARTITIONS = int(os.getenv("MILVUS_ARTICLE_PARTITIONS", "64"))
+PDF_PARSE_WORKERS = int(os.getenv("PDF_PARSE_WORKERS", str(os.cpu_count() or 1)))
+INDEX_MANIFEST_PATH = os.getenv("INDEX_MANIFEST_PATH", "vectorstore/index_manifest.sqlite")
+LEXICAL_INDEX_PATH = os.getenv("LEXICAL_INDEX_PATH", "vectorstore/lexical_index.sqlite")
+# "milvus" or "local", the embedded store the backend reads from the same LOCAL_VECTOR_STORE_DIR
+VECTOR_STORE = os.getenv("VECTOR_STORE", "milvus")
+LOCAL_VECTOR_STORE_DIR = os.getenv("LOCAL_VECTOR_STORE_DIR", "vectorstore/local")
+LOCAL_VECTOR_STORE_IVF_MIN_VECTORS = int(os.getenv("LOCAL_VECTOR_STORE_IVF_MIN_VECTORS", "20000"))
+EMBED_MODEL = "text-embedding-3-small"
+CHUNK_SIZE = 600
+# Bump whenever the metadata written with the chunks changes
+INDEX_METADATA_VERSION = "1"
+TOKEN_COUNT_METADATA_KEY = "token_count"
+# Kept out of the embedded and LLM text: bounding boxes, local file paths, ids, and the caption that the text of
+# table and image nodes already contains. Must match NOISY_METADATA_KEYS in backend/utilities/context_packing.py
+NOISY_METADATA_KEYS = ["x1", "y1", "x2", "x3", "dataframe", "image", "source", "caption", TOKEN_COUNT_METADATA_KEY]
+
 
 def _fetch_files_from_s3(article_id: str, pdf_s3_key: str, image_s3_key: str):
-    fetch_file_from_s3(pdf_s3_key, os.path.join("pdfs", str(article_id)))
+    pdf_path = fetch_file_from_s3(pdf_s3_key, os.path.join("pdfs", str(article_id)))
     fetch_file_from_s3(image_s3_key, os.path.join("images", str(article_id)))
+    return pdf_path
+
+
+def ensure_documents_collection(client: MilvusClient, collection_name: str):
+    """
+    Create the documents collection with the article id as a partition key, so that searches filtered on a single
+    article only scan that article's partition. Existing collections are left untouched; their (dynamic) a_id field
+    is still used as a pre-filter, but only a re-created collection gets partition pruning.
+    """
+    if client.has_collection(collection_name):
+        return
+
+    schema = MilvusClient.create_schema(auto_id=False, enable_dynamic_field=True)
+    schema.add_field("id", DataType.VARCHAR, max_length=65_535, is_primary=True)
+    schema.add_field("embedding", DataType.FLOAT_VECTOR, dim=EMBEDDING_DIM)
+    schema.add_field("doc_id", DataType.VARCHAR, max_length=65_535)
+    schema.add_field(
+        ARTICLE_ID_METADATA_KEY,
+        DataType.VARCHAR,
+        max_length=64,
+        is_partition_key=True,
+    )
+
+    index_params = client.prepare_index_params()
+    index_params.add_index(field_name="embedding", index_type="AUTOINDEX", metric_type="IP")
+    index_params.add_index(field_name=ARTICLE_ID_METADATA_KEY, index_type="INVERTED")
+
+    client.create_collection(
+        collection_name=collection_name,
+        schema=schema,
+        index_params=index_params,
+        num_partitions=ARTICLE_PARTITIONS,
+    )
 
 
-def create_index(documents):
+def get_vector_store():
+    if VECTOR_STORE == "local":
+        return LocalVectorStore(
+            os.path.join(LOCAL_VECTOR_STORE_DIR, DOCUMENTS_COLLECTION),
+            dim=EMBEDDING_DIM,
+            partition_key=ARTICLE_ID_METADATA_KEY,
+            ivf_min_vectors=LOCAL_VECTOR_STORE_IVF_MIN_VECTORS,
+        )
     milvus_uri = os.getenv("MILVUS_CLOUD_URI")
     milvus_key = os.getenv("MILVUS_API_KEY")
-    vector_store = MilvusVectorStore(
+    ensure_documents_collection(
+        MilvusClient(uri=milvus_uri, token=milvus_key), DOCUMENTS_COLLECTION
+    )
+    return MilvusVectorStore(
         uri=milvus_uri,
         token=milvus_key,
-        collection_name="DocumentsIndex",
+        collection_name=DOCUMENTS_COLLECTION,
+        dim=EMBEDDING_DIM,
     )
-    storage_context = StorageContext.from_defaults(vector_store=vector_store)
-    return VectorStoreIndex.from_documents(documents, storage_context=storage_context)
 
 
-def index_document():
-    Settings.embed_model = OpenAIEmbedding(
-        model="text-embedding-3-small", embed_batch_size=100
+def stamp_article_id(documents, article_id: str):
+    """Tag parsed documents with their article id as they stream past, keeping it out of the embedded and LLM text"""
+    for document in documents:
+        document.metadata[ARTICLE_ID_METADATA_KEY] = article_id
+        document.excluded_embed_metadata_keys.append(ARTICLE_ID_METADATA_KEY)
+        document.excluded_llm_metadata_keys.append(ARTICLE_ID_METADATA_KEY)
+        yield document
+
+
+def exclude_noisy_metadata(documents):
+    for document in documents:
+        for excluded in (document.excluded_embed_metadata_keys, document.excluded_llm_metadata_keys):
+            excluded.extend(key for key in NOISY_METADATA_KEYS if key not in excluded)
+        yield document
+
+
+def count_tokens(nodes, tokenizer=get_tokenizer()):
+    """Store the token count of each node's LLM view, for packing the context at query time"""
+    for node in nodes:
+        node.metadata[TOKEN_COUNT_METADATA_KEY] = len(
+            tokenizer(node.get_content(metadata_mode=MetadataMode.LLM))
+        )
+
+
+def index_article(
+    vector_store,
+    manifest: IndexManifest,
+    lexical_index: LexicalIndex,
+    article_id: str,
+    pdf_path: str,
+    pdf_hash: str,
+):
+    """
+    (Re)index one article. The chunks it replaces are deleted, then its pages are parsed, embedded and inserted
+    as a stream, each batch of chunk ids being recorded in the manifest before it is written. Once the whole
+    article is in, its chunks replace the article's BM25 postings and the manifest marks it as indexed.
+    """
+    stale_chunk_ids = manifest.begin(article_id, pdf_hash, _processor_version(), EMBED_MODEL)
+    if stale_chunk_ids:
+        # Scoped to the article, so a partitioned store only rewrites that article's partition
+        vector_store.delete_nodes(
+            node_ids=stale_chunk_ids,
+            filters=MetadataFilters(filters=[MetadataFilter(key=ARTICLE_ID_METADATA_KEY, value=article_id)]),
+        )
+    chunks = []
+
+    def before_insert(nodes):
+        count_tokens(nodes)
+        manifest.add_chunks(article_id, [node.node_id for node in nodes])
+        chunks.extend(node.model_copy(update={"embedding": None}) for node in nodes)
+
+    chunk_count = stream_into_vector_store(
+        exclude_noisy_metadata(stamp_article_id(iter_pdf_file(pdf_path, PDF_PARSE_WORKERS), article_id)),
+        vector_store,
+        before_insert=before_insert,
     )
+    lexical_index.put_article(article_id, chunks)
+    manifest.complete(article_id)
+    print(f"Indexed article {article_id}: {chunk_count} chunks, {len(stale_chunk_ids)} stale chunks removed")
+
+
+def _processor_version():
+    return f"{PROCESSOR_VERSION}-chunk{CHUNK_SIZE}-meta{INDEX_METADATA_VERSION}"
+
+
+def index_document():
+    """Index new and changed articles only, as recorded in the manifest, resuming any run that did not complete."""
+    Settings.embed_model = OpenAIEmbedding(model=EMBED_MODEL, embed_batch_size=100)
     Settings.llm = OpenAI(model="gpt-4o-mini", temperature=0.1)
-    Settings.text_splitter = SentenceSplitter(chunk_size=600)
+    Settings.text_splitter = SentenceSplitter(chunk_size=CHUNK_SIZE)
 
     ensure_resource_dir_exists()
+    vision_cache = get_vision_cache()
+    # The PDF parsing workers record their lookups in the shared cache file, this run's are the difference
+    vision_counters = vision_cache.counters() if vision_cache else None
+    manifest = IndexManifest(INDEX_MANIFEST_PATH)
+    lexical_index = LexicalIndex(LEXICAL_INDEX_PATH)
+    vector_store = get_vector_store()
     articles = get_all_articles()
-    for article in articles:
-        _fetch_files_from_s3(article[0], article[1], article[2])
-    documents = load_data_from_directory(os.path.join(CACHED_RESOURCES_PATH, "pdfs"))
+    skipped = 0
+    for article_id, pdf_s3_key, image_s3_key in articles:
+        article_id = str(article_id)
+        pdf_path = _fetch_files_from_s3(article_id, pdf_s3_key, image_s3_key)
+        if not pdf_path:
+            continue
+
+        pdf_hash = IndexManifest.file_hash(pdf_path)
+        entry = manifest.get(article_id)
+        if (
+            entry
+            and entry.is_current(pdf_hash, _processor_version(), EMBED_MODEL)
+            and lexical_index.has_article(article_id)
+        ):
+            skipped += 1
+            continue
 
-    print(len(documents))
+        try:
+            index_article(vector_store, manifest, lexical_index, article_id, pdf_path, pdf_hash)
+        except Exception as e:
+            print(f"Error indexing article {article_id}: {e}")
+            manifest.fail(article_id, str(e))
 
-    index = create_index(documents)
+    print(f"{skipped} unchanged articles skipped, manifest: {manifest.status_counts()}")
+    if vision_cache:
+        print(f"Vision cache: {vision_cache.stats(since=vision_counters)}")
+    lexical_index.close()
+    manifest.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,147 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+COUNTERS = ("hits", "misses", "evictions")
+
+
+class VisionCache:
+    """
+    Persistent, content-addressed cache of vision model outputs. Entries are keyed by the SHA-256 of the image
+    bytes together with the model and prompt version that produced them, so the same image is only sent to a model
+    once across documents and runs. Stored in a SQLite file; once the stored outputs exceed `max_bytes` the least
+    recently used entries are evicted. Hits, misses and evictions are counted in the file too, so that the counts
+    cover every process sharing it, such as the indexer's PDF parsing workers.
+    """
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # Several indexing processes may share the file, so wait for the write lock instead of failing
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS vision_outputs (
+                image_hash TEXT NOT NULL,
+                model TEXT NOT NULL,
+                prompt_version TEXT NOT NULL,
+                output TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                PRIMARY KEY (image_hash, model, prompt_version)
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS vision_outputs_accessed_at ON vision_outputs (accessed_at)"
+        )
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS vision_cache_counters (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+
+    def _count(self, name: str, value: int = 1):
+        self._conn.execute(
+            "INSERT INTO vision_cache_counters VALUES (?, ?) "
+            "ON CONFLICT (name) DO UPDATE SET value = value + excluded.value",
+            (name, value),
+        )
+
+    @staticmethod
+    def image_hash(image_content: bytes) -> str:
+        return hashlib.sha256(image_content).hexdigest()
+
+    def get(self, image_hash: str, model: str, prompt_version: str) -> Optional[str]:
+        key = (image_hash, model, prompt_version)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT output FROM vision_outputs WHERE image_hash = ? AND model = ? AND prompt_version = ?",
+                key,
+            ).fetchone()
+            if row is None:
+                self._count("misses")
+                self._conn.commit()
+                return None
+            self._conn.execute(
+                "UPDATE vision_outputs SET accessed_at = ? WHERE image_hash = ? AND model = ? AND prompt_version = ?",
+                (time.time(), *key),
+            )
+            self._count("hits")
+            self._conn.commit()
+            return row[0]
+
+    def set(self, image_hash: str, model: str, prompt_version: str, output: str):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO vision_outputs VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    image_hash,
+                    model,
+                    prompt_version,
+                    output,
+                    len(output.encode("utf-8")),
+                    now,
+                    now,
+                ),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        total = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM vision_outputs"
+        ).fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._conn.execute(
+            "SELECT image_hash, model, prompt_version, size FROM vision_outputs ORDER BY accessed_at"
+        ).fetchall()
+        for image_hash, model, prompt_version, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._conn.execute(
+                "DELETE FROM vision_outputs WHERE image_hash = ? AND model = ? AND prompt_version = ?",
+                (image_hash, model, prompt_version),
+            )
+            total -= size
+            self._count("evictions")
+
+    def counters(self) -> Dict[str, int]:
+        """Hits, misses and evictions of all processes since the cache file was created"""
+        with self._lock:
+            counters = dict(self._conn.execute("SELECT name, value FROM vision_cache_counters").fetchall())
+        return {name: counters.get(name, 0) for name in COUNTERS}
+
+    def stats(self, since: Optional[Dict[str, int]] = None) -> dict:
+        """Cache size and counters, the counters relative to an earlier `counters()` reading if `since` is given"""
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM vision_outputs"
+            ).fetchone()
+        counters = self.counters()
+        if since:
+            counters = {name: value - since.get(name, 0) for name, value in counters.items()}
+        lookups = counters["hits"] + counters["misses"]
+        return {
+            "entries": entries,
+            "size_bytes": size,
+            **counters,
+            "hit_rate": counters["hits"] / lookups if lookups else 0.0,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -5,7 +5,7 @@ import streamlit as st
 from dotenv import load_dotenv
 
 from frontend.utils.chat import fetch_file_from_s3
-from frontend.utils.auth import make_authenticated_request
+from frontend.utils.auth import make_authenticated_stream_request
 
 load_dotenv()
 
@@ -27,7 +27,8 @@ def qa_interface():
 
         # Get OpenAI model choices
         openai_models_choice = st.selectbox(
-            "Choose an OpenAI model", ["gpt-4o", "gpt-4o-mini", "gpt-3.5"]
+            "Choose an OpenAI model", ["auto", "gpt-4o", "gpt-4o-mini", "gpt-3.5"],
+            help="auto picks the cheapest model likely to answer each question well",
         )
 
         # Display PDF content preview
@@ -51,21 +52,19 @@ def qa_interface():
             with st.chat_message("user"):
                 st.markdown(prompt)
 
-            # Process the query (for testing, we'll use a simple response)
-            with st.spinner("Thinking..."):
-                article_id = doc['a_id']
-                data = {
-                    "model": openai_models_choice,
-                    "question": prompt,
-                }
-                response = make_authenticated_request(f"/chat/{article_id}/qa", "POST", data)
-
-            # Display the response
+            # Stream the response, rendering tokens as they arrive
+            article_id = doc['a_id']
+            data = {
+                "model": openai_models_choice,
+                "question": prompt,
+            }
             with st.chat_message("assistant"):
-                st.markdown(response["response"])
+                answer = st.write_stream(
+                    make_authenticated_stream_request(f"/chat/{article_id}/qa/stream", data)
+                )
 
             st.session_state.messages.append(
-                {"role": "assistant", "content": response["response"]}
+                {"role": "assistant", "content": answer}
             )
 
     else:
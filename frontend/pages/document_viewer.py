@@ -10,7 +10,7 @@ from dotenv import load_dotenv  # Load environment variables
 from streamlit_extras.switch_page_button import switch_page
 
 from frontend.utils.chat import fetch_file_from_s3
-from frontend.utils.auth import make_unauthenticated_request
+from frontend.utils.auth import make_authenticated_request, wait_for_job
 
 # Load environment variables from .env file
 load_dotenv()
@@ -73,7 +73,12 @@ def document_viewer_page():
                  # Button to generate summary
                 if st.button("Generate Summary"):
                     article_id = doc['a_id']  # Assuming 'id' contains the article ID
-                    summary_data = make_unauthenticated_request(f"articles/generate-summary/{article_id}", "POST")
+                    # Served from storage once generated, otherwise generated in the background
+                    summary_data = make_authenticated_request(f"articles/generate-summary/{article_id}")
+                    if "summary" not in summary_data:
+                        job = make_authenticated_request(f"articles/generate-summary/{article_id}", "POST")
+                        with st.spinner("Generating summary..."):
+                            summary_data = {"summary": wait_for_job(job)["summaries"]["medium"]}
                     # api_url = f"http://your_fastapi_backend/articles/generate-summary/{article_id}"
 
                     st.subheader("Generated Summary")
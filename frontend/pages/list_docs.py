@@ -8,7 +8,7 @@ from PIL import Image
 from dotenv import load_dotenv
 
 from frontend.utils.chat import fetch_file_from_s3
-from frontend.utils.auth import make_authenticated_request
+from frontend.utils.auth import make_conditional_request
 
 # Load environment variables from .env file if present
 load_dotenv()
@@ -28,6 +28,10 @@ BACKEND_URL = "http://localhost:8000/articles"  # Replace with the actual backen
 
 DEFAULT_IMAGE_PATH = "path/to/your/default/image.png"  # Local path to a default image
 
+PAGE_SIZE = 12  # A multiple of the 3 grid columns
+# Only what the list and the document pages use
+DOCUMENT_FIELDS = "a_id,title,pdf_url,image_url"
+
 def _get_image_base64(image_url):
     """Convert image URL to base64 string."""
     try:
@@ -51,15 +55,17 @@ def _get_image_base64(image_url):
             st.error("Default image not found.")
             return ""
 
-def fetch_documents():
-    """Fetch all documents from the backend API."""
+def fetch_documents(cursor=None, filters=None):
+    """Fetch one page of documents from the backend API, returning the documents and the cursor of the next page."""
+    params = {"limit": PAGE_SIZE, "fields": DOCUMENT_FIELDS, **(filters or {})}
+    if cursor:
+        params["cursor"] = cursor
     try:
-        response = make_authenticated_request("/articles/", "GET")
-
-        return response
+        response = make_conditional_request("/articles/", params=params)
+        return response.get("items", []), response.get("next_cursor")
     except requests.exceptions.RequestException as e:
         st.error("Failed to load documents from the server.")
-        return []
+        return [], None
 
 def get_s3_image_url(image_key):
     """Construct the S3 image URL."""
@@ -68,11 +74,44 @@ def get_s3_image_url(image_key):
 
 
 
+def document_filters():
+    """Filter inputs, returned as the backend's query parameters. Changing them starts over from the first page."""
+    col1, col2 = st.columns(2)
+    with col1:
+        title_prefix = st.text_input("Title starts with")
+    with col2:
+        author = st.text_input("Author")
+    filters = {name: value for name, value in (("title_prefix", title_prefix), ("author", author)) if value}
+
+    if st.session_state.get("document_filters") != filters:
+        st.session_state.document_filters = filters
+        st.session_state.document_cursors = [None]
+    return filters
+
+
+def page_navigation(next_cursor):
+    # The cursors of the pages visited so far; the last one is the page on display
+    cursors = st.session_state.document_cursors
+    col1, col2, col3 = st.columns([1, 1, 4])
+    with col1:
+        if st.button("Previous", disabled=len(cursors) == 1):
+            cursors.pop()
+            st.rerun()
+    with col2:
+        if st.button("Next", disabled=next_cursor is None):
+            cursors.append(next_cursor)
+            st.rerun()
+    with col3:
+        st.write(f"Page {len(cursors)}")
+
+
 def list_docs_page():
     st.title("Document List")
 
-    # Fetch documents from backend API
-    documents = fetch_documents()
+    filters = document_filters()
+
+    # Fetch only the page on display from the backend API
+    documents, next_cursor = fetch_documents(st.session_state.document_cursors[-1], filters)
     if not documents:
         st.write("No documents available.")
         return
@@ -114,3 +153,5 @@ def list_docs_page():
                     st.session_state.selected_document = doc
                     st.session_state.current_view = "document_viewer"
                     st.rerun()
+
+    page_navigation(next_cursor)
@@ -3,18 +3,27 @@ from typing import Optional
 import requests
 import streamlit as st
 
+from frontend.utils.auth import get_access_token, wait_for_job
+
 API_BASE_URL = "http://localhost:8000"
 
-def generate_summary(article_id: int) -> Optional[dict]:
+def generate_summary(article_id: int, summary_length: str = "medium") -> Optional[dict]:
     """Generate summary for the given article ID"""
     try:
         response = requests.post(
             f"{API_BASE_URL}/articles/generate-summary/{article_id}",
-            headers={"Content-Type": "application/json"}
+            headers={"Content-Type": "application/json", "Authorization": f"Bearer {get_access_token()}"}
         )
 
-        if response.status_code == 200:
-            return response.json()
+        if response.status_code == 202:
+            # The summaries are generated in the background, poll their job and pick the requested length
+            result = wait_for_job(response.json())
+            return {
+                "article_id": result["article_id"],
+                "title": result["title"],
+                "summary_length": summary_length,
+                "summary": result["summaries"][summary_length],
+            }
         elif response.status_code == 404:
             st.error(f"Article with ID {article_id} not found")
         else:
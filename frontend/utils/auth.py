@@ -1,3 +1,6 @@
+import json
+import time
+
 import requests
 import streamlit as st
 
@@ -34,6 +37,59 @@ def make_authenticated_request(endpoint, method="GET", data=None, params=None):
     return response.json()
 
 
+def make_conditional_request(endpoint, params=None):
+    """GET with If-None-Match, reusing the body cached in the session when the backend answers 304 Not Modified"""
+    token = get_access_token()
+    headers = {"Authorization": f"Bearer {token}"}
+    url = f"{settings.BACKEND_URI}/{endpoint}"
+    cache = st.session_state.setdefault("etag_cache", {})
+    cache_key = (endpoint, json.dumps(params, sort_keys=True))
+    if cache_key in cache:
+        headers["If-None-Match"] = cache[cache_key][0]
+
+    response = requests.get(url, headers=headers, params=params)
+    if response.status_code == 304:
+        return cache[cache_key][1]
+
+    body = response.json()
+    if "ETag" in response.headers:
+        cache[cache_key] = (response.headers["ETag"], body)
+    return body
+
+
+def wait_for_job(job, poll_seconds=2.0):
+    """Poll a job returned by a 202 Accepted endpoint until it finishes, returning its result"""
+    while job["status"] not in ("succeeded", "failed"):
+        time.sleep(poll_seconds)
+        job = make_authenticated_request(f"jobs/{job['job_id']}")
+    if job["status"] == "failed":
+        raise RuntimeError(job.get("error") or "Job failed")
+    return job["result"]
+
+
+def make_authenticated_stream_request(endpoint, data=None):
+    """POST to a Server-Sent Events endpoint and yield the streamed tokens as they arrive"""
+    token = get_access_token()
+    headers = {"Authorization": f"Bearer {token}", "Accept": "text/event-stream"}
+    url = f"{settings.BACKEND_URI}/{endpoint}"
+
+    with requests.post(url, json=data, headers=headers, stream=True) as response:
+        response.raise_for_status()
+        event = "message"
+        for line in response.iter_lines(decode_unicode=True):
+            if line.startswith("event:"):
+                event = line[len("event:"):].strip()
+            elif line.startswith("data:"):
+                payload = json.loads(line[len("data:"):])
+                if event == "error":
+                    raise RuntimeError(payload.get("detail", "Streaming failed"))
+                if event == "done":
+                    return
+                yield payload["token"]
+            elif not line:
+                event = "message"
+
+
 def make_unauthenticated_request(endpoint, method="GET", data=None, params=None):
     url = f"{settings.BACKEND_URI}/{endpoint}"
 